@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Analítica de ventas para /api/analitica y el reporte /reportes
+
+Todo sale de los rollups (venta_diaria, renovacion_diaria y venta_comprador,
+ver rollups_ventas.py), nunca de la tabla de cuentas: el costo depende de
+los días y plataformas de la ventana, no del historial de ventas.
+
+Por plataforma, en la ventana de `dias` que termina hoy:
+- velocidad: ventas por día, y tendencia (% de las ventas por día de la segunda
+  mitad frente a las de la primera; con `dias` impar la segunda tiene un día más)
+- días promedio entre fecha_compra y fecha_venta
+- tasa de renovación: renovaciones por cada venta
+Por comprador (acumulado histórico): ingresos por comprador, recurrentes y principales.
+"""
+
+from datetime import date, timedelta
+
+from sqlalchemy import case, func, select
+
+# Ventana por defecto y límites de /api/analitica?dias=
+DIAS_POR_DEFECTO = 90
+MIN_DIAS = 7
+MAX_DIAS = 730
+# Compradores listados en el reporte
+MAX_COMPRADORES = 10
+
+def _cociente(numerador, denominador, decimales=2):
+    return round(numerador / denominador, decimales) if denominador else None
+
+def _resumen(ventas, ingresos, dias_en_stock, renovaciones, ventas_primera, ventas_segunda, dias):
+    # Ritmos por día: las mitades difieren en un día cuando `dias` es impar
+    dias_primera = dias // 2
+    ritmo_primera = ventas_primera / dias_primera
+    ritmo_segunda = ventas_segunda / (dias - dias_primera)
+    return {
+        'ventas': ventas,
+        'ingresos': round(ingresos, 2),
+        'ventas_por_dia': round(ventas / dias, 2),
+        'ticket_promedio': _cociente(ingresos, ventas),
+        'dias_promedio_hasta_venta': _cociente(dias_en_stock, ventas, 1),
+        'renovaciones': renovaciones,
+        'tasa_renovacion': _cociente(renovaciones, ventas, 3),
+        'tendencia': _cociente((ritmo_segunda - ritmo_primera) * 100, ritmo_primera, 1),
+    }
+
+def analitica_ventas(db, usuario_id=None, dias=DIAS_POR_DEFECTO, hoy=None):
+    """Indicadores por plataforma y por comprador; `usuario_id=None` abarca a todos los dueños"""
+    hasta = hoy or date.today()
+    desde = hasta - timedelta(days=dias - 1)
+    # Primer día de la segunda mitad de la ventana (para la tendencia)
+    mitad = desde + timedelta(days=dias // 2)
+    tablas = db.metadata.tables
+    diaria, renovaciones, compradores = tablas['venta_diaria'], tablas['renovacion_diaria'], tablas['venta_comprador']
+
+    def del_usuario(tabla):
+        return [tabla.c.usuario_id == usuario_id] if usuario_id is not None else []
+
+    consulta_ventas = select(
+        diaria.c.plataforma,
+        func.sum(diaria.c.ventas), func.sum(diaria.c.ingresos), func.sum(diaria.c.dias_en_stock),
+        func.sum(case((diaria.c.dia < mitad, diaria.c.ventas), else_=0)),
+    ).where(diaria.c.dia >= desde, diaria.c.dia <= hasta, *del_usuario(diaria)).group_by(diaria.c.plataforma)
+    consulta_renovaciones = select(
+        renovaciones.c.plataforma, func.sum(renovaciones.c.renovaciones)
+    ).where(
+        renovaciones.c.dia >= desde, renovaciones.c.dia <= hasta, *del_usuario(renovaciones)
+    ).group_by(renovaciones.c.plataforma)
+
+    # Con usuario_id=None un mismo comprador de dos dueños se agrupa en uno solo
+    por_comprador = select(
+        compradores.c.comprador,
+        func.sum(compradores.c.ventas).label('ventas'),
+        func.sum(compradores.c.ingresos).label('ingresos'),
+    ).where(*del_usuario(compradores)).group_by(compradores.c.comprador).subquery()
+    consulta_compradores = select(
+        func.count(), func.coalesce(func.sum(por_comprador.c.ventas), 0),
+        func.coalesce(func.sum(por_comprador.c.ingresos), 0),
+        func.coalesce(func.sum(case((por_comprador.c.ventas > 1, 1), else_=0)), 0),
+    )
+    consulta_principales = select(
+        por_comprador.c.comprador, por_comprador.c.ventas, por_comprador.c.ingresos
+    ).order_by(por_comprador.c.ingresos.desc(), por_comprador.c.comprador).limit(MAX_COMPRADORES)
+
+    renovadas = {plataforma: int(total) for plataforma, total in db.session.execute(consulta_renovaciones)}
+    plataformas = []
+    acumulado = [0, 0.0, 0, 0, 0]
+    for plataforma, ventas, ingresos, dias_en_stock, ventas_primera in db.session.execute(consulta_ventas):
+        valores = [int(ventas), float(ingresos), int(dias_en_stock), renovadas.pop(plataforma, 0), int(ventas_primera)]
+        acumulado = [total + valor for total, valor in zip(acumulado, valores)]
+        plataformas.append({'plataforma': plataforma, **_resumen(
+            *valores[:4], valores[4], valores[0] - valores[4], dias)})
+    # Renovaciones de plataformas sin ventas en la ventana
+    for plataforma, total in renovadas.items():
+        acumulado[3] += total
+        plataformas.append({'plataforma': plataforma, **_resumen(0, 0.0, 0, total, 0, 0, dias)})
+    plataformas.sort(key=lambda fila: (-fila['ventas'], -fila['renovaciones'], fila['plataforma']))
+
+    total_compradores, ventas_compradores, ingresos_compradores, recurrentes = db.session.execute(consulta_compradores).one()
+    return {
+        'desde': desde.isoformat(),
+        'hasta': hasta.isoformat(),
+        'dias': dias,
+        'plataformas': plataformas,
+        'totales': _resumen(*acumulado[:4], acumulado[4], acumulado[0] - acumulado[4], dias),
+        'compradores': {
+            'total': total_compradores,
+            'recurrentes': int(recurrentes),
+            'tasa_recurrentes': _cociente(int(recurrentes), total_compradores, 3),
+            'ventas_por_comprador': _cociente(int(ventas_compradores), total_compradores),
+            'ingresos_por_comprador': _cociente(float(ingresos_compradores), total_compradores),
+            'principales': [
+                {'comprador': comprador, 'ventas': int(ventas), 'ingresos': round(float(ingresos), 2)}
+                for comprador, ventas, ingresos in db.session.execute(consulta_principales)
+            ],
+        },
+    }
@@ -6,13 +6,40 @@ Sistema web para gestionar inventario de cuentas de streaming desde cualquier di
 ADAPTADO PARA INFINITYFREE
 """
 
-from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify, send_file
+from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify, send_file, Response, g, has_request_context, make_response
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime, date, timedelta
 import os
+import time
+import hashlib
+import hmac
+import json
+import sqlite3
+from functools import wraps
 from dotenv import load_dotenv
+from plantillas_whatsapp import renderizar_mensaje, compilar_plantilla, PLANTILLAS_POR_DEFECTO, CAMPOS
+from busqueda import preparar_indices, buscar_cuentas, resumir_busqueda, escapar_like
+from sugerencias import RegistroIndices, valores_sugerencia, CAMPOS_SUGERENCIA
+from instrumentacion import Instrumentacion
+from metricas import Metricas
+from consultas_lentas import RegistroConsultasLentas
+from perfil_memoria import perfilar_memoria
+from perfil_cpu import PerfiladorCPU
+from cache_fragmentos import CacheFragmentos
+from recursos_estaticos import RecursosEstaticos
+from analitica import analitica_ventas, DIAS_POR_DEFECTO, MIN_DIAS, MAX_DIAS
+import eventos
+from jinja2 import FileSystemBytecodeCache, TemplateSyntaxError
+from sqlalchemy import event
+from sqlalchemy.dialects.mysql import insert as insert_mysql
+from sqlalchemy.dialects.postgresql import insert as insert_postgresql
+from sqlalchemy.dialects.sqlite import insert as insert_sqlite
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError, TimeoutError as PoolTimeoutError
+from sqlalchemy.orm.exc import StaleDataError
+from sqlalchemy.schema import CreateColumn
 
 load_dotenv()
 
@@ -26,6 +53,12 @@ def get_collation():
 
 app = Flask(__name__)
 
+# Caché de bytecode de Jinja en disco: los workers nuevos cargan las plantillas ya compiladas
+if os.getenv('JINJA_BYTECODE_CACHE', '1') == '1':
+    directorio_bytecode = os.getenv('JINJA_BYTECODE_DIR', os.path.join(app.instance_path, 'jinja_bytecode'))
+    os.makedirs(directorio_bytecode, exist_ok=True)
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache(directorio_bytecode)
+
 # Configuración para InfinityFree
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'tu-clave-secreta-aqui-infinityfree')
 
@@ -89,11 +122,47 @@ else:
     print("🚀 Configuración del motor: PostgreSQL")
 
 db = SQLAlchemy(app)
+
+@event.listens_for(Engine, 'connect')
+def activar_claves_foraneas(conexion_dbapi, registro):
+    """SQLite no aplica las FOREIGN KEY (ni su ON DELETE CASCADE) si no se activan en cada conexión"""
+    if isinstance(conexion_dbapi, sqlite3.Connection):
+        cursor = conexion_dbapi.cursor()
+        cursor.execute('PRAGMA foreign_keys = ON')
+        cursor.close()
+
 login_manager = LoginManager()
 login_manager.init_app(app)
 login_manager.login_view = 'login'
 login_manager.login_message = 'Por favor inicia sesión para acceder a esta página.'
 
+# Tiempos por petición, consultas SQL y cabecera Server-Timing
+instrumentacion = Instrumentacion(app, db.Model)
+
+# Métricas para Prometheus (/metrics)
+metricas = Metricas()
+app.extensions['metricas'] = metricas
+instrumentacion.suscriptores.append(metricas.registrar_peticion)
+with app.app_context():
+    metricas.observar_pool(db.engine)
+
+# Consultas que superan SLOW_QUERY_MS, con su plan de ejecución
+consultas_lentas = RegistroConsultasLentas()
+with app.app_context():
+    consultas_lentas.init_app(app, db.engine)
+
+# Perfilador de CPU por muestreo, activable desde /api/perfil-cpu
+perfil_cpu = PerfiladorCPU(app)
+
+# CSS/JS con hash en el nombre (construir_estaticos.py), caché inmutable y variantes .br/.gz
+recursos_estaticos = RecursosEstaticos(app)
+
+@app.teardown_request
+def contar_timeouts_pool(error=None):
+    """Contar las peticiones que fallaron esperando una conexión del pool"""
+    if isinstance(error, PoolTimeoutError):
+        metricas.incrementar('gestor_db_pool_timeouts_total', endpoint=request.endpoint or 'desconocido')
+
 @login_manager.user_loader
 def load_user(user_id):
     return Usuario.query.get(int(user_id))
@@ -108,8 +177,10 @@ class Usuario(UserMixin, db.Model):
     fecha_creacion = db.Column(db.DateTime, default=datetime.utcnow)
     activo = db.Column(db.Boolean, default=True)
     
-    # Relación con cuentas
-    cuentas = db.relationship('Cuenta', backref='usuario', lazy=True, cascade='all, delete-orphan')
+    # Relación con cuentas. Al borrar un usuario no se cargan sus cuentas: las borra el
+    # ON DELETE CASCADE de cuenta.usuario_id (ver eliminar_usuario para hacerlo con historial)
+    cuentas = db.relationship('Cuenta', backref='usuario', lazy=True, cascade='all, delete-orphan',
+                              passive_deletes=True)
     
     def set_password(self, password):
         self.password_hash = generate_password_hash(password)
@@ -137,6 +208,16 @@ class Cuenta(db.Model):
     # Nuevo campo para asociar cuentas con usuarios
     usuario_id = db.Column(db.Integer, db.ForeignKey('usuario.id', ondelete='CASCADE'), nullable=False)
     
+    # Versión de la fila: sube en cada UPDATE y detecta ediciones simultáneas (StaleDataError)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    
+    __mapper_args__ = {'version_id_col': version}
+    # Cuentas de un usuario (listado de usuarios, borrado y filtros por dueño) con su estado
+    __table_args__ = (db.Index('ix_cuenta_usuario_estado', 'usuario_id', 'estado'),)
+    
+    # Tipo del próximo evento de historial si la ruta lo sabe mejor que el cambio (p. ej. una renovación)
+    tipo_evento = None
+    
     def to_dict(self):
         """Convertir objeto a diccionario para JSON"""
         return {
@@ -154,8 +235,375 @@ class Cuenta(db.Model):
             'whatsapp_comprador': self.whatsapp_comprador,
             'fecha_vencimiento': self.fecha_vencimiento.strftime('%Y-%m-%d') if self.fecha_vencimiento else None,
             'usuario_id': self.usuario_id,
+            'version': self.version,
         }
 
+# Plantillas de mensajes de WhatsApp personalizadas por usuario
+class PlantillaMensaje(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    usuario_id = db.Column(db.Integer, db.ForeignKey('usuario.id', ondelete='CASCADE'), nullable=False)
+    tipo = db.Column(db.String(20, collation=get_collation()), nullable=False, default='venta')
+    contenido = db.Column(db.Text(collation=get_collation()), nullable=False)
+    fecha_actualizacion = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    __table_args__ = (db.UniqueConstraint('usuario_id', 'tipo'),)
+
+# Cola de notificaciones salientes (recordatorios de vencimiento)
+class Notificacion(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    # Clave única para no generar dos veces el mismo recordatorio
+    clave_idempotencia = db.Column(db.String(120, collation=get_collation()), unique=True, nullable=False)
+    cuenta_id = db.Column(db.Integer, db.ForeignKey('cuenta.id', ondelete='CASCADE'), nullable=False)
+    usuario_id = db.Column(db.Integer, db.ForeignKey('usuario.id', ondelete='CASCADE'), nullable=False)
+    tipo = db.Column(db.String(20, collation=get_collation()), nullable=False, default='recordatorio')
+    destino = db.Column(db.String(20, collation=get_collation()), nullable=False)
+    mensaje = db.Column(db.Text(collation=get_collation()), nullable=False)
+    estado = db.Column(db.String(20, collation=get_collation()), nullable=False, default='Pendiente', index=True)
+    intentos = db.Column(db.Integer, nullable=False, default=0)
+    # Después de un fallo no se reintenta antes de esta fecha (espera exponencial)
+    proximo_intento = db.Column(db.DateTime)
+    ultimo_error = db.Column(db.Text(collation=get_collation()))
+    fecha_creacion = db.Column(db.DateTime, default=datetime.utcnow)
+    fecha_envio = db.Column(db.DateTime)
+
+# Versión de los datos de cada usuario (usuario_id 0 = todos), para invalidar cachés
+class VersionDatos(db.Model):
+    usuario_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+# Registro de cambios de cuentas para la sincronización incremental (/api/cuentas/changes).
+# El id es el token de sincronización; sin FK para que los borrados queden como lápidas.
+class CambioCuenta(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    cuenta_id = db.Column(db.Integer, nullable=False)
+    usuario_id = db.Column(db.Integer, nullable=False)
+    eliminada = db.Column(db.Boolean, nullable=False, default=False)
+    fecha = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (db.Index('ix_cambio_cuenta_usuario_id', 'usuario_id', 'id'),)
+
+# Historial de solo inserción de las cuentas (ver eventos.py): el alta con la fila completa y
+# después solo las columnas que cambian. usuario_id es el dueño tras el evento y actor_id quien lo hizo.
+class EventoCuenta(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    cuenta_id = db.Column(db.Integer, nullable=False)
+    usuario_id = db.Column(db.Integer, nullable=False)
+    tipo = db.Column(db.SmallInteger, nullable=False)
+    datos = db.Column(db.Text)
+    actor_id = db.Column(db.Integer)
+    fecha = db.Column(db.DateTime, nullable=False, default=datetime.now)
+    
+    __table_args__ = (db.Index('ix_evento_cuenta_cuenta_id', 'cuenta_id', 'id'),)
+
+# Ventas e ingresos por día, dueño y plataforma (rollup para /api/series).
+# Lo mantiene rollups_ventas.py a partir del registro de cambios; nunca se escribe desde las rutas.
+class VentaDiaria(db.Model):
+    dia = db.Column(db.Date, primary_key=True)
+    usuario_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    plataforma = db.Column(db.String(100, collation=get_collation()), primary_key=True)
+    ventas = db.Column(db.Integer, nullable=False, default=0)
+    ingresos = db.Column(db.Float, nullable=False, default=0)
+    # Suma de los días entre fecha_compra y fecha_venta (promedio = dias_en_stock / ventas)
+    dias_en_stock = db.Column(db.Integer, nullable=False, default=0)
+    
+    __table_args__ = (db.Index('ix_venta_diaria_usuario_dia', 'usuario_id', 'dia'),)
+
+# Ventas e ingresos acumulados por comprador (WhatsApp o nombre normalizado) de cada dueño
+class VentaComprador(db.Model):
+    usuario_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    comprador = db.Column(db.String(120, collation=get_collation()), primary_key=True)
+    ventas = db.Column(db.Integer, nullable=False, default=0)
+    ingresos = db.Column(db.Float, nullable=False, default=0)
+
+# Lo que cada cuenta vendida suma hoy en venta_diaria y venta_comprador: al cambiar la cuenta se
+# resta este aporte y se suma el nuevo, así aplicar dos veces el mismo cambio no altera el rollup
+class AporteVenta(db.Model):
+    cuenta_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    dia = db.Column(db.Date, nullable=False)
+    usuario_id = db.Column(db.Integer, nullable=False)
+    plataforma = db.Column(db.String(100, collation=get_collation()), nullable=False)
+    precio = db.Column(db.Float, nullable=False)
+    dias_en_stock = db.Column(db.Integer, nullable=False, default=0)
+    comprador = db.Column(db.String(120, collation=get_collation()))
+
+# Renovaciones por día, dueño y plataforma. A diferencia de las ventas no se pueden deducir
+# del estado de la cuenta: las cuenta extender_vencimiento() en la misma transacción.
+class RenovacionDiaria(db.Model):
+    dia = db.Column(db.Date, primary_key=True)
+    usuario_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    plataforma = db.Column(db.String(100, collation=get_collation()), primary_key=True)
+    renovaciones = db.Column(db.Integer, nullable=False, default=0)
+
+# Último id de cambio_cuenta aplicado por cada proceso incremental
+class EstadoProceso(db.Model):
+    nombre = db.Column(db.String(50), primary_key=True)
+    token = db.Column(db.Integer, nullable=False, default=0)
+    fecha = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+def registrar_cambios_cuentas(conexion, cambios):
+    """Insertar filas en el registro de cambios: [(cuenta_id, usuario_id, eliminada)]"""
+    if cambios:
+        ahora = datetime.utcnow()
+        conexion.execute(CambioCuenta.__table__.insert(), [
+            {'cuenta_id': cuenta_id, 'usuario_id': usuario_id, 'eliminada': eliminada, 'fecha': ahora}
+            for cuenta_id, usuario_id, eliminada in cambios
+        ])
+
+def crear_indices_faltantes():
+    """create_all() no agrega los índices nuevos de tablas que ya existen: crearlos aquí"""
+    for tabla in db.metadata.sorted_tables:
+        for indice in tabla.indexes:
+            indice.create(db.engine, checkfirst=True)
+
+def crear_columnas_faltantes():
+    """create_all() tampoco agrega columnas nuevas a tablas que ya existen: agregar las que admiten NULL"""
+    inspector = db.inspect(db.engine)
+    with db.engine.begin() as conexion:
+        for tabla in db.metadata.sorted_tables:
+            if not inspector.has_table(tabla.name):
+                continue
+            existentes = {columna['name'] for columna in inspector.get_columns(tabla.name)}
+            for columna in tabla.columns:
+                if columna.name not in existentes and columna.nullable:
+                    definicion = CreateColumn(columna).compile(dialect=db.engine.dialect)
+                    conexion.execute(db.text(f'ALTER TABLE {tabla.name} ADD COLUMN {definicion}'))
+
+def insertar_sin_duplicados(tabla, filas, columnas_clave):
+    """INSERT que omite las filas que ya existen por la clave única `columnas_clave`
+    
+    Para inserciones que pueden correr a la vez en varios procesos (cron, workers):
+    comprobar antes e insertar después deja una carrera que acaba en IntegrityError
+    y pierde el lote entero. Retorna cuántas filas se insertaron.
+    """
+    if not filas:
+        return 0
+    dialecto = db.engine.dialect.name
+    if dialecto in ('postgresql', 'sqlite'):
+        insertar = insert_postgresql if dialecto == 'postgresql' else insert_sqlite
+        sentencia = insertar(tabla).on_conflict_do_nothing(index_elements=columnas_clave)
+    elif dialecto in ('mysql', 'mariadb'):
+        sentencia = tabla.insert().prefix_with('IGNORE')
+    else:
+        # Sin sintaxis propia: un savepoint por fila
+        insertadas = 0
+        for fila in filas:
+            try:
+                with db.session.begin_nested():
+                    db.session.execute(tabla.insert(), fila)
+                insertadas += 1
+            except IntegrityError:
+                pass
+        return insertadas
+    resultado = db.session.execute(sentencia, filas)
+    return resultado.rowcount if resultado.rowcount >= 0 else len(filas)
+
+def registrar_eventos(conexion, filas):
+    """Agregar al historial de eventos las filas armadas con eventos.fila_evento()"""
+    if filas:
+        conexion.execute(EventoCuenta.__table__.insert(), filas)
+
+def actor_actual():
+    """Usuario que hace el cambio (None fuera de una petición autenticada)"""
+    if not has_request_context() or not current_user.is_authenticated:
+        return None
+    # La identidad no recarga al usuario aunque un commit anterior lo haya expirado
+    return db.inspect(current_user._get_current_object()).identity[0]
+
+def incrementar_versiones(conexion, usuario_ids=None):
+    """Subir la versión de los usuarios indicados y la global (None = todos)"""
+    tabla = VersionDatos.__table__
+    consulta = tabla.update().values(version=tabla.c.version + 1)
+    if usuario_ids is None:
+        conexion.execute(consulta)
+        return
+    ids = set(usuario_ids) | {0}
+    if conexion.execute(consulta.where(tabla.c.usuario_id.in_(ids))).rowcount == len(ids):
+        return
+    existentes = set(conexion.execute(
+        db.select(tabla.c.usuario_id).where(tabla.c.usuario_id.in_(ids))
+    ).scalars())
+    faltantes = ids - existentes
+    if faltantes:
+        conexion.execute(tabla.insert(), [{'usuario_id': i, 'version': 1} for i in faltantes])
+
+@event.listens_for(db.session, 'after_flush')
+def versionar_cambios(sesion, flush_context):
+    """Cada flush que toca cuentas o usuarios sube la versión de sus dueños y registra los cambios de cuentas"""
+    usuario_ids = set()
+    cambios = []
+    historial = []
+    actor_id = actor_actual() if any(isinstance(objeto, Cuenta) for objeto in sesion) else None
+    for objeto in sesion.new:
+        if isinstance(objeto, Cuenta):
+            cambios.append((objeto.id, objeto.usuario_id, False))
+            historial.append(eventos.fila_evento(objeto.id, objeto.usuario_id, eventos.CREADA,
+                                                 eventos.instantanea(objeto), actor_id))
+    for objeto in sesion.dirty:
+        if isinstance(objeto, Cuenta) and sesion.is_modified(objeto, include_collections=False):
+            cambios.append((objeto.id, objeto.usuario_id, False))
+            # Si cambió de dueño, el anterior debe borrarla de su copia
+            for anterior in db.inspect(objeto).attrs.usuario_id.history.deleted:
+                if anterior is not None and anterior != objeto.usuario_id:
+                    cambios.append((objeto.id, anterior, True))
+                    usuario_ids.add(anterior)
+            datos = eventos.columnas_cambiadas(objeto)
+            if datos:
+                historial.append(eventos.fila_evento(objeto.id, objeto.usuario_id,
+                                                     eventos.tipo_de_cambio(datos, objeto.tipo_evento), datos, actor_id))
+            objeto.tipo_evento = None
+    for objeto in sesion.deleted:
+        if isinstance(objeto, Cuenta):
+            cambios.append((objeto.id, objeto.usuario_id, True))
+            historial.append(eventos.fila_evento(objeto.id, objeto.usuario_id, eventos.ELIMINADA, None, actor_id))
+    for objeto in list(sesion.new) + list(sesion.dirty) + list(sesion.deleted):
+        if isinstance(objeto, Cuenta) and objeto.usuario_id is not None:
+            usuario_ids.add(objeto.usuario_id)
+        elif isinstance(objeto, Usuario) and objeto.id is not None:
+            usuario_ids.add(objeto.id)
+    if usuario_ids:
+        conexion = sesion.connection()
+        # Primero la versión global: su bloqueo de fila ordena las transacciones que escriben,
+        # así los ids del registro de cambios quedan en el mismo orden en que se confirman
+        incrementar_versiones(conexion, usuario_ids)
+        registrar_cambios_cuentas(conexion, cambios)
+        registrar_eventos(conexion, historial)
+
+@event.listens_for(db.session, 'do_orm_execute')
+def versionar_cambios_masivos(estado):
+    """UPDATE/DELETE masivos (Query.update/delete) no pasan por el flush: subir todas las versiones"""
+    if (estado.is_update or estado.is_delete) and estado.bind_mapper is not None \
+            and estado.bind_mapper.class_ in (Cuenta, Usuario):
+        conexion = estado.session.connection()
+        incrementar_versiones(conexion)
+        if estado.bind_mapper.class_ is not Cuenta:
+            return
+        # Dueños de las filas afectadas antes de modificarlas
+        afectadas = db.select(Cuenta.id, Cuenta.usuario_id)
+        if estado.statement.whereclause is not None:
+            afectadas = afectadas.where(estado.statement.whereclause)
+        antes = dict(conexion.execute(afectadas).all())
+        actor_id = actor_actual()
+        if estado.is_delete:
+            registrar_cambios_cuentas(conexion, [(cuenta_id, usuario_id, True) for cuenta_id, usuario_id in antes.items()])
+            registrar_eventos(conexion, [eventos.fila_evento(cuenta_id, usuario_id, eventos.ELIMINADA, None, actor_id)
+                                         for cuenta_id, usuario_id in antes.items()])
+            return
+        resultado = estado.invoke_statement(statement=estado.statement.values(version=Cuenta.version + 1))
+        # Columnas que fija el UPDATE: su valor nuevo (puede ser una expresión) se lee después
+        columnas = [nombre for nombre in (getattr(clave, 'key', clave) for clave in estado.statement._values or {})
+                    if nombre in eventos.COLUMNAS and nombre != 'usuario_id']
+        # Después del UPDATE: si cambió el dueño, lápida para el anterior
+        cambios = []
+        historial = []
+        ids = list(antes)
+        for inicio in range(0, len(ids), 5000):
+            for cuenta_id, usuario_id, *valores in conexion.execute(
+                    db.select(Cuenta.id, Cuenta.usuario_id, *(Cuenta.__table__.c[nombre] for nombre in columnas))
+                    .where(Cuenta.id.in_(ids[inicio:inicio + 5000]))):
+                cambios.append((cuenta_id, usuario_id, False))
+                datos = dict(zip(columnas, map(eventos.serializar, valores)))
+                if antes[cuenta_id] != usuario_id:
+                    cambios.append((cuenta_id, antes[cuenta_id], True))
+                    datos['usuario_id'] = usuario_id
+                historial.append(eventos.fila_evento(cuenta_id, usuario_id, eventos.tipo_de_cambio(datos), datos, actor_id))
+        registrar_cambios_cuentas(conexion, cambios)
+        registrar_eventos(conexion, historial)
+        return resultado
+
+def contexto_fragmentos():
+    """Inquilino y versión de datos para las claves del caché de fragmentos
+    
+    Solo cachea en las vistas con @con_version_fragmentos, que leen la versión
+    antes que los datos.
+    """
+    if not has_request_context() or not current_user.is_authenticated:
+        return None
+    version = g.get('version_datos')
+    if version is None:
+        return None
+    return (current_user.id, current_user.es_admin, version)
+
+# Fragmentos de plantillas ({% cache %}) reutilizados entre peticiones
+cache_fragmentos = CacheFragmentos(contexto_fragmentos)
+cache_fragmentos.init_app(app)
+
+def con_version_fragmentos(vista):
+    """Leer la versión de datos del inquilino antes que sus datos, para el caché de fragmentos
+    
+    Leída al renderizar, una escritura confirmada entre la consulta de los datos
+    y la de la versión dejaría HTML viejo bajo la clave de la versión nueva.
+    """
+    @wraps(vista)
+    def envoltura(*args, **kwargs):
+        alcance = 0 if current_user.es_admin else current_user.id
+        g.version_datos = db.session.query(VersionDatos.version).filter_by(usuario_id=alcance).scalar() or 0
+        return vista(*args, **kwargs)
+    return envoltura
+
+def condicional_por_version(vista):
+    """ETag a partir de la versión global de datos: si el cliente ya tiene esa versión, 304 sin consultar"""
+    @wraps(vista)
+    def envoltura(*args, **kwargs):
+        # La versión se lee antes que los datos: en el peor caso los datos son más nuevos que el ETag
+        version = db.session.query(VersionDatos.version).filter_by(usuario_id=0).scalar() or 0
+        # Con la fecha: los días restantes y los estados por vencer cambian solos cada día.
+        # Con el usuario: la misma URL da otros datos a otro usuario en el mismo navegador
+        usuario = f'{current_user.get_id()}|{getattr(current_user, "es_admin", False)}'
+        etag = hashlib.sha1(
+            f'{request.full_path}|{usuario}|{version}|{date.today()}'.encode('utf-8')
+        ).hexdigest()[:20]
+        if request.if_none_match.contains(etag):
+            respuesta = Response(status=304)
+        else:
+            respuesta = make_response(vista(*args, **kwargs))
+        respuesta.set_etag(etag)
+        respuesta.cache_control.private = True
+        respuesta.cache_control.no_cache = True
+        return respuesta
+    return envoltura
+
+def mutacion_versionada(vista):
+    """Cambios JSON de la PWA sobre una cuenta, con permisos y control de versión
+
+    El cuerpo trae la `version` de la cuenta sobre la que el cliente hizo el
+    cambio (quizás sin conexión, horas antes). Si la fila cambió desde entonces
+    no se aplica nada y se responde 409 con el estado actual para que el
+    cliente lo adopte. La vista recibe (cuenta, datos) y confirma la sesión.
+    """
+    @wraps(vista)
+    def envoltura(id):
+        cuenta = db.session.get(Cuenta, id)
+        if cuenta is None:
+            return jsonify({'error': 'La cuenta ya no existe'}), 404
+        if not current_user.es_admin and cuenta.usuario_id != current_user.id:
+            return jsonify({'error': 'No tienes permisos sobre esta cuenta'}), 403
+        datos = request.get_json(silent=True) or {}
+        version = datos.get('version')
+        if not isinstance(version, int) or isinstance(version, bool):
+            return jsonify({'error': 'Falta la versión de la cuenta'}), 400
+        if version != cuenta.version:
+            return jsonify({'error': 'La cuenta cambió en el servidor', 'cuenta': cuenta.to_dict()}), 409
+        try:
+            return vista(cuenta, datos)
+        except StaleDataError:
+            # Otra petición la modificó entre la lectura y el UPDATE (WHERE version = ...)
+            db.session.rollback()
+            cuenta = db.session.get(Cuenta, id)
+            if cuenta is None:
+                return jsonify({'error': 'La cuenta ya no existe'}), 404
+            return jsonify({'error': 'La cuenta cambió en el servidor', 'cuenta': cuenta.to_dict()}), 409
+    return envoltura
+
+def cargar_valores_sugerencia(usuario_id):
+    """Valores para construir el índice de sugerencias (None = todas las cuentas)"""
+    query = db.session.query(Cuenta.plataforma, Cuenta.nombre_comprador, Cuenta.whatsapp_comprador)
+    if usuario_id is not None:
+        query = query.filter(Cuenta.usuario_id == usuario_id)
+    return query.all()
+
+# Índice en memoria para autocompletar compradores y plataformas
+indice_sugerencias = RegistroIndices(cargar_valores_sugerencia)
+
 @app.route('/login', methods=['GET', 'POST'])
 def login():
     """Página de inicio de sesión"""
@@ -226,6 +674,7 @@ def logout():
 
 @app.route('/')
 @login_required
+@con_version_fragmentos
 def index():
     """Página principal con estadísticas"""
     if current_user.es_admin:
@@ -336,12 +785,17 @@ def index():
                          total_cuentas_por_vencer=total_cuentas_por_vencer,
                          today=today)
 
+# Resultados por página cuando la lista de cuentas viene de una búsqueda
+CUENTAS_POR_PAGINA_BUSQUEDA = 50
+
 @app.route('/cuentas')
 @login_required
+@con_version_fragmentos
 def cuentas():
     """Lista de cuentas"""
     plataforma = request.args.get('plataforma', '')
     estado = request.args.get('estado', '')
+    busqueda = request.args.get('q', '').strip()
     today = datetime.now().date()
     
     if current_user.es_admin:
@@ -389,29 +843,53 @@ def cuentas():
                 # Estados normales (Disponible, Vendida)
                 query = query.filter_by(estado=estado)
     
-    cuentas = query.order_by(Cuenta.fecha_creacion.desc()).all()
+    pagina = paginas = 1
+    if busqueda:
+        # Los filtros van dentro de la búsqueda; se muestra una página en orden de relevancia
+        # y las estadísticas abarcan todas las coincidencias
+        usuario_id = None if current_user.es_admin else current_user.id
+        resumen = resumir_busqueda(db, busqueda, usuario_id, plataforma, estado, today)
+        paginas = max(1, -(-resumen['total'] // CUENTAS_POR_PAGINA_BUSQUEDA))
+        pagina = min(max(1, request.args.get('pagina', 1, type=int)), paginas)
+        cuentas = []
+        if resumen['total']:
+            ids, _ = buscar_cuentas(db, busqueda, usuario_id, pagina, CUENTAS_POR_PAGINA_BUSQUEDA,
+                                    plataforma, estado, today, contar=False)
+            posiciones = {id_cuenta: i for i, id_cuenta in enumerate(ids)}
+            cuentas = sorted(Cuenta.query.filter(Cuenta.id.in_(ids)).all(), key=lambda c: posiciones[c.id])
+        total_cuentas = resumen['total']
+        cuentas_disponibles = resumen['disponibles']
+        cuentas_vendidas = resumen['vendidas']
+        cuentas_por_vencer = resumen['por_vencer']
+        cuentas_vencidas = resumen['vencidas']
+        valor_total_ventas = resumen['valor_ventas']
+    else:
+        cuentas = query.order_by(Cuenta.fecha_creacion.desc()).all()
+        
+        # Calcular estadísticas completas
+        total_cuentas = len(cuentas)
+        cuentas_disponibles = len([c for c in cuentas if c.estado == 'Disponible'])
+        cuentas_vendidas = len([c for c in cuentas if c.estado == 'Vendida'])
+        
+        # Calcular cuentas por vencer y vencidas
+        cuentas_por_vencer = len([c for c in cuentas if c.fecha_vencimiento and 
+                                  c.fecha_vencimiento >= today and 
+                                  c.fecha_vencimiento <= today + timedelta(days=7)])
+        cuentas_vencidas = len([c for c in cuentas if c.fecha_vencimiento and 
+                               c.fecha_vencimiento < today])
+        
+        # Calcular valor total de las ventas
+        valor_total_ventas = sum(c.precio for c in cuentas if c.estado == 'Vendida')
     plataformas_disponibles = db.session.query(Cuenta.plataforma).distinct().all()
     
-    # Calcular estadísticas completas
-    total_cuentas = len(cuentas)
-    cuentas_disponibles = len([c for c in cuentas if c.estado == 'Disponible'])
-    cuentas_vendidas = len([c for c in cuentas if c.estado == 'Vendida'])
-    
-    # Calcular cuentas por vencer y vencidas
-    cuentas_por_vencer = len([c for c in cuentas if c.fecha_vencimiento and 
-                              c.fecha_vencimiento >= today and 
-                              c.fecha_vencimiento <= today + timedelta(days=7)])
-    cuentas_vencidas = len([c for c in cuentas if c.fecha_vencimiento and 
-                           c.fecha_vencimiento < today])
-    
-    # Calcular valor total de las ventas
-    valor_total_ventas = sum(c.precio for c in cuentas if c.estado == 'Vendida')
-    
     return render_template('cuentas.html', 
                          cuentas=cuentas, 
                          plataformas_disponibles=plataformas_disponibles,
                          filtro_estado=estado,
                          filtro_plataforma=plataforma,
+                         busqueda=busqueda,
+                         pagina=pagina,
+                         paginas=paginas,
                          total_cuentas=total_cuentas,
                          cuentas_disponibles=cuentas_disponibles,
                          cuentas_vendidas=cuentas_vendidas,
@@ -449,6 +927,7 @@ def nueva_cuenta():
         
         db.session.add(nueva_cuenta)
         db.session.commit()
+        indice_sugerencias.actualizar(current_user.id, None, valores_sugerencia(nueva_cuenta))
         
         flash('Cuenta agregada correctamente', 'success')
         return redirect(url_for('cuentas'))
@@ -476,6 +955,7 @@ def editar_cuenta(id):
         
         # Permitir correos duplicados - múltiples cuentas pueden tener el mismo email
         
+        valores_anteriores = valores_sugerencia(cuenta)
         cuenta.plataforma = plataforma
         cuenta.email = email
         cuenta.password = password
@@ -484,6 +964,7 @@ def editar_cuenta(id):
         cuenta.notas = request.form.get('notas', '')
         
         db.session.commit()
+        indice_sugerencias.actualizar(cuenta.usuario_id, valores_anteriores, valores_sugerencia(cuenta))
         flash('Cuenta actualizada correctamente', 'success')
         return redirect(url_for('cuentas'))
     
@@ -491,6 +972,7 @@ def editar_cuenta(id):
 
 @app.route('/ver_cuenta/<int:id>')
 @login_required
+@con_version_fragmentos
 def ver_cuenta(id):
     """Ver detalles de una cuenta"""
     cuenta = Cuenta.query.get_or_404(id)
@@ -526,13 +1008,11 @@ def vender_cuenta(id):
                     fecha_vencimiento = datetime.strptime(fecha_vencimiento, '%Y-%m-%d').date()
                 
                 # Actualizar cuenta
-                cuenta.estado = 'Vendida'
-                cuenta.fecha_venta = datetime.now()
-                cuenta.nombre_comprador = nombre_comprador
-                cuenta.whatsapp_comprador = whatsapp_comprador
-                cuenta.fecha_vencimiento = fecha_vencimiento
+                valores_anteriores = valores_sugerencia(cuenta)
+                marcar_vendida(cuenta, nombre_comprador, whatsapp_comprador, fecha_vencimiento or None)
                 
                 db.session.commit()
+                indice_sugerencias.actualizar(cuenta.usuario_id, valores_anteriores, valores_sugerencia(cuenta))
                 
                 flash('Cuenta marcada como vendida correctamente', 'success')
                 return redirect(url_for('ver_cuenta', id=id))
@@ -548,29 +1028,51 @@ def vender_cuenta(id):
         flash('La cuenta no está disponible para la venta', 'error')
         return redirect(url_for('ver_cuenta', id=id))
 
-def generar_mensaje_whatsapp(cuenta):
-    """Genera el mensaje de WhatsApp con los datos de la cuenta vendida"""
-    mensaje = f"""🎉 *¡Tu cuenta de {cuenta.plataforma} está lista!*
-
-📱 *Plataforma:* {cuenta.plataforma}
-📧 *Email:* {cuenta.email}
-🔑 *Contraseña:* {cuenta.password}
-🎬 *Plataforma:* {cuenta.plataforma}
-📅 *Fecha de compra:* {cuenta.fecha_venta.strftime('%d/%m/%Y')}
-⏰ *Vencimiento:* {cuenta.fecha_vencimiento.strftime('%d/%m/%Y')}
+def marcar_vendida(cuenta, nombre_comprador, whatsapp_comprador, fecha_vencimiento=None, fecha_venta=None):
+    """Pasar la cuenta a Vendida con los datos del comprador (sin confirmar la sesión)"""
+    cuenta.estado = 'Vendida'
+    cuenta.fecha_venta = fecha_venta or datetime.now()
+    cuenta.nombre_comprador = nombre_comprador
+    cuenta.whatsapp_comprador = whatsapp_comprador
+    cuenta.fecha_vencimiento = fecha_vencimiento
 
-✅ *Estado:* Cuenta activa y funcional
+def extender_vencimiento(cuenta, meses=1):
+    """Sumar meses a la fecha de vencimiento (sin confirmar la sesión); retorna la nueva fecha"""
+    from dateutil.relativedelta import relativedelta
+    cuenta.fecha_vencimiento = cuenta.fecha_vencimiento + relativedelta(months=meses)
+    cuenta.tipo_evento = eventos.RENOVADA
+    registrar_renovacion(cuenta)
+    return cuenta.fecha_vencimiento
 
-⚠️ *Importante:* 
-• Guarda estos datos en un lugar seguro
-• No compartas la contraseña con nadie
-• La cuenta vence el {cuenta.fecha_vencimiento.strftime('%d/%m/%Y')}
+def registrar_renovacion(cuenta, dia=None):
+    """Sumar una renovación al rollup renovacion_diaria (en la transacción de la sesión)
+    
+    Es un upsert en una sola sentencia: con UPDATE y luego INSERT, dos renovaciones
+    simultáneas de la primera del día chocaban en la clave y se perdía la renovación.
+    """
+    tabla = RenovacionDiaria.__table__
+    clave = {'dia': dia or date.today(), 'usuario_id': cuenta.usuario_id, 'plataforma': cuenta.plataforma}
+    sumar = {'renovaciones': tabla.c.renovaciones + 1}
+    dialecto = db.engine.dialect.name
+    if dialecto in ('postgresql', 'sqlite'):
+        insertar = insert_postgresql if dialecto == 'postgresql' else insert_sqlite
+        db.session.execute(insertar(tabla).values(renovaciones=1, **clave).on_conflict_do_update(
+            index_elements=list(clave), set_=sumar))
+    elif dialecto in ('mysql', 'mariadb'):
+        db.session.execute(insert_mysql(tabla).values(renovaciones=1, **clave).on_duplicate_key_update(**sumar))
+    else:
+        condicion = db.and_(*(tabla.c[columna] == valor for columna, valor in clave.items()))
+        if db.session.execute(tabla.update().where(condicion).values(**sumar)).rowcount == 0:
+            db.session.execute(tabla.insert().values(renovaciones=1, **clave))
 
-🆘 Si tienes algún problema, contáctanos.
+def generar_mensaje_whatsapp(cuenta, plantilla=None):
+    """Genera el mensaje de WhatsApp con los datos de la cuenta vendida"""
+    return renderizar_mensaje(cuenta, 'venta', plantilla)
 
-¡Disfruta de tu cuenta! 🎬"""
-    
-    return mensaje
+def obtener_plantilla_usuario(usuario_id, tipo='venta'):
+    """Retorna el texto de la plantilla personalizada del usuario (o None)"""
+    plantilla = PlantillaMensaje.query.filter_by(usuario_id=usuario_id, tipo=tipo).first()
+    return plantilla.contenido if plantilla else None
 
 @app.route('/cuentas/<int:id>/renovar', methods=['POST'])
 @login_required
@@ -589,13 +1091,8 @@ def renovar_cuenta(id):
         return redirect(url_for('cuentas'))
     
     try:
-        # Calcular nueva fecha de vencimiento (un mes más)
-        from dateutil.relativedelta import relativedelta
-        
-        nueva_fecha_vencimiento = cuenta.fecha_vencimiento + relativedelta(months=1)
-        
-        # Actualizar la cuenta
-        cuenta.fecha_vencimiento = nueva_fecha_vencimiento
+        # Nueva fecha de vencimiento (un mes más)
+        nueva_fecha_vencimiento = extender_vencimiento(cuenta)
         
         db.session.commit()
         
@@ -619,8 +1116,10 @@ def eliminar_cuenta(id):
         return redirect(url_for('cuentas'))
     
     try:
+        usuario_id, valores_anteriores = cuenta.usuario_id, valores_sugerencia(cuenta)
         db.session.delete(cuenta)
         db.session.commit()
+        indice_sugerencias.actualizar(usuario_id, valores_anteriores, None)
         flash('🗑️ Cuenta eliminada exitosamente', 'success')
         return redirect(url_for('cuentas'))
     except Exception as e:
@@ -630,12 +1129,14 @@ def eliminar_cuenta(id):
 
 @app.route('/api/estadisticas')
 @login_required
+@condicional_por_version
 def api_estadisticas():
     """API para obtener estadísticas en formato JSON"""
     total_cuentas = Cuenta.query.count()
     cuentas_disponibles = Cuenta.query.filter_by(estado='Disponible').count()
     cuentas_vendidas = Cuenta.query.filter_by(estado='Vendida').count()
-    # Valor total eliminado - ya no se usa el campo precio
+    # Valor del inventario (cuentas disponibles), igual que en el panel principal
+    valor_total = db.session.query(db.func.sum(Cuenta.precio)).filter_by(estado='Disponible').scalar() or 0
     
     plataformas = db.session.query(
         Cuenta.plataforma, 
@@ -650,16 +1151,130 @@ def api_estadisticas():
         'plataformas': [{'plataforma': p.plataforma, 'cantidad': p.cantidad} for p in plataformas]
     })
 
+# Usuarios por página en la gestión de usuarios
+USUARIOS_POR_PAGINA = 24
+# Importación de usuarios: filas por INSERT/commit y contraseña por defecto de los importados
+USUARIOS_POR_LOTE = 500
+CONTRASENA_IMPORTACION = 'password123'
+
+def leer_cursor_usuarios(valor):
+    """Convertir un cursor '<id>:<username>' de la lista de usuarios en (username, id)"""
+    identificador, separador, username = (valor or '').partition(':')
+    if not separador or not identificador.isdigit():
+        return None
+    return username, int(identificador)
+
+def cursor_usuarios(usuario):
+    """Cursor '<id>:<username>' que apunta a un usuario de la lista"""
+    return f'{usuario.id}:{usuario.username}'
+
 @app.route('/usuarios')
 @login_required
 def usuarios():
-    """Lista de usuarios (solo para administradores)"""
+    """Lista de usuarios (solo para administradores)
+    
+    Paginada por cursor sobre (username, id): ?despues= trae la página siguiente
+    al usuario indicado y ?antes= la anterior, sin recorrer las filas saltadas
+    como haría un OFFSET.
+    """
     if not current_user.es_admin:
         flash('No tienes permisos para acceder a esta página', 'error')
         return redirect(url_for('index'))
     
-    usuarios = Usuario.query.order_by(Usuario.fecha_creacion.desc()).all()
-    return render_template('usuarios.html', usuarios=usuarios)
+    busqueda = request.args.get('q', '').strip()
+    filtros = []
+    if busqueda:
+        patron = f'%{escapar_like(busqueda.lower())}%'
+        filtros.append(db.or_(db.func.lower(Usuario.username).like(patron, escape='\\'),
+                              db.func.lower(Usuario.email).like(patron, escape='\\')))
+    total = db.session.query(db.func.count(Usuario.id)).filter(*filtros).scalar()
+    
+    # Hacia atrás se recorre el orden invertido y luego se da vuelta la página
+    despues = leer_cursor_usuarios(request.args.get('despues'))
+    antes = None if despues else leer_cursor_usuarios(request.args.get('antes'))
+    clave = db.tuple_(Usuario.username, Usuario.id)
+    if despues:
+        filtros.append(clave > despues)
+    elif antes:
+        filtros.append(clave < antes)
+    orden = (Usuario.username.desc(), Usuario.id.desc()) if antes else (Usuario.username, Usuario.id)
+    
+    # Primero la página de usuarios (más uno, para saber si hay otra) y después el JOIN:
+    # solo se agregan las cuentas de esos usuarios
+    en_pagina = db.session.query(Usuario).filter(*filtros).order_by(*orden) \
+        .limit(USUARIOS_POR_PAGINA + 1).subquery()
+    usuario = db.aliased(Usuario, en_pagina)
+    disponible = Cuenta.estado == 'Disponible'
+    vendida = Cuenta.estado == 'Vendida'
+    filas = db.session.query(
+        usuario,
+        db.func.count(Cuenta.id),
+        db.func.coalesce(db.func.sum(db.case((disponible, 1), else_=0)), 0),
+        db.func.coalesce(db.func.sum(db.case((vendida, 1), else_=0)), 0),
+        db.func.coalesce(db.func.sum(db.case((disponible, Cuenta.precio), else_=0)), 0),
+        db.func.coalesce(db.func.sum(db.case((vendida, Cuenta.precio), else_=0)), 0),
+    ).outerjoin(Cuenta, Cuenta.usuario_id == usuario.id) \
+        .group_by(*en_pagina.c) \
+        .order_by(*((usuario.username.desc(), usuario.id.desc()) if antes else (usuario.username, usuario.id))).all()
+    hay_mas = len(filas) > USUARIOS_POR_PAGINA
+    filas = filas[:USUARIOS_POR_PAGINA]
+    if antes:
+        filas.reverse()
+    usuarios = [(fila[0], {
+        'cuentas': fila[1], 'disponibles': int(fila[2]), 'vendidas': int(fila[3]),
+        'valor_inventario': float(fila[4]), 'valor_ventas': float(fila[5]),
+    }) for fila in filas]
+    # Si se llegó con ?antes= hay página siguiente; si se llegó con ?despues=, anterior
+    hay_anterior, hay_siguiente = (hay_mas, True) if antes else (bool(despues), hay_mas)
+    anterior = cursor_usuarios(usuarios[0][0]) if usuarios and hay_anterior else None
+    siguiente = cursor_usuarios(usuarios[-1][0]) if usuarios and hay_siguiente else None
+    return render_template('usuarios.html', usuarios=usuarios, total=total,
+                         anterior=anterior, siguiente=siguiente, busqueda=busqueda)
+
+@app.route('/usuarios/consultas-lentas')
+@login_required
+def ver_consultas_lentas():
+    """Consultas lentas registradas en este worker (solo para administradores)"""
+    if not current_user.es_admin:
+        flash('No tienes permisos para acceder a esta página', 'error')
+        return redirect(url_for('index'))
+    
+    return render_template('consultas_lentas.html',
+                         registros=consultas_lentas.listar(),
+                         umbral_ms=consultas_lentas.umbral_ms,
+                         analizar=consultas_lentas.analizar,
+                         pid=os.getpid())
+
+@app.route('/reportes')
+@login_required
+def reportes():
+    """Reporte de analítica de ventas (solo para administradores)"""
+    if not current_user.es_admin:
+        flash('No tienes permisos para acceder a esta página', 'error')
+        return redirect(url_for('index'))
+    
+    dias = dias_analitica()
+    if dias is None:
+        flash(f'El periodo debe estar entre {MIN_DIAS} y {MAX_DIAS} días', 'error')
+        return redirect(url_for('reportes'))
+    usuario_id = request.args.get('usuario_id', type=int)
+    return render_template('reportes.html',
+                         analitica=analitica_ventas(db, usuario_id=usuario_id, dias=dias),
+                         usuarios=db.session.query(Usuario.id, Usuario.username).order_by(Usuario.username).all(),
+                         usuario_id=usuario_id,
+                         periodos=(30, DIAS_POR_DEFECTO, 180, 365))
+
+@app.route('/usuarios/consultas-lentas/limpiar', methods=['POST'])
+@login_required
+def limpiar_consultas_lentas():
+    """Vaciar el registro de consultas lentas (solo para administradores)"""
+    if not current_user.es_admin:
+        flash('No tienes permisos para realizar esta acción', 'error')
+        return redirect(url_for('index'))
+    
+    consultas_lentas.limpiar()
+    flash('Registro de consultas lentas vaciado', 'success')
+    return redirect(url_for('ver_consultas_lentas'))
 
 @app.route('/usuarios/nuevo', methods=['GET', 'POST'])
 @login_required
@@ -756,40 +1371,62 @@ def editar_usuario(id):
 @app.route('/usuarios/<int:id>/eliminar', methods=['POST'])
 @login_required
 def eliminar_usuario(id):
-    """Eliminar usuario (solo para administradores)"""
-    print(f"DEBUG: Intento de eliminar usuario ID: {id}")
-    print(f"DEBUG: Usuario actual: {current_user.username}, es_admin: {current_user.es_admin}")
-    
+    """Eliminar usuario (solo para administradores)
+    
+    Si tiene cuentas hay que indicar qué hacer con ellas en el campo `cuentas`:
+    'reasignar' a otro usuario (`destino`, su nombre de usuario) o 'eliminar'.
+    Se mueven o borran con un solo UPDATE/DELETE masivo, que los hooks registran
+    en el historial, así que las consultas no dependen de cuántas cuentas tenga.
+    Plantillas y notificaciones del usuario las borra el ON DELETE CASCADE.
+    """
     if not current_user.es_admin:
-        print("DEBUG: Usuario no es administrador")
         flash('No tienes permisos para realizar esta acción', 'error')
         return redirect(url_for('index'))
     
     usuario = Usuario.query.get_or_404(id)
-    print(f"DEBUG: Usuario encontrado: {usuario.username}")
     
     # No permitir eliminar el propio usuario
     if usuario.id == current_user.id:
-        print("DEBUG: Intento de eliminar propio usuario")
         flash('No puedes eliminar tu propio usuario', 'error')
         return redirect(url_for('usuarios'))
     
-    # Verificar si el usuario tiene cuentas
-    if usuario.cuentas:
-        print(f"DEBUG: Usuario tiene {len(usuario.cuentas)} cuentas asociadas")
-        flash('No se puede eliminar un usuario que tiene cuentas asociadas', 'error')
-        return redirect(url_for('usuarios'))
+    accion = request.form.get('cuentas')
+    tiene_cuentas = db.session.query(db.exists().where(Cuenta.usuario_id == usuario.id)).scalar()
+    destino = None
+    if tiene_cuentas:
+        if accion == 'reasignar':
+            destino = Usuario.query.filter_by(username=request.form.get('destino', '').strip()).first()
+            if destino is None or destino.id == usuario.id:
+                flash('Indica un usuario existente (distinto del que se elimina) para recibir las cuentas', 'error')
+                return redirect(url_for('usuarios'))
+        elif accion != 'eliminar':
+            flash('El usuario tiene cuentas asociadas: elige si reasignarlas a otro usuario o eliminarlas', 'error')
+            return redirect(url_for('usuarios'))
     
     try:
+        cuentas_usuario = Cuenta.query.filter(Cuenta.usuario_id == usuario.id)
+        if destino is not None:
+            afectadas = cuentas_usuario.update({Cuenta.usuario_id: destino.id}, synchronize_session=False)
+        elif tiene_cuentas:
+            afectadas = cuentas_usuario.delete(synchronize_session=False)
+        else:
+            afectadas = 0
         db.session.delete(usuario)
         db.session.commit()
-        print(f"DEBUG: Usuario {usuario.username} eliminado exitosamente")
-        flash('Usuario eliminado correctamente', 'success')
     except Exception as e:
-        print(f"DEBUG: Error al eliminar usuario: {str(e)}")
         db.session.rollback()
+        print(f"❌ Error al eliminar el usuario {id}: {e}")
         flash('Error al eliminar el usuario', 'error')
+        return redirect(url_for('usuarios'))
     
+    if destino is not None:
+        indice_sugerencias.invalidar(usuario.id, destino.id)
+        flash(f'Usuario eliminado; {afectadas} cuentas reasignadas a {destino.username}', 'success')
+    elif afectadas:
+        indice_sugerencias.invalidar(usuario.id, None)
+        flash(f'Usuario eliminado junto con sus {afectadas} cuentas', 'success')
+    else:
+        flash('Usuario eliminado correctamente', 'success')
     return redirect(url_for('usuarios'))
 
 @app.route('/test_eliminacion')
@@ -803,8 +1440,14 @@ def apk():
     """Página para crear APK de la aplicación"""
     return render_template('apk.html')
 
+@app.route('/sw.js')
+def service_worker():
+    """Service worker en la raíz para que controle toda la aplicación"""
+    return recursos_estaticos.service_worker()
+
 @app.route('/api/cuentas')
 @login_required
+@condicional_por_version
 def api_cuentas():
     """API para obtener cuentas en formato JSON"""
     estado = request.args.get('estado', '')
@@ -820,6 +1463,331 @@ def api_cuentas():
     cuentas = query.order_by(Cuenta.fecha_creacion.desc()).all()
     return jsonify([cuenta.to_dict() for cuenta in cuentas])
 
+@app.route('/api/cuentas/changes')
+@login_required
+def api_cuentas_cambios():
+    """Cambios de cuentas posteriores al token `since` (0 = sincronización completa)
+
+    Devuelve las cuentas creadas o modificadas con su estado actual y los ids
+    borrados (o que dejaron de ser del usuario). Si `hay_mas` es verdadero el
+    cliente debe volver a pedir con since=version.
+    """
+    since = request.args.get('since', 0, type=int)
+    limite = max(1, min(request.args.get('limite', 1000, type=int), 5000))
+    
+    consulta = db.session.query(CambioCuenta.id, CambioCuenta.cuenta_id).filter(CambioCuenta.id > since)
+    if not current_user.es_admin:
+        consulta = consulta.filter(CambioCuenta.usuario_id == current_user.id)
+    filas = consulta.order_by(CambioCuenta.id).limit(limite + 1).all()
+    hay_mas = len(filas) > limite
+    filas = filas[:limite]
+    
+    # El estado final lo da la tabla de cuentas: lo que ya no existe (o no es del usuario) es una lápida
+    ids = {fila.cuenta_id for fila in filas}
+    cuentas = []
+    if ids:
+        query = Cuenta.query.filter(Cuenta.id.in_(ids))
+        if not current_user.es_admin:
+            query = query.filter(Cuenta.usuario_id == current_user.id)
+        cuentas = query.order_by(Cuenta.id).all()
+    encontradas = {cuenta.id for cuenta in cuentas}
+    
+    return jsonify({
+        'since': since,
+        'version': filas[-1].id if filas else since,
+        'hay_mas': hay_mas,
+        'cuentas': [cuenta.to_dict() for cuenta in cuentas],
+        'eliminadas': sorted(ids - encontradas)
+    })
+
+@app.route('/api/cuentas/<int:id>/vender', methods=['POST'])
+@login_required
+@mutacion_versionada
+def api_vender_cuenta(cuenta, datos):
+    """Vender una cuenta desde la PWA (también las ventas hechas sin conexión)"""
+    if cuenta.estado != 'Disponible':
+        return jsonify({'error': 'La cuenta no está disponible para la venta', 'cuenta': cuenta.to_dict()}), 409
+    
+    nombre_comprador = (datos.get('nombre_comprador') or '').strip()
+    whatsapp_comprador = (datos.get('whatsapp_comprador') or '').strip()
+    if not nombre_comprador or not whatsapp_comprador:
+        return jsonify({'error': 'Debes completar todos los campos obligatorios'}), 400
+    try:
+        fecha_vencimiento = datos.get('fecha_vencimiento')
+        fecha_vencimiento = datetime.strptime(fecha_vencimiento, '%Y-%m-%d').date() if fecha_vencimiento else None
+        # Hora local del dispositivo en que se hizo la venta (puede haber sido sin conexión)
+        fecha_venta = datos.get('fecha_venta')
+        fecha_venta = min(datetime.strptime(fecha_venta, '%Y-%m-%dT%H:%M:%S'), datetime.now()) if fecha_venta else None
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Formato de fecha inválido'}), 400
+    
+    valores_anteriores = valores_sugerencia(cuenta)
+    marcar_vendida(cuenta, nombre_comprador, whatsapp_comprador, fecha_vencimiento, fecha_venta)
+    db.session.commit()
+    indice_sugerencias.actualizar(cuenta.usuario_id, valores_anteriores, valores_sugerencia(cuenta))
+    return jsonify({'cuenta': cuenta.to_dict()})
+
+@app.route('/api/cuentas/<int:id>/renovar', methods=['POST'])
+@login_required
+@mutacion_versionada
+def api_renovar_cuenta(cuenta, datos):
+    """Renovar una cuenta un mes desde la PWA"""
+    if not cuenta.fecha_vencimiento:
+        return jsonify({'error': 'Esta cuenta no tiene fecha de vencimiento configurada', 'cuenta': cuenta.to_dict()}), 409
+    extender_vencimiento(cuenta)
+    db.session.commit()
+    return jsonify({'cuenta': cuenta.to_dict()})
+
+@app.route('/api/cuentas/<int:id>/eventos')
+@login_required
+def api_eventos_cuenta(id):
+    """Historial de eventos de una cuenta, del más antiguo al más reciente
+
+    Los administradores también ven el de cuentas eliminadas; los demás
+    usuarios solo el de sus cuentas actuales.
+    """
+    if not current_user.es_admin:
+        cuenta = db.session.get(Cuenta, id)
+        if cuenta is None or cuenta.usuario_id != current_user.id:
+            return jsonify({'error': 'Cuenta no encontrada'}), 404
+    filas = EventoCuenta.query.filter_by(cuenta_id=id).order_by(EventoCuenta.id).all()
+    if not filas:
+        return jsonify({'error': 'Cuenta no encontrada'}), 404
+    return jsonify({'eventos': [{
+        'id': fila.id,
+        'tipo': eventos.NOMBRES_TIPO.get(fila.tipo, fila.tipo),
+        'usuario_id': fila.usuario_id,
+        'actor_id': fila.actor_id,
+        'fecha': fila.fecha.strftime('%Y-%m-%d %H:%M:%S'),
+        'datos': json.loads(fila.datos) if fila.datos else None,
+    } for fila in filas]})
+
+# Agrupaciones de /api/series y cuánto historial se permite pedir de una vez
+AGRUPACIONES_SERIES = ('dia', 'semana', 'mes')
+MAX_DIAS_SERIES = 3660
+
+def inicio_periodo(dia, agrupar):
+    """Primer día del periodo (día, semana que empieza el lunes o mes) que contiene `dia`"""
+    if agrupar == 'semana':
+        return dia - timedelta(days=dia.weekday())
+    if agrupar == 'mes':
+        return dia.replace(day=1)
+    return dia
+
+def siguiente_periodo(inicio, agrupar):
+    if agrupar == 'semana':
+        return inicio + timedelta(days=7)
+    if agrupar == 'mes':
+        return (inicio + timedelta(days=32)).replace(day=1)
+    return inicio + timedelta(days=1)
+
+@app.route('/api/series')
+@login_required
+def api_series():
+    """Ventas e ingresos por periodo y plataforma, para los gráficos del dashboard
+
+    Parámetros: agrupar (dia, semana o mes), desde y hasta (YYYY-MM-DD; por
+    defecto el último año) y plataforma. Se lee del rollup venta_diaria con
+    una sola consulta: a lo sumo una fila por día y plataforma.
+    """
+    agrupar = request.args.get('agrupar', 'dia')
+    if agrupar not in AGRUPACIONES_SERIES:
+        return jsonify({'error': f'agrupar debe ser uno de: {", ".join(AGRUPACIONES_SERIES)}'}), 400
+    try:
+        hasta = request.args.get('hasta')
+        hasta = datetime.strptime(hasta, '%Y-%m-%d').date() if hasta else date.today()
+        desde = request.args.get('desde')
+        desde = datetime.strptime(desde, '%Y-%m-%d').date() if desde else hasta - timedelta(days=364)
+    except ValueError:
+        return jsonify({'error': 'Formato de fecha inválido (YYYY-MM-DD)'}), 400
+    if desde > hasta or (hasta - desde).days > MAX_DIAS_SERIES:
+        return jsonify({'error': f'Rango de fechas inválido (máximo {MAX_DIAS_SERIES} días)'}), 400
+    plataforma = request.args.get('plataforma', '')
+    
+    consulta = db.session.query(
+        VentaDiaria.dia, VentaDiaria.plataforma,
+        db.func.sum(VentaDiaria.ventas), db.func.sum(VentaDiaria.ingresos)
+    ).filter(VentaDiaria.dia >= desde, VentaDiaria.dia <= hasta)
+    if not current_user.es_admin:
+        consulta = consulta.filter(VentaDiaria.usuario_id == current_user.id)
+    if plataforma:
+        consulta = consulta.filter(VentaDiaria.plataforma == plataforma)
+    filas = consulta.group_by(VentaDiaria.dia, VentaDiaria.plataforma).all()
+    
+    # Periodos contiguos (con ceros) para que todas las series compartan las etiquetas del eje
+    periodos = []
+    inicio = inicio_periodo(desde, agrupar)
+    while inicio <= hasta:
+        periodos.append(inicio)
+        inicio = siguiente_periodo(inicio, agrupar)
+    posicion = {periodo: i for i, periodo in enumerate(periodos)}
+    
+    series = {}
+    for dia, nombre, ventas, ingresos in filas:
+        serie = series.setdefault(nombre, {'plataforma': nombre, 'ventas': [0] * len(periodos), 'ingresos': [0.0] * len(periodos)})
+        i = posicion[inicio_periodo(dia, agrupar)]
+        serie['ventas'][i] += int(ventas)
+        serie['ingresos'][i] += float(ingresos)
+    for serie in series.values():
+        serie['ingresos'] = [round(valor, 2) for valor in serie['ingresos']]
+    
+    formato = '%Y-%m' if agrupar == 'mes' else '%Y-%m-%d'
+    return jsonify({
+        'agrupar': agrupar,
+        'desde': desde.isoformat(),
+        'hasta': hasta.isoformat(),
+        'periodos': [periodo.strftime(formato) for periodo in periodos],
+        'series': sorted(series.values(), key=lambda serie: -sum(serie['ventas'])),
+        'totales': {
+            'ventas': [sum(serie['ventas'][i] for serie in series.values()) for i in range(len(periodos))],
+            'ingresos': [round(sum(serie['ingresos'][i] for serie in series.values()), 2) for i in range(len(periodos))],
+        }
+    })
+
+def dias_analitica():
+    """Ventana de la analítica pedida en ?dias=, o None si está fuera de rango"""
+    dias = request.args.get('dias', DIAS_POR_DEFECTO, type=int)
+    return dias if MIN_DIAS <= dias <= MAX_DIAS else None
+
+@app.route('/api/analitica')
+@login_required
+def api_analitica():
+    """Velocidad de venta, días hasta la venta, tasa de renovación e ingresos por comprador
+    
+    Parámetros: dias (ventana que termina hoy) y, para administradores,
+    usuario_id (por defecto todos). Se calcula solo con los rollups.
+    """
+    dias = dias_analitica()
+    if dias is None:
+        return jsonify({'error': f'dias debe estar entre {MIN_DIAS} y {MAX_DIAS}'}), 400
+    usuario_id = request.args.get('usuario_id', type=int) if current_user.es_admin else current_user.id
+    return jsonify(analitica_ventas(db, usuario_id=usuario_id, dias=dias))
+
+@app.route('/api/buscar')
+@login_required
+def api_buscar():
+    """API de búsqueda por email, notas, nombre o WhatsApp del comprador"""
+    texto = request.args.get('q', '').strip()
+    pagina = request.args.get('pagina', 1, type=int)
+    por_pagina = request.args.get('por_pagina', 20, type=int)
+    
+    if not texto:
+        return jsonify({'error': 'Debes indicar el texto a buscar (q)'}), 400
+    
+    ids, total = buscar_cuentas(
+        db, texto,
+        usuario_id=None if current_user.es_admin else current_user.id,
+        pagina=pagina,
+        por_pagina=por_pagina
+    )
+    
+    # Cargar las cuentas de la página manteniendo el orden por relevancia
+    cuentas_por_id = {c.id: c for c in Cuenta.query.filter(Cuenta.id.in_(ids)).all()} if ids else {}
+    
+    return jsonify({
+        'q': texto,
+        'total': total,
+        'pagina': max(1, pagina),
+        'por_pagina': max(1, min(por_pagina, 100)),
+        'resultados': [cuentas_por_id[i].to_dict() for i in ids if i in cuentas_por_id]
+    })
+
+@app.route('/api/rendimiento')
+@login_required
+def api_rendimiento():
+    """API con tiempos y consultas por endpoint de este worker (solo para administradores)"""
+    if not current_user.es_admin:
+        return jsonify({'error': 'No tienes permisos para acceder a esta información'}), 403
+    
+    return jsonify({
+        'pid': os.getpid(),
+        'endpoints': instrumentacion.resumen(),
+        'cache_fragmentos': cache_fragmentos.estadisticas()
+    })
+
+@app.route('/api/perfil-cpu', methods=['GET', 'POST'])
+@login_required
+def api_perfil_cpu():
+    """API para activar el perfilador de CPU por muestreo y ver los perfiles guardados (solo para administradores)"""
+    if not current_user.es_admin:
+        return jsonify({'error': 'No tienes permisos para acceder a esta información'}), 403
+    
+    if request.method == 'POST':
+        try:
+            perfil_cpu.guardar_configuracion(request.get_json(silent=True) or {})
+        except (TypeError, ValueError) as e:
+            return jsonify({'error': str(e)}), 400
+    
+    return jsonify({'configuracion': perfil_cpu.configuracion(), 'perfiles': perfil_cpu.archivos()})
+
+@app.route('/api/perfil-cpu/<path:archivo>')
+@login_required
+def descargar_perfil_cpu(archivo):
+    """Descargar un perfil (.folded para flamegraph.pl/speedscope o .speedscope.json)"""
+    if not current_user.es_admin:
+        return jsonify({'error': 'No tienes permisos para acceder a esta información'}), 403
+    
+    from flask import send_from_directory
+    return send_from_directory(os.path.abspath(perfil_cpu.directorio), archivo, as_attachment=True)
+
+@app.route('/metrics')
+def metrics():
+    """Métricas en formato Prometheus
+    
+    Incluyen inventario y valor por estado, así que nunca son públicas: el
+    recolector debe enviar `Authorization: Bearer <METRICS_TOKEN>`. Sin
+    METRICS_TOKEN configurado solo las ve un administrador con sesión iniciada.
+    """
+    token = os.getenv('METRICS_TOKEN')
+    autorizado = current_user.is_authenticated and current_user.es_admin
+    if token and not autorizado:
+        autorizado = hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}')
+    if not autorizado:
+        return Response('No autorizado\n', status=401, mimetype='text/plain')
+    
+    # Métricas de negocio: se calculan al momento en una sola consulta
+    today = date.today()
+    por_estado = db.session.query(
+        Cuenta.estado,
+        db.func.count(Cuenta.id),
+        db.func.coalesce(db.func.sum(Cuenta.precio), 0),
+        db.func.count(Cuenta.id).filter(
+            Cuenta.fecha_vencimiento >= today,
+            Cuenta.fecha_vencimiento <= today + timedelta(days=7)
+        )
+    ).group_by(Cuenta.estado).all()
+    
+    extra = []
+    por_vencer = 0
+    for estado, cantidad, valor, vencen in por_estado:
+        extra.append(('gestor_cuentas', {'estado': estado or 'Sin estado'}, cantidad))
+        extra.append(('gestor_cuentas_valor', {'estado': estado or 'Sin estado'}, float(valor)))
+        por_vencer += vencen
+    extra.append(('gestor_cuentas_por_vencer', {}, por_vencer))
+    
+    return Response(metricas.exponer(extra), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+@app.route('/api/sugerencias')
+@login_required
+def api_sugerencias():
+    """API de autocompletado de compradores, WhatsApp y plataformas (sin consultar la base de datos)"""
+    prefijo = request.args.get('q', '')
+    campo = request.args.get('campo', '')
+    limite = max(1, min(request.args.get('limite', 10, type=int), 50))
+    
+    if campo and campo not in CAMPOS_SUGERENCIA:
+        return jsonify({'error': f'Campo desconocido: {campo}'}), 400
+    
+    campos = (campo,) if campo else CAMPOS_SUGERENCIA
+    sugerencias = indice_sugerencias.sugerir(
+        None if current_user.es_admin else current_user.id,
+        prefijo,
+        campos,
+        limite
+    )
+    
+    return jsonify({'q': prefijo, 'sugerencias': sugerencias})
+
 @app.route('/api/cuenta/<int:id>/mensaje-whatsapp')
 @login_required
 def api_mensaje_whatsapp(id):
@@ -832,13 +1800,100 @@ def api_mensaje_whatsapp(id):
     if cuenta.estado != 'Vendida':
         return jsonify({'error': 'La cuenta no ha sido vendida'}), 400
     
-    mensaje = generar_mensaje_whatsapp(cuenta)
+    mensaje = generar_mensaje_whatsapp(cuenta, obtener_plantilla_usuario(cuenta.usuario_id))
     return jsonify({
         'mensaje': mensaje,
         'whatsapp': cuenta.whatsapp_comprador,
         'nombre_comprador': cuenta.nombre_comprador
     })
 
+@app.route('/api/mensajes-whatsapp')
+@login_required
+def api_mensajes_whatsapp():
+    """API para generar en lote los mensajes de WhatsApp de cuentas vendidas
+    
+    Parámetros: ids=1,2,3 para cuentas concretas o dias=N para las que vencen
+    en los próximos N días (por defecto 7)
+    """
+    ids = request.args.get('ids', '')
+    
+    # Una sola consulta: cuentas vendidas junto con la plantilla de su dueño
+    query = db.session.query(Cuenta, PlantillaMensaje.contenido).outerjoin(
+        PlantillaMensaje,
+        db.and_(PlantillaMensaje.usuario_id == Cuenta.usuario_id, PlantillaMensaje.tipo == 'venta')
+    ).filter(Cuenta.estado == 'Vendida')
+    
+    if not current_user.es_admin:
+        query = query.filter(Cuenta.usuario_id == current_user.id)
+    
+    if ids:
+        try:
+            lista_ids = [int(i) for i in ids.split(',') if i.strip()]
+        except ValueError:
+            return jsonify({'error': 'El parámetro ids debe ser una lista de números'}), 400
+        query = query.filter(Cuenta.id.in_(lista_ids))
+    else:
+        dias = request.args.get('dias', 7, type=int)
+        today = date.today()
+        query = query.filter(
+            Cuenta.fecha_vencimiento.isnot(None),
+            Cuenta.fecha_vencimiento >= today,
+            Cuenta.fecha_vencimiento <= today + timedelta(days=dias)
+        )
+    
+    mensajes = []
+    for cuenta, plantilla in query.order_by(Cuenta.fecha_vencimiento.asc()).all():
+        mensajes.append({
+            'id': cuenta.id,
+            'mensaje': generar_mensaje_whatsapp(cuenta, plantilla),
+            'whatsapp': cuenta.whatsapp_comprador,
+            'nombre_comprador': cuenta.nombre_comprador,
+            'fecha_vencimiento': cuenta.fecha_vencimiento.strftime('%Y-%m-%d') if cuenta.fecha_vencimiento else None
+        })
+    
+    return jsonify({'total': len(mensajes), 'mensajes': mensajes})
+
+@app.route('/api/plantilla-whatsapp', methods=['GET', 'POST'])
+@login_required
+def api_plantilla_whatsapp():
+    """API para consultar o personalizar la plantilla de WhatsApp del usuario actual"""
+    tipo = request.args.get('tipo', 'venta')
+    if tipo not in PLANTILLAS_POR_DEFECTO:
+        return jsonify({'error': f'Tipo de plantilla desconocido: {tipo}'}), 400
+    
+    plantilla = PlantillaMensaje.query.filter_by(usuario_id=current_user.id, tipo=tipo).first()
+    
+    if request.method == 'POST':
+        datos = request.get_json(silent=True) or {}
+        contenido = (datos.get('contenido') or '').strip()
+        
+        try:
+            if contenido:
+                # Validar la plantilla antes de guardarla
+                compilar_plantilla(contenido)
+                if plantilla:
+                    plantilla.contenido = contenido
+                else:
+                    plantilla = PlantillaMensaje(usuario_id=current_user.id, tipo=tipo, contenido=contenido)
+                    db.session.add(plantilla)
+            elif plantilla:
+                # Contenido vacío: volver a la plantilla por defecto
+                db.session.delete(plantilla)
+                plantilla = None
+            db.session.commit()
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        except Exception as e:
+            db.session.rollback()
+            return jsonify({'error': f'Error al guardar la plantilla: {str(e)}'}), 500
+    
+    return jsonify({
+        'tipo': tipo,
+        'contenido': plantilla.contenido if plantilla else PLANTILLAS_POR_DEFECTO[tipo],
+        'personalizada': plantilla is not None,
+        'campos': sorted(CAMPOS)
+    })
+
 @app.errorhandler(404)
 def pagina_no_encontrada(error):
     return render_template('404.html'), 404
@@ -849,6 +1904,7 @@ def error_interno(error):
 
 @app.route('/exportar_cuentas_vendidas')
 @login_required
+@perfilar_memoria
 def exportar_cuentas_vendidas():
     """Exportar cuentas vendidas a archivo de texto"""
     from flask import send_file
@@ -867,6 +1923,8 @@ def exportar_cuentas_vendidas():
         flash('No hay cuentas vendidas para exportar', 'warning')
         return redirect(url_for('cuentas'))
     
+    metricas.incrementar('gestor_filas_exportadas_total', len(cuentas_vendidas), tipo='cuentas_vendidas')
+    
     # Crear archivo de texto en memoria
     output = io.StringIO()
     
@@ -928,6 +1986,7 @@ def exportar_cuentas_vendidas():
 
 @app.route('/exportar_cuentas_disponibles')
 @login_required
+@perfilar_memoria
 def exportar_cuentas_disponibles():
     """Exportar cuentas disponibles a archivo de texto"""
     from flask import send_file
@@ -946,6 +2005,8 @@ def exportar_cuentas_disponibles():
         flash('No hay cuentas disponibles para exportar', 'warning')
         return redirect(url_for('cuentas'))
     
+    metricas.incrementar('gestor_filas_exportadas_total', len(cuentas_disponibles), tipo='cuentas_disponibles')
+    
     # Crear archivo de texto en memoria
     output = io.StringIO()
     
@@ -1014,6 +2075,7 @@ def exportar_cuentas_disponibles():
 
 @app.route('/exportar_usuarios')
 @login_required
+@perfilar_memoria
 def exportar_usuarios():
     """Exportar usuarios a archivo de texto (solo para administradores)"""
     from flask import send_file
@@ -1032,6 +2094,8 @@ def exportar_usuarios():
         flash('No hay usuarios para exportar', 'warning')
         return redirect(url_for('usuarios'))
     
+    metricas.incrementar('gestor_filas_exportadas_total', len(usuarios), tipo='usuarios')
+    
     # Crear archivo de texto en memoria
     output = io.StringIO()
     
@@ -1121,6 +2185,7 @@ def exportar_usuarios():
 
 @app.route('/importar_cuentas_vendidas', methods=['GET', 'POST'])
 @login_required
+@perfilar_memoria
 def importar_cuentas_vendidas():
     """Importar cuentas vendidas desde archivo de texto"""
     if request.method == 'POST':
@@ -1234,6 +2299,10 @@ def importar_cuentas_vendidas():
                 else:
                     errores.append(resultado['error'])
             
+            metricas.incrementar('gestor_filas_importadas_total', cuentas_importadas, tipo='cuentas_vendidas', resultado='importada')
+            metricas.incrementar('gestor_filas_importadas_total', cuentas_duplicadas, tipo='cuentas_vendidas', resultado='duplicada')
+            metricas.incrementar('gestor_filas_importadas_total', len(errores), tipo='cuentas_vendidas', resultado='error')
+            
             # Mensaje de resultado
             mensaje = f"Importación completada: {cuentas_importadas} cuentas importadas"
             if cuentas_duplicadas > 0:
@@ -1258,6 +2327,7 @@ def importar_cuentas_vendidas():
 
 @app.route('/importar_cuentas_disponibles', methods=['GET', 'POST'])
 @login_required
+@perfilar_memoria
 def importar_cuentas_disponibles():
     """Importar cuentas disponibles desde archivo de texto"""
     if request.method == 'POST':
@@ -1353,6 +2423,10 @@ def importar_cuentas_disponibles():
                 else:
                     errores.append(resultado['error'])
             
+            metricas.incrementar('gestor_filas_importadas_total', cuentas_importadas, tipo='cuentas_disponibles', resultado='importada')
+            metricas.incrementar('gestor_filas_importadas_total', cuentas_duplicadas, tipo='cuentas_disponibles', resultado='duplicada')
+            metricas.incrementar('gestor_filas_importadas_total', len(errores), tipo='cuentas_disponibles', resultado='error')
+            
             # Mensaje de resultado
             mensaje = f"Importación completada: {cuentas_importadas} cuentas importadas"
             if cuentas_duplicadas > 0:
@@ -1423,6 +2497,7 @@ def procesar_cuenta_vendida_importada(datos_cuenta, usuario_id):
         
         db.session.add(nueva_cuenta)
         db.session.commit()
+        indice_sugerencias.actualizar(usuario_id, None, valores_sugerencia(nueva_cuenta))
         
         return {'exito': True, 'duplicado': False, 'error': None}
         
@@ -1468,6 +2543,7 @@ def procesar_cuenta_disponible_importada(datos_cuenta, usuario_id):
         
         db.session.add(nueva_cuenta)
         db.session.commit()
+        indice_sugerencias.actualizar(usuario_id, None, valores_sugerencia(nueva_cuenta))
         
         return {'exito': True, 'duplicado': False, 'error': None}
         
@@ -1477,6 +2553,7 @@ def procesar_cuenta_disponible_importada(datos_cuenta, usuario_id):
 
 @app.route('/importar_usuarios', methods=['GET', 'POST'])
 @login_required
+@perfilar_memoria
 def importar_usuarios():
     """Importar usuarios desde archivo de texto (solo para administradores)"""
     # Verificar que solo los administradores puedan importar usuarios
@@ -1500,11 +2577,9 @@ def importar_usuarios():
         
         try:
             contenido = archivo.read().decode('utf-8')
-            usuarios_importados = 0
-            usuarios_duplicados = 0
-            errores = []
+            usuarios_leidos = []
             
-            # Procesar el archivo línea por línea
+            # Leer el archivo línea por línea; los usuarios se insertan al final, por lotes
             lineas = contenido.split('\n')
             usuario_actual = {}
             
@@ -1514,13 +2589,7 @@ def importar_usuarios():
                 if linea.startswith('USUARIO #'):
                     # Nuevo usuario, guardar el anterior si existe
                     if usuario_actual and 'username' in usuario_actual:
-                        resultado = procesar_usuario_importado(usuario_actual)
-                        if resultado['exito']:
-                            usuarios_importados += 1
-                        elif resultado['duplicado']:
-                            usuarios_duplicados += 1
-                        else:
-                            errores.append(resultado['error'])
+                        usuarios_leidos.append(usuario_actual)
                     
                     # Iniciar nuevo usuario
                     usuario_actual = {}
@@ -1555,13 +2624,13 @@ def importar_usuarios():
             
             # Procesar el último usuario
             if usuario_actual and 'username' in usuario_actual:
-                resultado = procesar_usuario_importado(usuario_actual)
-                if resultado['exito']:
-                    usuarios_importados += 1
-                elif resultado['duplicado']:
-                    usuarios_duplicados += 1
-                else:
-                    errores.append(resultado['error'])
+                usuarios_leidos.append(usuario_actual)
+            
+            usuarios_importados, usuarios_duplicados, errores = importar_lote_usuarios(usuarios_leidos)
+            
+            metricas.incrementar('gestor_filas_importadas_total', usuarios_importados, tipo='usuarios', resultado='importada')
+            metricas.incrementar('gestor_filas_importadas_total', usuarios_duplicados, tipo='usuarios', resultado='duplicada')
+            metricas.incrementar('gestor_filas_importadas_total', len(errores), tipo='usuarios', resultado='error')
             
             # Mensaje de resultado
             mensaje = f"Importación completada: {usuarios_importados} usuarios importados"
@@ -1585,44 +2654,93 @@ def importar_usuarios():
     
     return redirect(url_for('usuarios'))
 
-def procesar_usuario_importado(datos_usuario):
-    """Procesar un usuario importado"""
-    try:
-        # Verificar si el usuario ya existe (por username o email)
-        usuario_existente = Usuario.query.filter(
-            (Usuario.username == datos_usuario['username']) |
-            (Usuario.email == datos_usuario['email'])
-        ).first()
-        
-        if usuario_existente:
-            return {'exito': False, 'duplicado': True, 'error': f"Usuario con username {datos_usuario['username']} o email {datos_usuario['email']} ya existe"}
-        
-        # Crear nuevo usuario
-        nuevo_usuario = Usuario(
-            username=datos_usuario['username'],
-            email=datos_usuario['email'],
-            es_admin=datos_usuario.get('es_admin', False),
-            activo=datos_usuario.get('activo', True)
-        )
-        
-        # Establecer contraseña por defecto
-        nuevo_usuario.set_password('password123')
+def importar_lote_usuarios(usuarios_leidos):
+    """Insertar los usuarios importados; retorna (importados, duplicados, errores)
+    
+    Los username y email existentes se cargan una sola vez en conjuntos (en
+    minúsculas, como los compara la collation _ci de MySQL) y los del propio
+    archivo se van sumando, así que los duplicados se detectan sin consultas.
+    Todos reciben la misma contraseña por defecto, cuyo hash (un KDF lento a
+    propósito) se calcula una vez. Se insertan en lotes de USUARIOS_POR_LOTE,
+    con un INSERT y un commit por lote; si un lote falla se reintenta fila por
+    fila, para que solo las filas con problemas queden como errores.
+    """
+    usernames = set()
+    emails = set()
+    for username, email in db.session.query(Usuario.username, Usuario.email):
+        usernames.add(username.lower())
+        emails.add(email.lower())
+    
+    password_hash = generate_password_hash(CONTRASENA_IMPORTACION)
+    importados = 0
+    duplicados = 0
+    errores = []
+    lote = []
+    
+    def insertar(lote):
+        try:
+            db.session.execute(Usuario.__table__.insert(), lote)
+            db.session.commit()
+            return len(lote)
+        except Exception:
+            db.session.rollback()
+        insertados = 0
+        for fila in lote:
+            try:
+                db.session.execute(Usuario.__table__.insert(), fila)
+                db.session.commit()
+                insertados += 1
+            except Exception as e:
+                db.session.rollback()
+                errores.append(f"Usuario {fila['username']}: {e}")
+        return insertados
+    
+    for datos_usuario in usuarios_leidos:
+        username = datos_usuario['username']
+        email = datos_usuario.get('email')
+        if not username or not email:
+            errores.append(f"Usuario {username or '(sin nombre)'} sin username o email")
+            continue
+        if username.lower() in usernames or email.lower() in emails:
+            duplicados += 1
+            continue
+        usernames.add(username.lower())
+        emails.add(email.lower())
         
         # Procesar fecha de creación
+        fecha_creacion = datetime.utcnow()
         if datos_usuario.get('fecha_creacion'):
             try:
-                nuevo_usuario.fecha_creacion = datetime.strptime(datos_usuario['fecha_creacion'], '%Y-%m-%d %H:%M:%S')
-            except:
-                nuevo_usuario.fecha_creacion = datetime.now()
-        
-        db.session.add(nuevo_usuario)
-        db.session.commit()
-        
-        return {'exito': True, 'duplicado': False, 'error': None}
-        
-    except Exception as e:
-        db.session.rollback()
-        return {'exito': False, 'duplicado': False, 'error': str(e)}
+                fecha_creacion = datetime.strptime(datos_usuario['fecha_creacion'], '%Y-%m-%d %H:%M:%S')
+            except ValueError:
+                fecha_creacion = datetime.now()
+        
+        lote.append({
+            'username': username,
+            'email': email,
+            'password_hash': password_hash,
+            'es_admin': datos_usuario.get('es_admin', False),
+            'activo': datos_usuario.get('activo', True),
+            'fecha_creacion': fecha_creacion,
+        })
+        if len(lote) >= USUARIOS_POR_LOTE:
+            importados += insertar(lote)
+            lote = []
+    if lote:
+        importados += insertar(lote)
+    
+    return importados, duplicados, errores
+
+def precompilar_plantillas():
+    """Compilar (o cargar de la caché de bytecode) todas las plantillas antes de la primera petición"""
+    inicio = time.perf_counter()
+    nombres = app.jinja_env.list_templates(extensions=['html'])
+    for nombre in nombres:
+        try:
+            app.jinja_env.get_template(nombre)
+        except TemplateSyntaxError as e:
+            print(f"⚠️  Plantilla {nombre} con errores: {e}")
+    print(f"🧩 {len(nombres)} plantillas precompiladas en {(time.perf_counter() - inicio) * 1000:.0f} ms")
 
 def crear_admin_inicial():
     """Crear usuario administrador inicial si no existe"""
@@ -1657,11 +2775,21 @@ def crear_admin_inicial():
 if __name__ == '__main__':
     with app.app_context():
         db.create_all()
+        crear_columnas_faltantes()
+        crear_indices_faltantes()
+        preparar_indices(db)
         crear_admin_inicial()
+    if os.getenv('PRECOMPILAR_PLANTILLAS', '1') == '1':
+        precompilar_plantillas()
     
     app.run(debug=True, host='0.0.0.0', port=5000)
 else:
     # Configuración para producción (InfinityFree)
     with app.app_context():
         db.create_all()
+        crear_columnas_faltantes()
+        crear_indices_faltantes()
+        preparar_indices(db)
         crear_admin_inicial()
+    if os.getenv('PRECOMPILAR_PLANTILLAS', '1') == '1':
+        precompilar_plantillas()
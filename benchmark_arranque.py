@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark de arranque: latencia de la primera petición tras iniciar un worker
+
+Compara tres modos, cada uno en un proceso nuevo:
+    frio        sin caché de bytecode ni precompilación (comportamiento anterior)
+    bytecode    caché de bytecode en disco ya llena, plantillas cargadas bajo demanda
+    precargado  caché de bytecode + precompilar_plantillas() al importar la app
+
+Uso:
+    python benchmark_arranque.py --repeticiones 3
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+MODOS = {
+    'frio': {'JINJA_BYTECODE_CACHE': '0', 'PRECOMPILAR_PLANTILLAS': '0'},
+    'bytecode': {'JINJA_BYTECODE_CACHE': '1', 'PRECOMPILAR_PLANTILLAS': '0'},
+    'precargado': {'JINJA_BYTECODE_CACHE': '1', 'PRECOMPILAR_PLANTILLAS': '1'},
+}
+RUTAS = ['/', '/cuentas', '/ver_cuenta/{id}', '/nueva_cuenta', '/usuarios', '/perfil']
+
+def medir_hijo(separar_plantillas):
+    """Se ejecuta en el proceso hijo: importa la app y mide; imprime JSON"""
+    inicio = time.perf_counter()
+    import app as modulo_app
+    importacion_ms = (time.perf_counter() - inicio) * 1000
+    app = modulo_app.app
+
+    resultado = {'importacion_ms': importacion_ms, 'plantillas': {}, 'rutas': {}}
+    if separar_plantillas:
+        # Tiempo de get_template de cada plantilla (compilar, cargar bytecode o nada si ya está)
+        for nombre in app.jinja_env.list_templates(extensions=['html']):
+            inicio = time.perf_counter()
+            app.jinja_env.get_template(nombre)
+            resultado['plantillas'][nombre] = (time.perf_counter() - inicio) * 1000
+        print(json.dumps(resultado))
+        return
+
+    with app.app_context():
+        cuenta = modulo_app.Cuenta.query.first()
+    cliente = app.test_client()
+
+    inicio = time.perf_counter()
+    cliente.get('/login')
+    resultado['rutas']['/login'] = (time.perf_counter() - inicio) * 1000
+    cliente.post('/login', data={'username': 'admin', 'password': 'admin123'})
+
+    for ruta in RUTAS:
+        ruta = ruta.format(id=cuenta.id if cuenta else 1)
+        inicio = time.perf_counter()
+        cliente.get(ruta)
+        primera = (time.perf_counter() - inicio) * 1000
+        inicio = time.perf_counter()
+        cliente.get(ruta)
+        segunda = (time.perf_counter() - inicio) * 1000
+        resultado['rutas'][ruta] = primera
+        resultado['rutas'][ruta + ' (2ª)'] = segunda
+    print(json.dumps(resultado))
+
+def ejecutar_hijo(entorno, separar_plantillas):
+    argumentos = [sys.executable, os.path.abspath(__file__), '--hijo']
+    if separar_plantillas:
+        argumentos.append('--plantillas')
+    salida = subprocess.run(argumentos, env=entorno, capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout
+    # La app imprime mensajes al importarse: el resultado es la última línea
+    return json.loads(salida.strip().splitlines()[-1])
+
+def mediana_por_clave(resultados, campo):
+    claves = resultados[0][campo].keys()
+    return {clave: statistics.median(r[campo][clave] for r in resultados) for clave in claves}
+
+def imprimir_tabla(titulo, por_modo):
+    claves = list(next(iter(por_modo.values())).keys())
+    ancho = max(len(c) for c in claves) + 2
+    print(f"\n{titulo}")
+    print(f"{'':<{ancho}}" + ''.join(f'{modo:>13}' for modo in por_modo))
+    print('-' * (ancho + 13 * len(por_modo)))
+    for clave in claves:
+        print(f'{clave:<{ancho}}' + ''.join(f'{valores[clave]:>10.1f} ms' for valores in por_modo.values()))
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de arranque y primera petición por plantilla')
+    parser.add_argument('--repeticiones', type=int, default=3, help='Procesos por modo (se toma la mediana)')
+    parser.add_argument('--json', help='Guardar los resultados en este archivo')
+    parser.add_argument('--hijo', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--plantillas', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.hijo:
+        medir_hijo(args.plantillas)
+        return
+
+    temporal = tempfile.mkdtemp(prefix='gestor_arranque_')
+    base = dict(os.environ)
+    base.update({
+        'DATABASE_URL': f"sqlite:///{os.path.join(temporal, 'arranque.db')}",
+        'FLASK_ENV': 'benchmark',
+        'JINJA_BYTECODE_DIR': os.path.join(temporal, 'bytecode'),
+    })
+
+    # Crear la base de datos y llenar la caché de bytecode una vez
+    print(f"🔧 Preparando en {temporal}...")
+    ejecutar_hijo({**base, **MODOS['precargado']}, separar_plantillas=True)
+
+    plantillas = {}
+    rutas = {}
+    importacion = {}
+    for modo, variables in MODOS.items():
+        entorno = {**base, **variables}
+        print(f"⏱️  Modo {modo} ({args.repeticiones} procesos)...")
+        por_plantilla = [ejecutar_hijo(entorno, True) for _ in range(args.repeticiones)]
+        por_ruta = [ejecutar_hijo(entorno, False) for _ in range(args.repeticiones)]
+        plantillas[modo] = mediana_por_clave(por_plantilla, 'plantillas')
+        rutas[modo] = mediana_por_clave(por_ruta, 'rutas')
+        importacion[modo] = {'import app': statistics.median(r['importacion_ms'] for r in por_ruta)}
+
+    imprimir_tabla('📦 Importación de la app', importacion)
+    imprimir_tabla('🧩 Carga de cada plantilla (get_template en un worker nuevo)', plantillas)
+    imprimir_tabla('🌐 Latencia de la primera petición por ruta', rutas)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as archivo:
+            json.dump({'importacion': importacion, 'plantillas': plantillas, 'rutas': rutas}, archivo, indent=2)
+        print(f"\n💾 Resultados guardados en {args.json}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmarks de la reproducción del historial de eventos (eventos.py)
+
+Miden el rendimiento en eventos por segundo (extra_info del benchmark) de
+reproducir todo el historial y de rehacer las proyecciones a partir de él.
+El dataset generado tiene un evento de alta por cuenta; con --cuentas se
+escala el historial.
+"""
+
+import pytest
+
+@pytest.fixture(scope='session')
+def historial(gestor):
+    """Tabla de eventos y número de eventos del dataset"""
+    with gestor.app.app_context():
+        total = gestor.db.session.query(gestor.EventoCuenta).count()
+    assert total, 'El dataset no tiene eventos'
+    return gestor.EventoCuenta.__table__, total
+
+def _registrar_velocidad(benchmark, eventos):
+    benchmark.extra_info['eventos'] = eventos
+    benchmark.extra_info['eventos_por_segundo'] = round(eventos / benchmark.stats.stats.min)
+
+@pytest.mark.parametrize('lote', [1000, 5000])
+def test_reproducir_eventos(gestor, historial, benchmark, lote):
+    from eventos import reproducir
+
+    tabla, total = historial
+    with gestor.app.app_context():
+        with gestor.db.engine.connect() as conexion:
+            reproduccion = benchmark(reproducir, conexion, tabla, lote=lote)
+    assert reproduccion.eventos == total
+    _registrar_velocidad(benchmark, total)
+
+def test_verificar_cuentas(gestor, historial, benchmark):
+    from eventos import diferencias_cuentas, reproducir
+
+    tabla, total = historial
+    with gestor.app.app_context():
+        reproduccion = reproducir(gestor.db.session.connection(), tabla)
+        faltantes, distintas, sobrantes, _ = benchmark(diferencias_cuentas, reproduccion)
+        gestor.db.session.rollback()
+    assert not (faltantes or distintas or sobrantes)
+    _registrar_velocidad(benchmark, total)
+
+def test_reconstruir_rollups_desde_eventos(gestor, historial, benchmark):
+    from eventos import particiones_vendidas, reproducir
+    from rollups_ventas import reconstruir_rollups, verificar_rollups
+
+    tabla, total = historial
+
+    def reconstruir():
+        # Reproducir y proyectar: el ciclo completo que hace `eventos.py reconstruir rollups`
+        reproduccion = reproducir(gestor.db.session.connection(), tabla)
+        return reconstruir_rollups(particiones_vendidas(reproduccion))
+
+    with gestor.app.app_context():
+        benchmark.pedantic(reconstruir, rounds=3, iterations=1)
+        assert verificar_rollups() == []
+    _registrar_velocidad(benchmark, total)
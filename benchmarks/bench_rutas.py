@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmarks de index, cuentas, api_cuentas, api_series, analítica, usuarios, exportaciones, importaciones y eliminación de usuarios
+"""
+
+import io
+import os
+import random
+from datetime import date
+
+import pytest
+
+from generar_datos import COLUMNAS_CUENTA, generar_cuentas
+
+# Filas de los archivos importados en cada ronda (cada fila hace su propio commit)
+CUENTAS_IMPORTAR = int(os.getenv('BENCH_CUENTAS_IMPORTAR', 200))
+RONDAS_IMPORTAR = int(os.getenv('BENCH_RONDAS_IMPORTAR', 3))
+
+FILTROS_CUENTAS = {
+    'todas': '',
+    'disponible': '?estado=Disponible',
+    'vendida': '?estado=Vendida',
+    'por_vencer': '?estado=Por%20Vencer',
+    'vencida': '?estado=Vencida',
+    'plataforma': '?plataforma=Netflix',
+    'busqueda': '?q=garcia',
+}
+
+# -- Lectura ------------------------------------------------------------------
+
+def test_index_admin(cliente_admin, medir):
+    medir(lambda: cliente_admin.get('/'))
+
+def test_index_usuario(cliente_usuario, medir):
+    medir(lambda: cliente_usuario.get('/'))
+
+@pytest.mark.parametrize('filtro', FILTROS_CUENTAS)
+def test_cuentas_admin(cliente_admin, medir, filtro):
+    medir(lambda: cliente_admin.get('/cuentas' + FILTROS_CUENTAS[filtro]))
+
+@pytest.mark.parametrize('filtro', FILTROS_CUENTAS)
+def test_cuentas_usuario(cliente_usuario, medir, filtro):
+    medir(lambda: cliente_usuario.get('/cuentas' + FILTROS_CUENTAS[filtro]))
+
+@pytest.mark.parametrize('filtro', ['', '?estado=Vendida', '?plataforma=Netflix'])
+def test_api_cuentas(cliente_usuario, medir, filtro):
+    medir(lambda: cliente_usuario.get('/api/cuentas' + filtro))
+
+def test_api_cuentas_cambios_completa(cliente_usuario, medir):
+    medir(lambda: cliente_usuario.get('/api/cuentas/changes?since=0'))
+
+def test_api_cuentas_cambios_sin_novedades(cliente_usuario, medir):
+    # El caso más frecuente: la PWA pregunta y no hay nada nuevo
+    version = cliente_usuario.get('/api/cuentas/changes?since=0&limite=5000').get_json()['version']
+    medir(lambda: cliente_usuario.get(f'/api/cuentas/changes?since={version}'))
+
+@pytest.mark.parametrize('agrupar', ['dia', 'mes'])
+def test_api_series_admin(cliente_admin, medir, agrupar):
+    medir(lambda: cliente_admin.get(f'/api/series?agrupar={agrupar}'))
+
+@pytest.mark.parametrize('agrupar', ['dia', 'mes'])
+def test_api_series_usuario(cliente_usuario, medir, agrupar):
+    medir(lambda: cliente_usuario.get(f'/api/series?agrupar={agrupar}'))
+
+@pytest.mark.parametrize('dias', [90, 730])
+def test_api_analitica_admin(cliente_admin, medir, dias):
+    medir(lambda: cliente_admin.get(f'/api/analitica?dias={dias}'))
+
+def test_api_analitica_usuario(cliente_usuario, medir):
+    medir(lambda: cliente_usuario.get('/api/analitica'))
+
+def test_reportes(cliente_admin, medir):
+    medir(lambda: cliente_admin.get('/reportes'))
+
+@pytest.mark.parametrize('consulta', ['', '?q=demo', '?despues=1:demo000004'])
+def test_usuarios(cliente_admin, medir, consulta):
+    medir(lambda: cliente_admin.get(f'/usuarios{consulta}'))
+
+# -- Exportaciones --------------------------------------------------------------
+
+@pytest.mark.parametrize('ruta', ['/exportar_cuentas_vendidas', '/exportar_cuentas_disponibles'])
+def test_exportar_cuentas(cliente_usuario, medir, ruta):
+    medir(lambda: cliente_usuario.get(ruta))
+
+def test_exportar_usuarios(cliente_admin, medir):
+    medir(lambda: cliente_admin.get('/exportar_usuarios'))
+
+# -- Importaciones --------------------------------------------------------------
+
+def _primeros_bloques(texto, marcador, cantidad):
+    """Encabezado del reporte más los primeros `cantidad` bloques"""
+    partes = texto.split(marcador)
+    return marcador.join(partes[:cantidad + 1])
+
+@pytest.fixture(scope='module')
+def archivos_importacion(cliente_usuario, cliente_admin):
+    """Archivos de importación obtenidos de las propias exportaciones"""
+    vendidas = cliente_usuario.get('/exportar_cuentas_vendidas').get_data(as_text=True)
+    disponibles = cliente_usuario.get('/exportar_cuentas_disponibles').get_data(as_text=True)
+    usuarios = cliente_admin.get('/exportar_usuarios').get_data(as_text=True)
+    # Renombrar para que no choquen con los usuarios existentes
+    usuarios = usuarios.replace('Nombre de Usuario: ', 'Nombre de Usuario: bench_imp_')
+    usuarios = usuarios.replace('\nEmail: ', '\nEmail: bench_imp_')
+    return {
+        'vendidas': _primeros_bloques(vendidas, 'CUENTA #', CUENTAS_IMPORTAR).encode('utf-8'),
+        'disponibles': _primeros_bloques(disponibles, 'CUENTA #', CUENTAS_IMPORTAR).encode('utf-8'),
+        'usuarios': usuarios.encode('utf-8'),
+    }
+
+def _subir(cliente, ruta, contenido):
+    return cliente.post(ruta, data={'archivo': (io.BytesIO(contenido), 'importar.txt')},
+                        content_type='multipart/form-data')
+
+@pytest.mark.parametrize('tipo', ['vendidas', 'disponibles'])
+def test_importar_cuentas(gestor, cliente_importador, archivos_importacion, medir, tipo):
+    def limpiar():
+        with gestor.app.app_context():
+            usuario = gestor.Usuario.query.filter_by(username='bench_importador').first()
+            gestor.Cuenta.query.filter_by(usuario_id=usuario.id).delete()
+            gestor.db.session.commit()
+
+    respuesta = medir(
+        lambda: _subir(cliente_importador, f'/importar_cuentas_{tipo}', archivos_importacion[tipo]),
+        preparar=limpiar, rondas=RONDAS_IMPORTAR
+    )
+    limpiar()
+    assert respuesta.status_code == 302
+
+def test_importar_usuarios(gestor, cliente_admin, archivos_importacion, medir):
+    def limpiar():
+        with gestor.app.app_context():
+            gestor.Usuario.query.filter(gestor.Usuario.username.like('bench\\_imp\\_%', escape='\\')).delete(
+                synchronize_session=False)
+            gestor.db.session.commit()
+
+    respuesta = medir(
+        lambda: _subir(cliente_admin, '/importar_usuarios', archivos_importacion['usuarios']),
+        preparar=limpiar, rondas=RONDAS_IMPORTAR
+    )
+    limpiar()
+    assert respuesta.status_code == 302
+
+# -- Eliminación de usuarios ----------------------------------------------------
+
+@pytest.mark.parametrize('accion', ['reasignar', 'eliminar'])
+def test_eliminar_usuario(gestor, cliente_admin, cliente_importador, medir, accion):
+    # Las cuentas se mueven o borran en bloque: las consultas no dependen de cuántas tenga
+    eliminado = {}
+
+    def preparar():
+        with gestor.app.app_context():
+            usuario = gestor.Usuario(username='bench_eliminado', email='bench_eliminado@gestor.demo')
+            usuario.set_password('bench123')
+            gestor.db.session.add(usuario)
+            gestor.db.session.flush()
+            filas = generar_cuentas(random.Random(7), usuario.id, CUENTAS_IMPORTAR, date.today(), 'bench_eliminado_')
+            gestor.db.session.add_all(gestor.Cuenta(**dict(zip(COLUMNAS_CUENTA, fila))) for fila in filas)
+            gestor.db.session.commit()
+            eliminado['id'] = usuario.id
+
+    def limpiar():
+        # La reasignación deja las cuentas en bench_importador
+        with gestor.app.app_context():
+            usuario = gestor.Usuario.query.filter_by(username='bench_importador').first()
+            gestor.Cuenta.query.filter_by(usuario_id=usuario.id).delete()
+            gestor.db.session.commit()
+
+    respuesta = medir(
+        lambda: cliente_admin.post(f"/usuarios/{eliminado['id']}/eliminar",
+                                   data={'cuentas': accion, 'destino': 'bench_importador'}),
+        preparar=preparar, rondas=RONDAS_IMPORTAR
+    )
+    limpiar()
+    assert respuesta.status_code == 302
+    with gestor.app.app_context():
+        assert gestor.Usuario.query.filter_by(username='bench_eliminado').first() is None
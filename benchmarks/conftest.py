@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Configuración de los benchmarks de las rutas más usadas
+
+Uso (desde la raíz del proyecto):
+    pip install -r requirements_bench.txt
+    python -m pytest benchmarks                          # 1.000 cuentas
+    python -m pytest benchmarks --cuentas 100000
+    python -m pytest benchmarks --guardar-linea-base     # actualizar benchmarks/lineas_base/
+
+La base de datos se genera con generar_datos.py en un SQLite temporal y se
+reutiliza entre ejecuciones del mismo día y tamaño.
+
+Las líneas base versionadas guardan consultas y pico de memoria, que no dependen
+de la máquina. Los tiempos se comparan con el mecanismo de pytest-benchmark en
+la misma máquina:
+    python -m pytest benchmarks --benchmark-autosave
+    python -m pytest benchmarks --benchmark-compare --benchmark-compare-fail=min:50%
+"""
+
+import json
+import os
+import re
+import sys
+import tempfile
+import tracemalloc
+from datetime import date
+
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DIRECTORIO_LINEAS_BASE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'lineas_base')
+USUARIOS_GENERADOS = 10
+PASSWORD_GENERADOS = 'demo123'
+
+# Tolerancia de memoria frente a la línea base (las consultas no tienen: son deterministas)
+TOLERANCIA_MEMORIA = float(os.getenv('BENCH_TOLERANCIA_MEMORIA', 0.2))
+# Diferencias por debajo de esto no cuentan como regresión (ruido)
+MARGEN_KB = float(os.getenv('BENCH_MARGEN_KB', 256))
+
+if RAIZ not in sys.path:
+    sys.path.insert(0, RAIZ)
+
+def pytest_addoption(parser):
+    grupo = parser.getgroup('gestor')
+    grupo.addoption('--cuentas', type=int, default=int(os.getenv('BENCH_CUENTAS', 1000)),
+                    help='Cuentas totales del dataset generado (1000, 100000, 1000000...)')
+    grupo.addoption('--guardar-linea-base', action='store_true',
+                    help='Escribir los resultados como nueva línea base en lugar de compararlos')
+
+def pytest_configure(config):
+    # La app lee DATABASE_URL al importarse: hay que fijarla antes de cualquier import de app
+    cuentas = config.getoption('--cuentas')
+    directorio = os.getenv('BENCH_DIR', tempfile.gettempdir())
+    ruta = os.path.join(directorio, f'gestor_bench_{cuentas}_{date.today():%Y%m%d}.db')
+    config.gestor_db_nueva = not os.path.exists(ruta)
+    os.environ['DATABASE_URL'] = f'sqlite:///{ruta}'
+    os.environ['FLASK_ENV'] = 'benchmark'
+    config.gestor_resultados = {}
+
+def pytest_unconfigure(config):
+    if not config.getoption('--guardar-linea-base', default=False) or not config.gestor_resultados:
+        return
+    os.makedirs(DIRECTORIO_LINEAS_BASE, exist_ok=True)
+    ruta = os.path.join(DIRECTORIO_LINEAS_BASE, f'{config.getoption("--cuentas")}.json')
+    linea_base = {}
+    if os.path.exists(ruta):
+        with open(ruta, encoding='utf-8') as archivo:
+            linea_base = json.load(archivo)
+    linea_base.update(config.gestor_resultados)
+    with open(ruta, 'w', encoding='utf-8') as archivo:
+        json.dump(dict(sorted(linea_base.items())), archivo, indent=2, ensure_ascii=False)
+        archivo.write('\n')
+    print(f"\n💾 Línea base guardada en {ruta}")
+
+@pytest.fixture(scope='session')
+def gestor(pytestconfig):
+    """Módulo app con el dataset sintético cargado"""
+    import app as modulo_app
+    from generar_datos import generar_datos
+    from rollups_ventas import PROCESO, actualizar_rollups, reconstruir_rollups
+
+    if pytestconfig.gestor_db_nueva:
+        cuentas = pytestconfig.getoption('--cuentas')
+        with modulo_app.app.app_context():
+            generar_datos(
+                modulo_app.db.engine, modulo_app.Usuario.__table__, modulo_app.Cuenta.__table__,
+                usuarios=USUARIOS_GENERADOS, cuentas_por_usuario=max(1, cuentas // USUARIOS_GENERADOS),
+                semilla=42, cambio_tabla=modulo_app.CambioCuenta.__table__,
+                evento_tabla=modulo_app.EventoCuenta.__table__
+            )
+    with modulo_app.app.app_context():
+        # Rollup de ventas para /api/series (lo que haría el job programado)
+        if modulo_app.db.session.get(modulo_app.EstadoProceso, PROCESO) is None:
+            reconstruir_rollups()
+        else:
+            actualizar_rollups()
+    modulo_app.app.config['TESTING'] = True
+    return modulo_app
+
+def _cliente(gestor, username, password):
+    cliente = gestor.app.test_client()
+    respuesta = cliente.post('/login', data={'username': username, 'password': password})
+    assert respuesta.status_code == 302, f'No se pudo iniciar sesión como {username}'
+    return cliente
+
+@pytest.fixture(scope='session')
+def cliente_admin(gestor):
+    return _cliente(gestor, 'admin', 'admin123')
+
+@pytest.fixture(scope='session')
+def cliente_usuario(gestor):
+    return _cliente(gestor, 'demo000000', PASSWORD_GENERADOS)
+
+@pytest.fixture(scope='session')
+def cliente_importador(gestor):
+    """Usuario sin cuentas propias que recibe las importaciones"""
+    with gestor.app.app_context():
+        if not gestor.Usuario.query.filter_by(username='bench_importador').first():
+            usuario = gestor.Usuario(username='bench_importador', email='bench_importador@gestor.demo')
+            usuario.set_password(PASSWORD_GENERADOS)
+            gestor.db.session.add(usuario)
+            gestor.db.session.commit()
+    return _cliente(gestor, 'bench_importador', PASSWORD_GENERADOS)
+
+def consultas_de(respuesta):
+    """Número de consultas SQL según la cabecera Server-Timing de la instrumentación"""
+    coincidencia = re.search(r'"(\d+) consultas', respuesta.headers.get('Server-Timing', ''))
+    return int(coincidencia.group(1)) if coincidencia else None
+
+@pytest.fixture
+def medir(request, benchmark, pytestconfig):
+    """Ejecuta el benchmark, mide consultas y pico de memoria y compara con la línea base
+
+    `peticion()` debe retornar la respuesta del cliente de pruebas. La memoria se
+    mide en una ejecución aparte, porque tracemalloc distorsiona los tiempos.
+    """
+    def ejecutar(peticion, preparar=None, rondas=None):
+        if rondas:
+            benchmark.pedantic(peticion, setup=preparar, rounds=rondas, iterations=1)
+        else:
+            benchmark(peticion)
+
+        if preparar:
+            preparar()
+        tracemalloc.start()
+        try:
+            respuesta = peticion()
+            _, pico = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        assert respuesta.status_code < 400, f'Respuesta {respuesta.status_code}'
+
+        resultado = {
+            'consultas': consultas_de(respuesta),
+            'memoria_pico_kb': round(pico / 1024, 1),
+        }
+        benchmark.extra_info.update(resultado)
+        pytestconfig.gestor_resultados[request.node.name] = resultado
+
+        if not pytestconfig.getoption('--guardar-linea-base'):
+            _comparar(request.node.name, resultado, pytestconfig.getoption('--cuentas'))
+        return respuesta
+
+    return ejecutar
+
+def _comparar(nombre, resultado, cuentas):
+    ruta = os.path.join(DIRECTORIO_LINEAS_BASE, f'{cuentas}.json')
+    if not os.path.exists(ruta):
+        return
+    with open(ruta, encoding='utf-8') as archivo:
+        base = json.load(archivo).get(nombre)
+    if not base:
+        return
+
+    regresiones = []
+    if base.get('consultas') is not None and resultado['consultas'] is not None \
+            and resultado['consultas'] > base['consultas']:
+        regresiones.append(f"consultas {base['consultas']} -> {resultado['consultas']}")
+    memoria_base = base.get('memoria_pico_kb')
+    if memoria_base is not None and resultado['memoria_pico_kb'] > memoria_base * (1 + TOLERANCIA_MEMORIA) \
+            and resultado['memoria_pico_kb'] - memoria_base > MARGEN_KB:
+        regresiones.append(f"memoria {memoria_base} KB -> {resultado['memoria_pico_kb']} KB")
+
+    if regresiones:
+        pytest.fail(f'Regresión frente a la línea base de {cuentas} cuentas: ' + '; '.join(regresiones))
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Búsqueda de texto completo sobre las cuentas
+PostgreSQL: índices tsvector + pg_trgm. SQLite: tabla sombra FTS5 con tokenizador trigram.
+Si ninguno está disponible se usa LIKE como respaldo.
+"""
+
+import re
+from datetime import timedelta
+
+from sqlalchemy import Date, bindparam, text
+
+# Columnas de la tabla cuenta sobre las que se busca
+COLUMNAS = ('email', 'notas', 'nombre_comprador', 'whatsapp_comprador')
+
+# Días hacia adelante del estado 'Por Vencer' (el mismo criterio que la lista de cuentas)
+DIAS_POR_VENCER = 7
+
+# Motor detectado por preparar_indices(): 'postgresql', 'fts5' o 'like'
+motor_busqueda = 'like'
+
+_DOCUMENTO_PG = " || ' ' || ".join(f"coalesce({c}, '')" for c in COLUMNAS)
+
+def preparar_indices(db):
+    """Crear (si no existen) los índices de búsqueda según la base de datos"""
+    global motor_busqueda
+    dialecto = db.engine.dialect.name
+
+    try:
+        if dialecto == 'postgresql':
+            _preparar_postgresql(db)
+            motor_busqueda = 'postgresql'
+        elif dialecto == 'sqlite':
+            _preparar_sqlite(db)
+            motor_busqueda = 'fts5'
+        else:
+            motor_busqueda = 'like'
+    except Exception as e:
+        db.session.rollback()
+        motor_busqueda = 'like'
+        print(f"⚠️  Índices de búsqueda no disponibles, usando LIKE: {e}")
+
+    return motor_busqueda
+
+def _preparar_postgresql(db):
+    with db.engine.begin() as conn:
+        conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        conn.execute(text(
+            f"CREATE INDEX IF NOT EXISTS ix_cuenta_busqueda_tsv ON cuenta "
+            f"USING gin (to_tsvector('simple', {_DOCUMENTO_PG}))"
+        ))
+        conn.execute(text(
+            f"CREATE INDEX IF NOT EXISTS ix_cuenta_busqueda_trgm ON cuenta "
+            f"USING gin (lower({_DOCUMENTO_PG}) gin_trgm_ops)"
+        ))
+
+def _preparar_sqlite(db):
+    columnas = ', '.join(COLUMNAS)
+    nuevos = ', '.join(f'new.{c}' for c in COLUMNAS)
+    viejos = ', '.join(f'old.{c}' for c in COLUMNAS)
+
+    with db.engine.begin() as conn:
+        existe = conn.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'cuenta_fts'"
+        )).first()
+
+        if not existe:
+            # Tabla sombra con contenido externo: solo guarda el índice
+            conn.execute(text(
+                f"CREATE VIRTUAL TABLE cuenta_fts USING fts5("
+                f"{columnas}, content='cuenta', content_rowid='id', tokenize='trigram')"
+            ))
+            conn.execute(text("INSERT INTO cuenta_fts(cuenta_fts) VALUES ('rebuild')"))
+
+        conn.execute(text(
+            f"CREATE TRIGGER IF NOT EXISTS cuenta_fts_ai AFTER INSERT ON cuenta BEGIN "
+            f"INSERT INTO cuenta_fts(rowid, {columnas}) VALUES (new.id, {nuevos}); END"
+        ))
+        conn.execute(text(
+            f"CREATE TRIGGER IF NOT EXISTS cuenta_fts_ad AFTER DELETE ON cuenta BEGIN "
+            f"INSERT INTO cuenta_fts(cuenta_fts, rowid, {columnas}) VALUES ('delete', old.id, {viejos}); END"
+        ))
+        conn.execute(text(
+            f"CREATE TRIGGER IF NOT EXISTS cuenta_fts_au AFTER UPDATE OF {columnas} ON cuenta BEGIN "
+            f"INSERT INTO cuenta_fts(cuenta_fts, rowid, {columnas}) VALUES ('delete', old.id, {viejos}); "
+            f"INSERT INTO cuenta_fts(rowid, {columnas}) VALUES (new.id, {nuevos}); END"
+        ))
+
+def separar_terminos(texto):
+    """Dividir el texto buscado en términos (máximo 8)"""
+    return [t for t in re.split(r'\s+', (texto or '').strip().lower()) if t][:8]
+
+def escapar_like(termino):
+    return termino.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+def _filtros(params, usuario_id, plataforma, estado, hoy):
+    """Condiciones extra sobre la cuenta `c`: dueño, plataforma y estado de la lista de cuentas"""
+    condiciones = []
+    if usuario_id is not None:
+        condiciones.append('c.usuario_id = :usuario_id')
+        params['usuario_id'] = usuario_id
+    if plataforma:
+        condiciones.append('c.plataforma = :plataforma')
+        params['plataforma'] = plataforma
+    if estado == 'Por Vencer':
+        condiciones.append('c.fecha_vencimiento >= :hoy AND c.fecha_vencimiento <= :limite_por_vencer')
+    elif estado == 'Vencida':
+        condiciones.append('c.fecha_vencimiento < :hoy')
+    elif estado:
+        condiciones.append('c.estado = :estado')
+        params['estado'] = estado
+    if estado in ('Por Vencer', 'Vencida'):
+        _fechas(params, hoy)
+    return ''.join(f' AND {condicion}' for condicion in condiciones)
+
+def _fechas(params, hoy):
+    params['hoy'] = hoy
+    params['limite_por_vencer'] = hoy + timedelta(days=DIAS_POR_VENCER)
+
+def _sentencia(sql, params):
+    """text() con tipo Date en los parámetros de fecha (SQLite guarda las fechas como texto ISO)"""
+    fechas = [bindparam(nombre, type_=Date) for nombre in ('hoy', 'limite_por_vencer') if f':{nombre}' in sql]
+    return text(sql).bindparams(*fechas)
+
+def _coincidencias(terminos, params):
+    """(FROM ... WHERE de las coincidencias con alias `c`, ORDER BY por relevancia) según el motor"""
+    # El tokenizador trigram necesita al menos 3 caracteres por término
+    if motor_busqueda == 'fts5' and all(len(t) >= 3 for t in terminos):
+        params['consulta'] = ' AND '.join('"' + t.replace('"', '""') + '"' for t in terminos)
+        desde = """FROM cuenta_fts JOIN cuenta c ON c.id = cuenta_fts.rowid
+                   WHERE cuenta_fts MATCH :consulta"""
+        return desde, "ORDER BY bm25(cuenta_fts), c.id DESC"
+
+    if motor_busqueda == 'postgresql':
+        condiciones = []
+        prefijos = []
+        for i, termino in enumerate(terminos):
+            params[f'patron{i}'] = f'%{escapar_like(termino)}%'
+            condiciones.append(f"lower({_DOCUMENTO_PG}) LIKE :patron{i}")
+            limpio = re.sub(r'[^\w@.+-]', '', termino)
+            if limpio:
+                prefijos.append(f"'{limpio}':*")
+        params['tsquery'] = ' & '.join(prefijos) or "''"
+        params['texto'] = ' '.join(terminos)
+        documento = f"to_tsvector('simple', {_DOCUMENTO_PG})"
+        desde = f"""FROM cuenta c
+                    WHERE ({documento} @@ to_tsquery('simple', :tsquery) OR ({' AND '.join(condiciones)}))"""
+        orden = (f"ORDER BY ts_rank({documento}, to_tsquery('simple', :tsquery)) DESC, "
+                 f"similarity(lower({_DOCUMENTO_PG}), :texto) DESC, c.id DESC")
+        return desde, orden
+
+    condiciones = []
+    for i, termino in enumerate(terminos):
+        params[f'patron{i}'] = f'%{escapar_like(termino)}%'
+        columnas = ' OR '.join(f"lower(coalesce(c.{c}, '')) LIKE :patron{i} ESCAPE '\\'" for c in COLUMNAS)
+        condiciones.append(f"({columnas})")
+    return f"FROM cuenta c WHERE {' AND '.join(condiciones)}", "ORDER BY c.fecha_creacion DESC"
+
+def buscar_cuentas(db, texto, usuario_id=None, pagina=1, por_pagina=20,
+                   plataforma=None, estado=None, hoy=None, contar=True):
+    """Buscar cuentas por email, notas, nombre y WhatsApp del comprador
+
+    `plataforma` y `estado` filtran como la lista de cuentas ('Por Vencer' y
+    'Vencida' se calculan con `hoy`). Retorna (ids de la página ordenados por
+    relevancia, total de coincidencias); con contar=False el total es None y
+    no se hace el count, para quien ya lo tiene de resumir_busqueda().
+    """
+    terminos = separar_terminos(texto)
+    if not terminos:
+        return [], 0
+
+    pagina = max(1, pagina)
+    por_pagina = max(1, min(por_pagina, 100))
+    params = {'limite': por_pagina, 'desplazamiento': (pagina - 1) * por_pagina}
+    desde, orden = _coincidencias(terminos, params)
+    desde += _filtros(params, usuario_id, plataforma, estado, hoy)
+
+    total = None
+    if contar:
+        consulta_total = _sentencia(f"SELECT count(*) {desde}", params)
+        total = db.session.execute(consulta_total, params).scalar() or 0
+        if not total:
+            return [], 0
+    consulta_ids = f"SELECT c.id {desde} {orden} LIMIT :limite OFFSET :desplazamiento"
+    ids = [fila[0] for fila in db.session.execute(_sentencia(consulta_ids, params), params)]
+    return ids, total
+
+def resumir_busqueda(db, texto, usuario_id=None, plataforma=None, estado=None, hoy=None):
+    """Totales de todas las coincidencias (no solo de una página), en una consulta
+
+    Retorna un dict con total, disponibles, vendidas, por_vencer, vencidas y valor_ventas.
+    """
+    resumen = dict.fromkeys(('total', 'disponibles', 'vendidas', 'por_vencer', 'vencidas'), 0)
+    resumen['valor_ventas'] = 0.0
+    terminos = separar_terminos(texto)
+    if not terminos:
+        return resumen
+
+    params = {}
+    desde, _ = _coincidencias(terminos, params)
+    desde += _filtros(params, usuario_id, plataforma, estado, hoy)
+    _fechas(params, hoy)
+    consulta = _sentencia(f"""
+        SELECT count(*),
+               coalesce(sum(CASE WHEN c.estado = 'Disponible' THEN 1 ELSE 0 END), 0),
+               coalesce(sum(CASE WHEN c.estado = 'Vendida' THEN 1 ELSE 0 END), 0),
+               coalesce(sum(CASE WHEN c.fecha_vencimiento >= :hoy
+                                  AND c.fecha_vencimiento <= :limite_por_vencer THEN 1 ELSE 0 END), 0),
+               coalesce(sum(CASE WHEN c.fecha_vencimiento < :hoy THEN 1 ELSE 0 END), 0),
+               coalesce(sum(CASE WHEN c.estado = 'Vendida' THEN c.precio ELSE 0 END), 0)
+        {desde}""", params)
+    fila = db.session.execute(consulta, params).one()
+    resumen.update(zip(('total', 'disponibles', 'vendidas', 'por_vencer', 'vencidas'), map(int, fila[:5])))
+    resumen['valor_ventas'] = float(fila[5])
+    return resumen
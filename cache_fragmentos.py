@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Caché de fragmentos de plantillas Jinja
+
+Uso en las plantillas:
+    {% cache 'tarjeta_cuenta', cuenta.id %} ...markup... {% endcache %}
+
+La clave final es (nombre, partes..., contexto, fecha de hoy), donde el
+contexto lo da la aplicación (inquilino + versión de sus datos): cualquier
+cambio en los datos del inquilino sube la versión y deja de usar los
+fragmentos viejos, que el LRU termina desalojando. Incluir en las partes
+todo lo que el fragmento use de la petición y no sea del inquilino.
+
+Variables de entorno:
+    CACHE_FRAGMENTOS_MB  memoria máxima por worker (por defecto 16; 0 desactiva el caché)
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from datetime import date
+
+from jinja2 import nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+
+class CacheFragmentos:
+    """LRU acotado por tamaño (caracteres de HTML guardados)"""
+
+    def __init__(self, proveedor_contexto, max_mb=None):
+        max_mb = float(max_mb if max_mb is not None else os.getenv('CACHE_FRAGMENTOS_MB', 16))
+        self.max_caracteres = int(max_mb * 1024 * 1024)
+        # Retorna el contexto de la petición para la clave, o None para no cachear
+        self.proveedor_contexto = proveedor_contexto
+        self.fragmentos = OrderedDict()
+        self.caracteres = 0
+        self.aciertos = 0
+        self.fallos = 0
+        self.desalojos = 0
+        self.lock = threading.Lock()
+
+    def init_app(self, app):
+        app.jinja_env.add_extension(ExtensionCache)
+        app.jinja_env.cache_fragmentos = self
+        app.extensions['cache_fragmentos'] = self
+
+    def renderizar(self, partes, caller):
+        if self.max_caracteres <= 0:
+            return caller()
+        contexto = self.proveedor_contexto()
+        if contexto is None:
+            return caller()
+
+        clave = (tuple(partes), contexto, date.today())
+        with self.lock:
+            html = self.fragmentos.get(clave)
+            if html is not None:
+                self.fragmentos.move_to_end(clave)
+                self.aciertos += 1
+                return Markup(html)
+            self.fallos += 1
+
+        html = str(caller())
+        with self.lock:
+            if clave not in self.fragmentos:
+                self.fragmentos[clave] = html
+                self.caracteres += len(html)
+            while self.caracteres > self.max_caracteres and self.fragmentos:
+                _, viejo = self.fragmentos.popitem(last=False)
+                self.caracteres -= len(viejo)
+                self.desalojos += 1
+        return Markup(html)
+
+    def limpiar(self):
+        with self.lock:
+            self.fragmentos.clear()
+            self.caracteres = 0
+
+    def estadisticas(self):
+        with self.lock:
+            consultas = self.aciertos + self.fallos
+            return {
+                'fragmentos': len(self.fragmentos),
+                'memoria_kb': round(self.caracteres / 1024, 1),
+                'max_kb': round(self.max_caracteres / 1024, 1),
+                'aciertos': self.aciertos,
+                'fallos': self.fallos,
+                'desalojos': self.desalojos,
+                'tasa_aciertos': round(self.aciertos / consultas, 4) if consultas else 0.0,
+            }
+
+class ExtensionCache(Extension):
+    """Etiqueta {% cache nombre, partes... %}...{% endcache %}"""
+
+    tags = {'cache'}
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        environment.extend(cache_fragmentos=None)
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        partes = [parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            partes.append(parser.parse_expression())
+        cuerpo = parser.parse_statements(('name:endcache',), drop_needle=True)
+        return nodes.CallBlock(
+            self.call_method('_renderizar', [nodes.List(partes)]), [], [], cuerpo
+        ).set_lineno(lineno)
+
+    def _renderizar(self, partes, caller):
+        cache = self.environment.cache_fragmentos
+        if cache is None:
+            return caller()
+        return cache.renderizar(partes, caller)
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Construir los recursos estáticos: minificar, poner el hash en el nombre y precomprimir
+
+Lee los CSS/JS de static/src, escribe en static/dist las versiones
+minificadas como `css/base.<hash>.css`, una variante .gz de cada una
+(y .br si está instalado el paquete brotli) y static/dist/manifest.json
+con la correspondencia nombre -> archivo construido que usa asset_url().
+
+Las librerías de static/vendor ya vienen minificadas y su carpeta lleva la
+versión: se precomprimen en su lugar y se agregan al manifest sin cambiar
+de nombre. El manifest también da la lista de precache del service worker.
+
+Uso:
+    python construir_estaticos.py
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import re
+import shutil
+import sys
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+RAIZ = os.path.dirname(os.path.abspath(__file__))
+STATIC = os.path.join(RAIZ, 'static')
+FUENTES = os.path.join(STATIC, 'src')
+DIST = os.path.join(STATIC, 'dist')
+VENDOR = os.path.join(STATIC, 'vendor')
+EXTENSIONES = ('.css', '.js')
+EXTENSIONES_VENDOR = ('.css', '.js', '.woff2', '.ttf')
+# woff2 ya viene comprimido
+COMPRIMIBLES = ('.css', '.js', '.ttf')
+# No vale la pena comprimir archivos muy pequeños
+MINIMO_COMPRIMIR = 512
+
+def minificar_css(texto):
+    texto = re.sub(r'/\*.*?\*/', '', texto, flags=re.S)
+    texto = re.sub(r'\s+', ' ', texto)
+    texto = re.sub(r'\s*([{};,>])\s*', r'\1', texto)
+    texto = re.sub(r':\s+', ':', texto)
+    texto = texto.replace(';}', '}')
+    return texto.strip() + '\n'
+
+def minificar_js(texto):
+    """Minificación conservadora: quitar sangría, líneas vacías y comentarios de línea completa.
+
+    No toca el interior de los template literals de varias líneas.
+    """
+    lineas = []
+    en_template = False
+    for linea in texto.splitlines():
+        if en_template:
+            lineas.append(linea)
+        else:
+            linea = linea.strip()
+            if linea and not linea.startswith('//'):
+                lineas.append(linea)
+        if linea.count('`') % 2 == 1:
+            en_template = not en_template
+    return '\n'.join(lineas) + '\n'
+
+MINIFICADORES = {'.css': minificar_css, '.js': minificar_js}
+
+def comprimir(ruta, contenido):
+    """Escribir las variantes precomprimidas junto al archivo; devuelve los tamaños"""
+    tamanos = {}
+    if len(contenido) < MINIMO_COMPRIMIR:
+        return tamanos
+    comprimido = gzip.compress(contenido, compresslevel=9, mtime=0)
+    with open(ruta + '.gz', 'wb') as archivo:
+        archivo.write(comprimido)
+    tamanos['gz'] = len(comprimido)
+    if brotli is not None:
+        comprimido = brotli.compress(contenido, quality=11)
+        with open(ruta + '.br', 'wb') as archivo:
+            archivo.write(comprimido)
+        tamanos['br'] = len(comprimido)
+    return tamanos
+
+def construir():
+    if os.path.isdir(DIST):
+        shutil.rmtree(DIST)
+    manifest = {}
+    total_original = total_minificado = 0
+
+    for carpeta, _, archivos in os.walk(FUENTES):
+        for nombre in sorted(archivos):
+            base, extension = os.path.splitext(nombre)
+            if extension not in EXTENSIONES:
+                continue
+            origen = os.path.join(carpeta, nombre)
+            relativo = os.path.relpath(origen, FUENTES).replace(os.sep, '/')
+            with open(origen, encoding='utf-8') as archivo:
+                original = archivo.read()
+            contenido = MINIFICADORES[extension](original).encode('utf-8')
+            resumen = hashlib.sha256(contenido).hexdigest()[:10]
+
+            destino_relativo = f'{os.path.dirname(relativo)}/{base}.{resumen}{extension}'.lstrip('/')
+            destino = os.path.join(DIST, destino_relativo)
+            os.makedirs(os.path.dirname(destino), exist_ok=True)
+            with open(destino, 'wb') as archivo:
+                archivo.write(contenido)
+            tamanos = comprimir(destino, contenido)
+            manifest[relativo] = f'dist/{destino_relativo}'
+
+            total_original += len(original.encode('utf-8'))
+            total_minificado += len(contenido)
+            comprimidos = ', '.join(f'{tipo} {tamano / 1024:.1f} KB' for tipo, tamano in tamanos.items())
+            print(f"   {relativo:<52} {len(original.encode('utf-8')) / 1024:>6.1f} KB -> "
+                  f"{len(contenido) / 1024:>6.1f} KB {('(' + comprimidos + ')') if comprimidos else ''}")
+
+    for carpeta, _, archivos in os.walk(VENDOR):
+        for nombre in sorted(archivos):
+            extension = os.path.splitext(nombre)[1]
+            if extension not in EXTENSIONES_VENDOR:
+                continue
+            ruta = os.path.join(carpeta, nombre)
+            relativo = os.path.relpath(ruta, STATIC).replace(os.sep, '/')
+            manifest[relativo] = relativo
+            if extension in COMPRIMIBLES:
+                with open(ruta, 'rb') as archivo:
+                    contenido = archivo.read()
+                tamanos = comprimir(ruta, contenido)
+                comprimidos = ', '.join(f'{tipo} {tamano / 1024:.1f} KB' for tipo, tamano in tamanos.items())
+                print(f"   {relativo:<52} {len(contenido) / 1024:>6.1f} KB ({comprimidos})")
+
+    os.makedirs(DIST, exist_ok=True)
+    with open(os.path.join(DIST, 'manifest.json'), 'w', encoding='utf-8') as archivo:
+        json.dump(dict(sorted(manifest.items())), archivo, indent=2)
+    return manifest, total_original, total_minificado
+
+def main():
+    print("🔨 Construyendo recursos estáticos...")
+    if brotli is None:
+        print("⚠️  brotli no está instalado: solo se generan variantes .gz (pip install brotli)")
+    manifest, original, minificado = construir()
+    if not manifest:
+        print(f"❌ No se encontraron CSS/JS en {FUENTES}")
+        sys.exit(1)
+    print(f"✅ {len(manifest)} archivos en el manifest; propios: {original / 1024:.1f} KB -> {minificado / 1024:.1f} KB")
+    print(f"📄 Manifest: {os.path.join(DIST, 'manifest.json')}")
+
+if __name__ == '__main__':
+    main()
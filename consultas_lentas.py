@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Registro de consultas lentas con captura automática del plan (EXPLAIN)
+
+Variables de entorno:
+    SLOW_QUERY_MS       umbral en milisegundos (por defecto 200)
+    SLOW_QUERY_ANALYZE  '1' para usar EXPLAIN ANALYZE en PostgreSQL (vuelve a ejecutar el SELECT)
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from flask import has_request_context, request
+from sqlalchemy import event
+
+def forma_parametros(parametros, maximo=20):
+    """Describe los tipos de los parámetros sin exponer sus valores"""
+    if parametros is None:
+        return None
+    if isinstance(parametros, dict):
+        forma = {clave: type(valor).__name__ for clave, valor in list(parametros.items())[:maximo]}
+        if len(parametros) > maximo:
+            forma['...'] = f'{len(parametros) - maximo} más'
+        return forma
+    if isinstance(parametros, (list, tuple)):
+        forma = [type(valor).__name__ for valor in list(parametros)[:maximo]]
+        if len(parametros) > maximo:
+            forma.append(f'... {len(parametros) - maximo} más')
+        return forma
+    return type(parametros).__name__
+
+class RegistroConsultasLentas:
+    """Guarda en un buffer circular las consultas que superan el umbral"""
+
+    def __init__(self, umbral_ms=None, capacidad=100, analizar=None):
+        self.umbral_ms = float(umbral_ms if umbral_ms is not None else os.getenv('SLOW_QUERY_MS', 200))
+        self.analizar = analizar if analizar is not None else os.getenv('SLOW_QUERY_ANALYZE') == '1'
+        self.registros = deque(maxlen=capacidad)
+        self.lock = threading.Lock()
+
+    def init_app(self, app, engine):
+        event.listen(engine, 'before_cursor_execute', self._antes)
+        event.listen(engine, 'after_cursor_execute', self._despues)
+        event.listen(engine, 'handle_error', self._error)
+        app.extensions['consultas_lentas'] = self
+
+    def _antes(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('consultas_lentas_inicio', []).append(time.perf_counter())
+
+    def _error(self, contexto):
+        if contexto.connection is not None:
+            inicios = contexto.connection.info.get('consultas_lentas_inicio')
+            if inicios:
+                inicios.pop()
+
+    def _despues(self, conn, cursor, statement, parameters, context, executemany):
+        inicios = conn.info.get('consultas_lentas_inicio')
+        if not inicios:
+            return
+        duracion_ms = (time.perf_counter() - inicios.pop()) * 1000
+        if duracion_ms < self.umbral_ms:
+            return
+
+        ruta = None
+        if has_request_context():
+            ruta = f'{request.method} {request.path} ({request.endpoint or "desconocido"})'
+
+        registro = {
+            'fecha': datetime.now(),
+            'duracion_ms': round(duracion_ms, 2),
+            'sentencia': statement,
+            'parametros': forma_parametros(parameters),
+            'ejecucion_multiple': executemany,
+            'ruta': ruta,
+            'plan': None if executemany else self._explicar(conn, statement, parameters),
+        }
+        with self.lock:
+            self.registros.appendleft(registro)
+
+    def _explicar(self, conn, statement, parameters):
+        """Ejecuta EXPLAIN con un cursor crudo (no pasa por los eventos del engine)"""
+        dialecto = conn.dialect.name
+        es_select = statement.lstrip().upper().startswith(('SELECT', 'WITH'))
+
+        if dialecto == 'sqlite':
+            prefijo = 'EXPLAIN QUERY PLAN '
+        elif dialecto == 'postgresql' and self.analizar and es_select:
+            prefijo = 'EXPLAIN (ANALYZE, BUFFERS) '
+        else:
+            prefijo = 'EXPLAIN '
+
+        cursor = conn.connection.cursor()
+        try:
+            # En PostgreSQL un error abortaría la transacción de la petición
+            if dialecto == 'postgresql':
+                cursor.execute('SAVEPOINT explicar_consulta_lenta')
+            try:
+                cursor.execute(prefijo + statement, parameters or ())
+                filas = cursor.fetchall()
+                if dialecto == 'postgresql':
+                    cursor.execute('RELEASE SAVEPOINT explicar_consulta_lenta')
+            except Exception as e:
+                if dialecto == 'postgresql':
+                    cursor.execute('ROLLBACK TO SAVEPOINT explicar_consulta_lenta')
+                return f'No disponible: {e}'
+        except Exception as e:
+            return f'No disponible: {e}'
+        finally:
+            cursor.close()
+
+        if dialecto == 'sqlite':
+            # (id, padre, no usado, detalle)
+            return '\n'.join(f'{fila[0]}|{fila[1]} {fila[-1]}' for fila in filas)
+        return '\n'.join(str(fila[0]) for fila in filas)
+
+    def listar(self):
+        with self.lock:
+            return list(self.registros)
+
+    def limpiar(self):
+        with self.lock:
+            self.registros.clear()
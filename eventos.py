@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Historial de eventos de las cuentas (evento_cuenta) y su reproducción
+
+Cada cambio de una cuenta agrega un evento y nunca se modifica: el alta
+guarda la fila completa y los demás eventos solo las columnas que cambiaron
+(JSON compacto). Los escriben los hooks de flush y de UPDATE/DELETE masivos
+de app.py, así que todas las rutas quedan cubiertas sin código propio.
+
+Reproducir los eventos en orden da el estado de cada cuenta, y de ahí se
+pueden rehacer las proyecciones: la tabla de cuentas, los rollups de ventas
+(venta_diaria, venta_comprador) y el contador renovacion_diaria.
+
+Uso:
+    python eventos.py inicializar                   # alta de las cuentas que aún no tienen eventos
+    python eventos.py verificar                     # comparar las proyecciones con los eventos
+    python eventos.py reconstruir rollups           # rehacer una proyección (cuentas, rollups,
+    python eventos.py reconstruir todo              # contadores o todo) desde los eventos
+"""
+
+import argparse
+import json
+import time
+from collections import defaultdict
+from datetime import date, datetime
+
+from sqlalchemy import inspect, select
+
+# Tipos de evento (SmallInteger en la tabla)
+CREADA = 1
+EDITADA = 2
+VENDIDA = 3
+RENOVADA = 4
+LIBERADA = 5
+ELIMINADA = 6
+NOMBRES_TIPO = {CREADA: 'creada', EDITADA: 'editada', VENDIDA: 'vendida', RENOVADA: 'renovada',
+                LIBERADA: 'liberada', ELIMINADA: 'eliminada'}
+
+# Columnas de la cuenta que se guardan en los eventos (la versión solo en el alta)
+COLUMNAS = ('plataforma', 'email', 'password', 'precio', 'fecha_compra', 'notas', 'estado',
+            'fecha_creacion', 'fecha_venta', 'nombre_comprador', 'whatsapp_comprador',
+            'fecha_vencimiento', 'usuario_id')
+COLUMNAS_FECHA = ('fecha_compra', 'fecha_vencimiento')
+COLUMNAS_FECHA_HORA = ('fecha_creacion', 'fecha_venta')
+# Eventos leídos por vuelta al reproducir
+LOTE = 5000
+
+def serializar(valor):
+    return valor.isoformat() if isinstance(valor, (date, datetime)) else valor
+
+def codificar(datos):
+    return json.dumps(datos, separators=(',', ':'), ensure_ascii=False) if datos is not None else None
+
+def instantanea(cuenta):
+    """Fila completa de una cuenta (objeto o Row) para el evento de alta"""
+    datos = {columna: serializar(getattr(cuenta, columna)) for columna in COLUMNAS}
+    datos['version'] = cuenta.version or 1
+    return datos
+
+def columnas_cambiadas(cuenta):
+    """Columnas modificadas de una cuenta en el flush en curso, con su valor nuevo"""
+    atributos = inspect(cuenta).attrs
+    datos = {}
+    for columna in COLUMNAS:
+        historial = atributos[columna].history
+        if historial.added or historial.deleted:
+            datos[columna] = serializar(getattr(cuenta, columna))
+    return datos
+
+def tipo_de_cambio(datos, marcado=None):
+    """Tipo de un evento de modificación: el marcado por la ruta o el que indica el cambio de estado"""
+    if marcado:
+        return marcado
+    estado = datos.get('estado')
+    if estado == 'Vendida':
+        return VENDIDA
+    if estado == 'Disponible':
+        return LIBERADA
+    return EDITADA
+
+def fila_evento(cuenta_id, usuario_id, tipo, datos, actor_id=None, fecha=None):
+    return {'cuenta_id': cuenta_id, 'usuario_id': usuario_id, 'tipo': tipo, 'datos': codificar(datos),
+            'actor_id': actor_id, 'fecha': fecha or datetime.now()}
+
+def registrar_existentes(conexion, cuenta_tabla, evento_tabla, filtro=None):
+    """Evento de alta para cada cuenta (que cumpla `filtro`) sin eventos; retorna cuántas se registraron"""
+    consulta = select(cuenta_tabla).where(
+        ~select(evento_tabla.c.id).where(evento_tabla.c.cuenta_id == cuenta_tabla.c.id).exists()
+    ).order_by(cuenta_tabla.c.id)
+    if filtro is not None:
+        consulta = consulta.where(filtro)
+    # Se leen todas antes de insertar: SQLite no admite escribir mientras un cursor recorre la misma tabla
+    filas = conexion.execute(consulta).all()
+    ahora = datetime.now()
+    for inicio in range(0, len(filas), LOTE):
+        conexion.execute(evento_tabla.insert(), [
+            fila_evento(fila.id, fila.usuario_id, CREADA, instantanea(fila), fecha=ahora)
+            for fila in filas[inicio:inicio + LOTE]
+        ])
+    return len(filas)
+
+# ---------------------------------------------------------------------------
+# Reproducción
+# ---------------------------------------------------------------------------
+
+class Reproduccion:
+    """Estado de las cuentas y contadores tras aplicar los eventos en orden"""
+
+    def __init__(self):
+        self.cuentas = {}
+        self.eliminadas = set()
+        # (dia, usuario_id, plataforma) -> renovaciones
+        self.renovaciones = defaultdict(int)
+        self.eventos = 0
+        self.ultimo_id = 0
+        self.desde = None
+
+    def aplicar(self, evento_id, cuenta_id, usuario_id, tipo, datos, fecha):
+        self.eventos += 1
+        self.ultimo_id = evento_id
+        if self.desde is None:
+            self.desde = fecha.date()
+        if tipo == ELIMINADA:
+            self.cuentas.pop(cuenta_id, None)
+            self.eliminadas.add(cuenta_id)
+            return
+        datos = json.loads(datos) if datos else {}
+        if tipo == CREADA:
+            cuenta = self.cuentas[cuenta_id] = {'version': 1, **datos}
+            self.eliminadas.discard(cuenta_id)
+        else:
+            cuenta = self.cuentas.get(cuenta_id)
+            if cuenta is None:
+                # Cambio de una cuenta sin alta registrada (anterior a `inicializar`)
+                return
+            cuenta.update(datos)
+            cuenta['version'] += 1
+        cuenta['usuario_id'] = usuario_id
+        if tipo == RENOVADA:
+            self.renovaciones[(fecha.date(), usuario_id, cuenta['plataforma'])] += 1
+
+def reproducir(conexion, evento_tabla, hasta=None, lote=LOTE):
+    """Aplicar los eventos (hasta el id `hasta`) leyéndolos por partes; retorna la Reproduccion"""
+    reproduccion = Reproduccion()
+    columnas = (evento_tabla.c.id, evento_tabla.c.cuenta_id, evento_tabla.c.usuario_id,
+                evento_tabla.c.tipo, evento_tabla.c.datos, evento_tabla.c.fecha)
+    while True:
+        consulta = select(*columnas).where(evento_tabla.c.id > reproduccion.ultimo_id)
+        if hasta is not None:
+            consulta = consulta.where(evento_tabla.c.id <= hasta)
+        filas = conexion.execute(consulta.order_by(evento_tabla.c.id).limit(lote)).all()
+        for fila in filas:
+            reproduccion.aplicar(*fila)
+        if len(filas) < lote:
+            return reproduccion
+
+def deserializar(columna, valor):
+    if valor is None:
+        return None
+    if columna in COLUMNAS_FECHA:
+        return date.fromisoformat(valor)
+    if columna in COLUMNAS_FECHA_HORA:
+        return datetime.fromisoformat(valor)
+    return valor
+
+def fila_cuenta(cuenta_id, cuenta):
+    """Valores de la tabla de cuentas a partir del estado reproducido"""
+    fila = {columna: deserializar(columna, cuenta.get(columna)) for columna in COLUMNAS}
+    fila['id'] = cuenta_id
+    fila['version'] = cuenta['version']
+    return fila
+
+# ---------------------------------------------------------------------------
+# Proyecciones (necesitan la app)
+# ---------------------------------------------------------------------------
+
+def diferencias_cuentas(reproduccion):
+    """(faltantes, distintas, sobrantes, sin_eventos) entre la tabla de cuentas y los eventos"""
+    from app import db, Cuenta
+
+    tabla = Cuenta.__table__
+    faltantes = set(reproduccion.cuentas)
+    distintas, sobrantes, sin_eventos = [], [], []
+    for fila in db.session.execute(select(tabla).order_by(tabla.c.id).execution_options(yield_per=LOTE)):
+        esperada = reproduccion.cuentas.get(fila.id)
+        if esperada is None:
+            (sobrantes if fila.id in reproduccion.eliminadas else sin_eventos).append(fila.id)
+            continue
+        faltantes.discard(fila.id)
+        actual = instantanea(fila)
+        if {columna: esperada.get(columna) for columna in actual} != actual:
+            distintas.append(fila.id)
+    return sorted(faltantes), distintas, sobrantes, sin_eventos
+
+def reconstruir_cuentas(reproduccion):
+    """Dejar la tabla de cuentas como indican los eventos; las cuentas sin eventos no se tocan"""
+    from app import db, Cuenta, registrar_cambios_cuentas, incrementar_versiones
+
+    faltantes, distintas, sobrantes, _ = diferencias_cuentas(reproduccion)
+    tabla = Cuenta.__table__
+    # Por la conexión y no por la sesión: reparar no es un cambio nuevo y no debe generar eventos
+    conexion = db.session.connection()
+    antes = dict(conexion.execute(select(tabla.c.id, tabla.c.usuario_id).where(
+        tabla.c.id.in_(distintas + sobrantes))).all()) if distintas or sobrantes else {}
+    for cuenta_id in distintas:
+        valores = fila_cuenta(cuenta_id, reproduccion.cuentas[cuenta_id])
+        conexion.execute(tabla.update().where(tabla.c.id == cuenta_id).values(**valores))
+    if faltantes:
+        conexion.execute(tabla.insert(), [fila_cuenta(cuenta_id, reproduccion.cuentas[cuenta_id])
+                                          for cuenta_id in faltantes])
+    if sobrantes:
+        conexion.execute(tabla.delete().where(tabla.c.id.in_(sobrantes)))
+
+    # Que la sincronización y los rollups incrementales vean las cuentas reparadas
+    cambios = [(cuenta_id, antes[cuenta_id], True) for cuenta_id in sobrantes]
+    for cuenta_id in distintas + faltantes:
+        usuario_id = reproduccion.cuentas[cuenta_id]['usuario_id']
+        cambios.append((cuenta_id, usuario_id, False))
+        if cuenta_id in antes and antes[cuenta_id] != usuario_id:
+            cambios.append((cuenta_id, antes[cuenta_id], True))
+    if cambios:
+        incrementar_versiones(conexion)
+        registrar_cambios_cuentas(conexion, cambios)
+    db.session.commit()
+    return len(faltantes), len(distintas), len(sobrantes)
+
+def particiones_vendidas(reproduccion):
+    """Cuentas vendidas del estado reproducido en el formato de rollups_ventas.COLUMNAS_APORTE"""
+    vendidas = [
+        (cuenta_id, deserializar('fecha_venta', cuenta['fecha_venta']), cuenta['usuario_id'], cuenta['plataforma'],
+         cuenta['precio'], deserializar('fecha_compra', cuenta['fecha_compra']),
+         cuenta['nombre_comprador'], cuenta['whatsapp_comprador'])
+        for cuenta_id, cuenta in reproduccion.cuentas.items()
+        if cuenta.get('estado') == 'Vendida' and cuenta.get('fecha_venta')
+    ]
+    for inicio in range(0, len(vendidas), LOTE):
+        yield vendidas[inicio:inicio + LOTE]
+
+def diferencias_renovaciones(reproduccion):
+    """Diferencias (clave, tabla, eventos) de renovacion_diaria desde el primer evento registrado"""
+    from app import db, RenovacionDiaria
+
+    if reproduccion.desde is None:
+        return []
+    actual = {
+        (fila.dia, fila.usuario_id, fila.plataforma): fila.renovaciones
+        for fila in RenovacionDiaria.query.filter(RenovacionDiaria.dia >= reproduccion.desde)
+    }
+    esperado = reproduccion.renovaciones
+    return sorted(
+        (clave, actual.get(clave), esperado.get(clave))
+        for clave in set(actual) | set(esperado)
+        if actual.get(clave) != esperado.get(clave)
+    )
+
+def reconstruir_renovaciones(reproduccion):
+    """Rehacer renovacion_diaria desde el primer evento; los días anteriores se conservan"""
+    from app import db, RenovacionDiaria
+
+    if reproduccion.desde is None:
+        return 0
+    tabla = RenovacionDiaria.__table__
+    db.session.execute(tabla.delete().where(tabla.c.dia >= reproduccion.desde))
+    if reproduccion.renovaciones:
+        db.session.execute(tabla.insert(), [
+            {'dia': dia, 'usuario_id': usuario_id, 'plataforma': plataforma, 'renovaciones': renovaciones}
+            for (dia, usuario_id, plataforma), renovaciones in reproduccion.renovaciones.items()
+        ])
+    db.session.commit()
+    return len(reproduccion.renovaciones)
+
+def main():
+    parser = argparse.ArgumentParser(description='Historial de eventos de las cuentas')
+    subcomandos = parser.add_subparsers(dest='comando', required=True)
+    subcomandos.add_parser('inicializar', help='Registrar el alta de las cuentas que no tienen eventos')
+    verificar = subcomandos.add_parser('verificar', help='Comparar las proyecciones con los eventos')
+    verificar.add_argument('--lote', type=int, default=LOTE, help='Eventos leídos por consulta')
+    reconstruir = subcomandos.add_parser('reconstruir', help='Rehacer una proyección desde los eventos')
+    reconstruir.add_argument('proyeccion', choices=('cuentas', 'rollups', 'contadores', 'todo'))
+    reconstruir.add_argument('--lote', type=int, default=LOTE, help='Eventos leídos por consulta')
+    args = parser.parse_args()
+
+    from app import app, db, EventoCuenta, Cuenta, CambioCuenta
+
+    with app.app_context():
+        if args.comando == 'inicializar':
+            with db.engine.begin() as conexion:
+                registradas = registrar_existentes(conexion, Cuenta.__table__, EventoCuenta.__table__)
+            print(f"✅ {registradas} cuentas registradas en el historial de eventos")
+            return
+
+        inicio = time.perf_counter()
+        # Cambio más reciente antes de leer los eventos: hasta ahí llegan los rollups reconstruidos
+        token = db.session.query(db.func.max(CambioCuenta.id)).scalar() or 0
+        reproduccion = reproducir(db.session.connection(), EventoCuenta.__table__, lote=args.lote)
+        segundos = time.perf_counter() - inicio
+        velocidad = reproduccion.eventos / segundos if segundos else 0
+        print(f"🔁 {reproduccion.eventos} eventos reproducidos en {segundos:.2f} s ({velocidad:,.0f} eventos/s): "
+              f"{len(reproduccion.cuentas)} cuentas")
+
+        if args.comando == 'verificar':
+            faltantes, distintas, sobrantes, sin_eventos = diferencias_cuentas(reproduccion)
+            renovaciones = diferencias_renovaciones(reproduccion)
+            for nombre, ids in (('faltan en la tabla', faltantes), ('distintas', distintas),
+                                ('eliminadas según los eventos', sobrantes)):
+                if ids:
+                    print(f"❌ {len(ids)} cuentas {nombre}: {ids[:20]}")
+            if sin_eventos:
+                print(f"⚠️  {len(sin_eventos)} cuentas sin eventos (ejecuta 'inicializar'): {sin_eventos[:20]}")
+            if renovaciones:
+                print(f"❌ {len(renovaciones)} diferencias en renovacion_diaria (clave, tabla, eventos):")
+                for diferencia in renovaciones[:20]:
+                    print(f"   {diferencia}")
+            if faltantes or distintas or sobrantes or renovaciones:
+                raise SystemExit(1)
+            print("✅ Las cuentas y los contadores coinciden con los eventos")
+            return
+
+        if args.proyeccion in ('cuentas', 'todo'):
+            insertadas, actualizadas, borradas = reconstruir_cuentas(reproduccion)
+            print(f"🔨 Cuentas: {insertadas} insertadas, {actualizadas} actualizadas, {borradas} borradas")
+        if args.proyeccion in ('rollups', 'todo'):
+            from rollups_ventas import asegurar_esquema, reconstruir_rollups
+            asegurar_esquema()
+            filas = reconstruir_rollups(particiones_vendidas(reproduccion), token)
+            print(f"🔨 Rollups: {filas} filas de venta_diaria")
+        if args.proyeccion in ('contadores', 'todo'):
+            filas = reconstruir_renovaciones(reproduccion)
+            print(f"🔨 Contadores: {filas} filas de renovacion_diaria desde {reproduccion.desde}")
+        print(f"⏱️  Total: {time.perf_counter() - inicio:.2f} s")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+"""
+Configuración de gunicorn (se carga automáticamente desde el directorio de trabajo)
+"""
+
+import glob
+import os
+import subprocess
+import sys
+
+def on_starting(server):
+    """Vaciar el directorio de métricas compartidas antes de crear los workers"""
+    directorio = os.getenv('PROMETHEUS_MULTIPROC_DIR')
+    if directorio:
+        os.makedirs(directorio, exist_ok=True)
+        for ruta in glob.glob(os.path.join(directorio, 'metricas_*.json')):
+            os.remove(ruta)
+
+def worker_exit(server, worker):
+    """Volcar las métricas que el worker aún no escribió antes de que termine"""
+    metricas = getattr(getattr(worker, 'wsgi', None), 'extensions', {}).get('metricas')
+    if metricas is not None:
+        try:
+            metricas.volcar()
+        except OSError:
+            pass
+
+def when_ready(server):
+    """Poner al día los rollups de ventas al arrancar, en segundo plano
+
+    Cubre los cambios acumulados mientras el servicio estuvo parado y los hosts
+    sin cron; el cron de render.yaml los mantiene al día después.
+    Se desactiva con ROLLUPS_AL_ARRANCAR=0.
+    """
+    if os.getenv('ROLLUPS_AL_ARRANCAR', '1') != '0':
+        subprocess.Popen([sys.executable, 'rollups_ventas.py', 'actualizar'])
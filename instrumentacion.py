@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Instrumentación de peticiones: tiempo total, número de consultas SQL,
+tiempo en SQL y filas por petición, con histogramas móviles por endpoint
+"""
+
+import threading
+import time
+from collections import deque
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Límites (en ms) de los buckets de los histogramas
+LIMITES_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+def percentil(valores_ordenados, p):
+    """Percentil p (0-100) de una lista ya ordenada"""
+    if not valores_ordenados:
+        return 0.0
+    indice = min(len(valores_ordenados) - 1, int(round(p / 100 * (len(valores_ordenados) - 1))))
+    return valores_ordenados[indice]
+
+class EstadisticasEndpoint:
+    """Ventana móvil con las últimas peticiones de un endpoint"""
+
+    def __init__(self, ventana):
+        self.muestras = deque(maxlen=ventana)  # (duracion_ms, consultas, sql_ms, filas)
+        self.total_peticiones = 0
+
+    def registrar(self, duracion_ms, consultas, sql_ms, filas):
+        self.muestras.append((duracion_ms, consultas, sql_ms, filas))
+        self.total_peticiones += 1
+
+    def resumen(self, limites=LIMITES_MS):
+        muestras = list(self.muestras)
+        duraciones = sorted(m[0] for m in muestras)
+        n = len(muestras) or 1
+
+        # Buckets no acumulativos; hasta_ms None = por encima del último límite
+        histograma = []
+        restantes = duraciones
+        for limite in limites:
+            histograma.append({'hasta_ms': limite, 'peticiones': sum(1 for d in restantes if d <= limite)})
+            restantes = [d for d in restantes if d > limite]
+        histograma.append({'hasta_ms': None, 'peticiones': len(restantes)})
+
+        return {
+            'peticiones': self.total_peticiones,
+            'ventana': len(muestras),
+            'p50_ms': round(percentil(duraciones, 50), 2),
+            'p95_ms': round(percentil(duraciones, 95), 2),
+            'p99_ms': round(percentil(duraciones, 99), 2),
+            'max_ms': round(duraciones[-1], 2) if duraciones else 0.0,
+            'consultas_promedio': round(sum(m[1] for m in muestras) / n, 2),
+            'sql_ms_promedio': round(sum(m[2] for m in muestras) / n, 2),
+            'filas_promedio': round(sum(m[3] for m in muestras) / n, 2),
+            'histograma': histograma,
+        }
+
+class Instrumentacion:
+    """Engancha Flask (before/after_request) y SQLAlchemy (before/after_cursor_execute)
+
+    Filas = instancias cargadas por el ORM + filas afectadas por INSERT/UPDATE/DELETE
+    (SQLite no informa cuántas filas devuelve un SELECT).
+    """
+
+    def __init__(self, app=None, modelo_base=None, ventana=1000):
+        self.ventana = ventana
+        self.endpoints = {}
+        self.lock = threading.Lock()
+        # Funciones llamadas al terminar cada petición: fn(endpoint, datos)
+        self.suscriptores = []
+        if app is not None:
+            self.init_app(app, modelo_base)
+
+    def init_app(self, app, modelo_base=None):
+        app.before_request(self._inicio_peticion)
+        app.after_request(self._fin_peticion)
+        event.listen(Engine, 'before_cursor_execute', self._antes_consulta)
+        event.listen(Engine, 'after_cursor_execute', self._despues_consulta)
+        event.listen(Engine, 'handle_error', self._error_consulta)
+        if modelo_base is not None:
+            event.listen(modelo_base, 'load', self._instancia_cargada, propagate=True)
+        app.extensions['instrumentacion'] = self
+
+    # -- Flask -------------------------------------------------------------
+
+    def _inicio_peticion(self):
+        g.instrumentacion = {'inicio': time.perf_counter(), 'consultas': 0, 'sql': 0.0, 'filas': 0}
+
+    def _fin_peticion(self, response):
+        datos = g.pop('instrumentacion', None)
+        if datos is None:
+            return response
+
+        duracion_ms = (time.perf_counter() - datos['inicio']) * 1000
+        sql_ms = datos['sql'] * 1000
+        endpoint = request.endpoint or 'desconocido'
+
+        response.headers['Server-Timing'] = (
+            f'app;dur={duracion_ms:.1f}, '
+            f'db;dur={sql_ms:.1f};desc="{datos["consultas"]} consultas, {datos["filas"]} filas"'
+        )
+
+        with self.lock:
+            estadisticas = self.endpoints.get(endpoint)
+            if estadisticas is None:
+                estadisticas = self.endpoints[endpoint] = EstadisticasEndpoint(self.ventana)
+            estadisticas.registrar(duracion_ms, datos['consultas'], sql_ms, datos['filas'])
+
+        datos.update(duracion_ms=duracion_ms, sql_ms=sql_ms, status=response.status_code)
+        for suscriptor in self.suscriptores:
+            suscriptor(endpoint, datos)
+
+        return response
+
+    # -- SQLAlchemy --------------------------------------------------------
+
+    def _antes_consulta(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('instrumentacion_inicio', []).append(time.perf_counter())
+
+    def _despues_consulta(self, conn, cursor, statement, parameters, context, executemany):
+        inicios = conn.info.get('instrumentacion_inicio')
+        if not inicios:
+            return
+        duracion = time.perf_counter() - inicios.pop()
+        if not has_request_context():
+            return
+        datos = g.get('instrumentacion')
+        if datos is None:
+            return
+        datos['consultas'] += 1
+        datos['sql'] += duracion
+        if context is not None and (context.isinsert or context.isupdate or context.isdelete):
+            datos['filas'] += max(cursor.rowcount, 0)
+
+    def _error_consulta(self, contexto):
+        # Descartar el inicio de la consulta fallida para no desfasar la pila
+        if contexto.connection is not None:
+            inicios = contexto.connection.info.get('instrumentacion_inicio')
+            if inicios:
+                inicios.pop()
+
+    def _instancia_cargada(self, target, context):
+        if has_request_context():
+            datos = g.get('instrumentacion')
+            if datos is not None:
+                datos['filas'] += 1
+
+    # -- Consulta ------------------------------------------------------------
+
+    def resumen(self):
+        """Resumen por endpoint, ordenado por p95 descendente"""
+        with self.lock:
+            resumen = [dict(endpoint=endpoint, **e.resumen()) for endpoint, e in self.endpoints.items()]
+        return sorted(resumen, key=lambda item: item['p95_ms'], reverse=True)
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Métricas en formato de texto de Prometheus
+
+Con varios workers de gunicorn, definir PROMETHEUS_MULTIPROC_DIR: cada worker
+vuelca sus métricas a un archivo de ese directorio y /metrics suma todos.
+Un hilo del worker vuelca los cambios pendientes cada intervalo_volcado, haya
+o no peticiones, y gunicorn hace un último volcado al terminar el worker.
+El directorio debe vaciarse al arrancar (ver gunicorn.conf.py).
+"""
+
+import glob
+import json
+import os
+import threading
+import time
+
+# Buckets (en segundos) del histograma de latencia
+BUCKETS_LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+AYUDA = {
+    'gestor_http_request_duration_seconds': ('histogram', 'Latencia de las peticiones HTTP por endpoint'),
+    'gestor_http_requests_total': ('counter', 'Peticiones HTTP por endpoint y código de estado'),
+    'gestor_db_queries_total': ('counter', 'Consultas SQL ejecutadas por endpoint'),
+    'gestor_db_pool_checkouts_total': ('counter', 'Conexiones tomadas del pool'),
+    'gestor_db_pool_timeouts_total': ('counter', 'Peticiones que agotaron la espera de una conexión del pool, por endpoint'),
+    'gestor_filas_exportadas_total': ('counter', 'Filas escritas en exportaciones'),
+    'gestor_filas_importadas_total': ('counter', 'Filas procesadas en importaciones por resultado'),
+    'gestor_db_pool_size': ('gauge', 'Tamaño configurado del pool (suma de workers vivos)'),
+    'gestor_db_pool_checked_out': ('gauge', 'Conexiones del pool en uso (suma de workers vivos)'),
+    'gestor_db_pool_overflow': ('gauge', 'Conexiones abiertas por encima de pool_size (suma de workers vivos)'),
+    'gestor_cuentas': ('gauge', 'Cuentas por estado'),
+    'gestor_cuentas_valor': ('gauge', 'Suma de precios de las cuentas por estado'),
+    'gestor_cuentas_por_vencer': ('gauge', 'Cuentas que vencen en los próximos 7 días'),
+}
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _etiquetas(pares):
+    if not pares:
+        return ''
+    return '{' + ','.join(f'{k}="{_escapar(v)}"' for k, v in pares) + '}'
+
+def _numero(valor):
+    if valor == float('inf'):
+        return '+Inf'
+    if float(valor).is_integer():
+        return str(int(valor))
+    return repr(float(valor))
+
+def _pid_vivo(pid):
+    try:
+        os.kill(pid, 0)
+        return True
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+
+class Metricas:
+    """Contadores e histogramas de este proceso, con volcado opcional a disco"""
+
+    def __init__(self, directorio=None, intervalo_volcado=1.0):
+        self.directorio = directorio if directorio is not None else os.getenv('PROMETHEUS_MULTIPROC_DIR')
+        self.intervalo_volcado = intervalo_volcado
+        self.contadores = {}   # (nombre, etiquetas) -> valor
+        self.histogramas = {}  # (nombre, etiquetas) -> [conteos por bucket..., suma, total]
+        self.gauges = {}       # (nombre, etiquetas) -> valor (gauges propios del proceso)
+        self.lock = threading.Lock()
+        self.sucio = False     # cambios sin volcar
+        self.pid_hilo = None   # proceso dueño del hilo de volcado (tras un fork hay que crear otro)
+
+    # -- Registro ------------------------------------------------------------
+
+    def incrementar(self, nombre, valor=1, **etiquetas):
+        clave = (nombre, tuple(sorted(etiquetas.items())))
+        with self.lock:
+            self.contadores[clave] = self.contadores.get(clave, 0) + valor
+            self.sucio = True
+        self._asegurar_hilo()
+
+    def observar(self, nombre, valor, buckets=BUCKETS_LATENCIA, **etiquetas):
+        clave = (nombre, tuple(sorted(etiquetas.items())))
+        with self.lock:
+            datos = self.histogramas.get(clave)
+            if datos is None:
+                datos = self.histogramas[clave] = [0] * len(buckets) + [0.0, 0]
+            for i, limite in enumerate(buckets):
+                if valor <= limite:
+                    datos[i] += 1
+                    break
+            datos[-2] += valor
+            datos[-1] += 1
+            self.sucio = True
+        self._asegurar_hilo()
+
+    def fijar(self, nombre, valor, **etiquetas):
+        with self.lock:
+            self.gauges[(nombre, tuple(sorted(etiquetas.items())))] = valor
+            self.sucio = True
+        self._asegurar_hilo()
+
+    # -- Multiproceso ----------------------------------------------------------
+
+    def _estado(self):
+        with self.lock:
+            self.sucio = False
+            return {
+                'pid': os.getpid(),
+                'contadores': [[n, e, v] for (n, e), v in self.contadores.items()],
+                'histogramas': [[n, e, d] for (n, e), d in self.histogramas.items()],
+                'gauges': [[n, e, v] for (n, e), v in self.gauges.items()],
+            }
+
+    def volcar(self):
+        """Escribir el estado de este worker en el directorio compartido"""
+        if not self.directorio:
+            return
+        os.makedirs(self.directorio, exist_ok=True)
+        ruta = os.path.join(self.directorio, f'metricas_{os.getpid()}.json')
+        temporal = ruta + '.tmp'
+        with open(temporal, 'w', encoding='utf-8') as archivo:
+            json.dump(self._estado(), archivo)
+        os.replace(temporal, ruta)
+
+    def _asegurar_hilo(self):
+        """Arrancar el hilo de volcado en este proceso (el primer registro de cada worker)"""
+        if not self.directorio or self.pid_hilo == os.getpid():
+            return
+        with self.lock:
+            if self.pid_hilo == os.getpid():
+                return
+            self.pid_hilo = os.getpid()
+        threading.Thread(target=self._volcar_periodicamente, name='volcado-metricas', daemon=True).start()
+
+    def _volcar_periodicamente(self):
+        while True:
+            time.sleep(self.intervalo_volcado)
+            if self.sucio:
+                try:
+                    self.volcar()
+                except OSError:
+                    pass
+
+    def _estados(self):
+        if not self.directorio:
+            return [self._estado()]
+        self.volcar()
+        estados = []
+        for ruta in glob.glob(os.path.join(self.directorio, 'metricas_*.json')):
+            try:
+                with open(ruta, encoding='utf-8') as archivo:
+                    estados.append(json.load(archivo))
+            except (OSError, ValueError):
+                continue
+        return estados
+
+    # -- Exposición ----------------------------------------------------------
+
+    def exponer(self, gauges_extra=()):
+        """Texto en formato Prometheus; gauges_extra: [(nombre, etiquetas_dict, valor)]"""
+        contadores = {}
+        histogramas = {}
+        gauges = {}
+
+        for estado in self._estados():
+            # Contadores e histogramas de workers muertos se siguen sumando;
+            # sus gauges no, porque ya no describen nada vivo
+            for nombre, etiquetas, valor in estado['contadores']:
+                clave = (nombre, tuple(map(tuple, etiquetas)))
+                contadores[clave] = contadores.get(clave, 0) + valor
+            for nombre, etiquetas, datos in estado['histogramas']:
+                clave = (nombre, tuple(map(tuple, etiquetas)))
+                acumulado = histogramas.get(clave)
+                histogramas[clave] = datos if acumulado is None else [a + b for a, b in zip(acumulado, datos)]
+            if estado['pid'] == os.getpid() or _pid_vivo(estado['pid']):
+                for nombre, etiquetas, valor in estado['gauges']:
+                    clave = (nombre, tuple(map(tuple, etiquetas)))
+                    gauges[clave] = gauges.get(clave, 0) + valor
+
+        for nombre, etiquetas, valor in gauges_extra:
+            gauges[(nombre, tuple(sorted(etiquetas.items())))] = valor
+
+        lineas = []
+        por_nombre = {}
+        for (nombre, etiquetas), valor in contadores.items():
+            por_nombre.setdefault(nombre, []).append((etiquetas, valor))
+        for (nombre, etiquetas), valor in gauges.items():
+            por_nombre.setdefault(nombre, []).append((etiquetas, valor))
+        for (nombre, etiquetas), datos in histogramas.items():
+            por_nombre.setdefault(nombre, []).append((etiquetas, datos))
+
+        for nombre in sorted(por_nombre):
+            tipo, ayuda = AYUDA.get(nombre, ('untyped', nombre))
+            lineas.append(f'# HELP {nombre} {ayuda}')
+            lineas.append(f'# TYPE {nombre} {tipo}')
+            for etiquetas, valor in sorted(por_nombre[nombre]):
+                if tipo == 'histogram':
+                    acumulado = 0
+                    for limite, conteo in zip(BUCKETS_LATENCIA, valor[:-2]):
+                        acumulado += conteo
+                        lineas.append(f'{nombre}_bucket{_etiquetas(etiquetas + (("le", _numero(limite)),))} {acumulado}')
+                    lineas.append(f'{nombre}_bucket{_etiquetas(etiquetas + (("le", "+Inf"),))} {valor[-1]}')
+                    lineas.append(f'{nombre}_sum{_etiquetas(etiquetas)} {_numero(valor[-2])}')
+                    lineas.append(f'{nombre}_count{_etiquetas(etiquetas)} {valor[-1]}')
+                else:
+                    lineas.append(f'{nombre}{_etiquetas(etiquetas)} {_numero(valor)}')
+
+        return '\n'.join(lineas) + '\n'
+
+    # -- Integraciones -------------------------------------------------------
+
+    def registrar_peticion(self, endpoint, datos):
+        """Suscriptor de Instrumentacion: latencia, peticiones y consultas por endpoint"""
+        self.observar('gestor_http_request_duration_seconds', datos['duracion_ms'] / 1000, endpoint=endpoint)
+        self.incrementar('gestor_http_requests_total', endpoint=endpoint, status=str(datos['status']))
+        if datos['consultas']:
+            self.incrementar('gestor_db_queries_total', datos['consultas'], endpoint=endpoint)
+
+    def observar_pool(self, engine):
+        """Contar checkouts y publicar el estado del pool de este worker"""
+        from sqlalchemy import event
+
+        pool = engine.pool
+
+        def checkout(dbapi_connection, connection_record, connection_proxy):
+            self.incrementar('gestor_db_pool_checkouts_total')
+            self.actualizar_pool(pool)
+
+        def checkin(dbapi_connection, connection_record):
+            self.actualizar_pool(pool)
+
+        event.listen(pool, 'checkout', checkout)
+        event.listen(pool, 'checkin', checkin)
+        self.actualizar_pool(pool)
+
+    def actualizar_pool(self, pool):
+        # Solo QueuePool expone tamaño y overflow
+        if not hasattr(pool, 'size') or not hasattr(pool, 'overflow'):
+            return
+        self.fijar('gestor_db_pool_size', pool.size())
+        self.fijar('gestor_db_pool_checked_out', pool.checkedout())
+        self.fijar('gestor_db_pool_overflow', max(pool.overflow(), 0))
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Migración para la sincronización incremental de la PWA (/api/cuentas/changes)
+
+- Agrega la columna cuenta.version (versión de la fila)
+- Crea la tabla cambio_cuenta y registra las cuentas existentes, para que
+  la primera sincronización (since=0) las reciba todas
+
+Uso:
+    python migrar_sincronizacion.py              # migrar
+    python migrar_sincronizacion.py --verificar  # ver el estado
+    python migrar_sincronizacion.py --compactar  # dejar solo el último cambio de cada cuenta
+"""
+
+import os
+import sys
+from datetime import datetime
+
+from sqlalchemy import text
+
+# Agregar el directorio actual al path para importar app
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import app, db, CambioCuenta
+
+def columnas_cuenta():
+    return [col['name'] for col in db.inspect(db.engine).get_columns('cuenta')]
+
+def migrar_sincronizacion():
+    """Agregar cuenta.version y llenar el registro de cambios"""
+    with app.app_context():
+        print("🚀 Iniciando migración de sincronización...")
+        try:
+            db.create_all()
+            print("✅ Tabla cambio_cuenta creada/verificada")
+
+            if 'version' not in columnas_cuenta():
+                with db.engine.begin() as conn:
+                    conn.execute(text('ALTER TABLE cuenta ADD COLUMN version INTEGER NOT NULL DEFAULT 1'))
+                print("✅ Columna cuenta.version agregada")
+            else:
+                print("ℹ️  La columna cuenta.version ya existe")
+
+            with db.engine.begin() as conn:
+                registrados = conn.execute(text('SELECT count(*) FROM cambio_cuenta')).scalar()
+                if registrados:
+                    print(f"ℹ️  El registro de cambios ya tiene {registrados} filas")
+                else:
+                    insertados = conn.execute(
+                        text('INSERT INTO cambio_cuenta (cuenta_id, usuario_id, eliminada, fecha) '
+                             'SELECT id, usuario_id, :falso, :ahora FROM cuenta ORDER BY id'),
+                        {'falso': False, 'ahora': datetime.utcnow()}
+                    ).rowcount
+                    print(f"✅ {insertados} cuentas existentes registradas para la primera sincronización")
+
+            print("\n🎉 ¡Migración completada exitosamente!")
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Error durante la migración: {str(e)}")
+            return False
+        return True
+
+def compactar_cambios():
+    """Borrar los cambios superados por otro más nuevo de la misma cuenta y dueño
+
+    Un cliente que sincronizó en el token T necesita, por cada cuenta, solo
+    el último cambio posterior a T: si ese último se conserva, el resultado
+    de la sincronización no cambia.
+    """
+    with app.app_context():
+        antes = CambioCuenta.query.count()
+        with db.engine.begin() as conn:
+            # La subconsulta va envuelta en una tabla derivada: MySQL no deja leer
+            # en una subconsulta la tabla de la que se borra (error 1093)
+            conn.execute(text(
+                'DELETE FROM cambio_cuenta WHERE id NOT IN (SELECT id FROM '
+                '(SELECT max(id) AS id FROM cambio_cuenta GROUP BY cuenta_id, usuario_id) AS ultimos)'
+            ))
+        despues = CambioCuenta.query.count()
+        print(f"🧹 Registro de cambios compactado: {antes} -> {despues} filas")
+
+def verificar_estado_migracion():
+    """Verificar el estado actual de la migración"""
+    with app.app_context():
+        print("🔍 Verificando estado de la migración...")
+        try:
+            tiene_version = 'version' in columnas_cuenta()
+            print(f"   {'✅' if tiene_version else '❌'} Columna cuenta.version")
+            if db.inspect(db.engine).has_table('cambio_cuenta'):
+                with db.engine.connect() as conn:
+                    filas = conn.execute(text('SELECT count(*) FROM cambio_cuenta')).scalar()
+                print(f"   ✅ Tabla cambio_cuenta ({filas} filas)")
+            else:
+                print("   ❌ Tabla cambio_cuenta")
+        except Exception as e:
+            print(f"❌ Error al verificar estado: {str(e)}")
+
+if __name__ == '__main__':
+    print("=" * 60)
+    print("🔄 MIGRADOR DE SINCRONIZACIÓN INCREMENTAL")
+    print("=" * 60)
+
+    if len(sys.argv) > 1 and sys.argv[1] == '--verificar':
+        verificar_estado_migracion()
+    elif len(sys.argv) > 1 and sys.argv[1] == '--compactar':
+        compactar_cambios()
+    else:
+        if not migrar_sincronizacion():
+            print("\n❌ La migración falló. Revisa los errores arriba.")
+            sys.exit(1)
+
+    print("\n" + "=" * 60)
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cola de notificaciones salientes para recordatorios de vencimiento
+
+Uso (programar con cron o el scheduler de la plataforma):
+    python notificaciones.py programar --dias 3
+    python notificaciones.py enviar --archivo notificaciones_enviadas.jsonl
+    python notificaciones.py enviar --url https://mi-pasarela/enviar --por-segundo 1
+"""
+
+import argparse
+import json
+import threading
+import time
+import urllib.request
+from datetime import date, datetime, timedelta
+
+from app import app, db, Cuenta, Notificacion, PlantillaMensaje, insertar_sin_duplicados
+from plantillas_whatsapp import renderizar_mensaje
+
+# ---------------------------------------------------------------------------
+# Enviadores (cualquier objeto con un método enviar() sirve)
+# ---------------------------------------------------------------------------
+
+class EnviadorArchivo:
+    """Escribe cada notificación como una línea JSON en un archivo local"""
+
+    def __init__(self, ruta='notificaciones_enviadas.jsonl'):
+        self.ruta = ruta
+
+    def enviar(self, destino, mensaje, clave):
+        with open(self.ruta, 'a', encoding='utf-8') as archivo:
+            archivo.write(json.dumps({
+                'clave': clave,
+                'destino': destino,
+                'mensaje': mensaje,
+                'fecha': datetime.now().isoformat()
+            }, ensure_ascii=False) + '\n')
+
+class EnviadorHTTP:
+    """Envía cada notificación como JSON a una pasarela HTTP"""
+
+    def __init__(self, url, token=None, timeout=10):
+        self.url = url
+        self.token = token
+        self.timeout = timeout
+
+    def enviar(self, destino, mensaje, clave):
+        datos = json.dumps({'destino': destino, 'mensaje': mensaje}).encode('utf-8')
+        peticion = urllib.request.Request(self.url, data=datos, method='POST')
+        peticion.add_header('Content-Type', 'application/json')
+        # La pasarela puede usar la clave para descartar reenvíos
+        peticion.add_header('Idempotency-Key', clave)
+        if self.token:
+            peticion.add_header('Authorization', f'Bearer {self.token}')
+        with urllib.request.urlopen(peticion, timeout=self.timeout) as respuesta:
+            if respuesta.status >= 300:
+                raise RuntimeError(f'Respuesta HTTP {respuesta.status}')
+
+class LimitadorTasa:
+    """Limitador de tipo token bucket: como máximo `por_segundo` envíos por segundo"""
+
+    def __init__(self, por_segundo=1.0, rafaga=1):
+        self.intervalo = 1.0 / por_segundo if por_segundo > 0 else 0
+        self.capacidad = max(1, rafaga)
+        self.tokens = float(self.capacidad)
+        self.ultimo = time.monotonic()
+        self.lock = threading.Lock()
+
+    def esperar(self):
+        if not self.intervalo:
+            return
+        with self.lock:
+            ahora = time.monotonic()
+            self.tokens = min(self.capacidad, self.tokens + (ahora - self.ultimo) / self.intervalo)
+            self.ultimo = ahora
+            if self.tokens < 1:
+                time.sleep((1 - self.tokens) * self.intervalo)
+                self.tokens = 1
+                self.ultimo = time.monotonic()
+            self.tokens -= 1
+
+# ---------------------------------------------------------------------------
+# Programación y envío
+# ---------------------------------------------------------------------------
+
+def clave_recordatorio(cuenta):
+    """Un recordatorio por cuenta y fecha de vencimiento (una renovación genera otro)"""
+    return f"recordatorio:{cuenta.id}:{cuenta.fecha_vencimiento.isoformat()}"
+
+def programar_recordatorios(dias=3, hoy=None):
+    """Encolar recordatorios para las cuentas vendidas que vencen en los próximos `dias` días"""
+    hoy = hoy or date.today()
+
+    # Cuentas por vencer junto con la plantilla de recordatorio de su dueño
+    filas = db.session.query(Cuenta, PlantillaMensaje.contenido).outerjoin(
+        PlantillaMensaje,
+        db.and_(PlantillaMensaje.usuario_id == Cuenta.usuario_id, PlantillaMensaje.tipo == 'recordatorio')
+    ).filter(
+        Cuenta.estado == 'Vendida',
+        Cuenta.whatsapp_comprador.isnot(None),
+        db.func.trim(Cuenta.whatsapp_comprador) != '',
+        Cuenta.fecha_vencimiento.isnot(None),
+        Cuenta.fecha_vencimiento >= hoy,
+        Cuenta.fecha_vencimiento <= hoy + timedelta(days=dias)
+    ).all()
+
+    if not filas:
+        return 0
+
+    # Claves ya encoladas en una sola consulta (evita renderizar mensajes de más; el
+    # INSERT igual omite las que otro proceso encole entretanto)
+    claves = [clave_recordatorio(cuenta) for cuenta, _ in filas]
+    existentes = {clave for (clave,) in db.session.query(Notificacion.clave_idempotencia).filter(
+        Notificacion.clave_idempotencia.in_(claves)
+    )}
+
+    nuevas = []
+    for (cuenta, plantilla), clave in zip(filas, claves):
+        if clave in existentes:
+            continue
+        existentes.add(clave)
+        nuevas.append({
+            'clave_idempotencia': clave,
+            'cuenta_id': cuenta.id,
+            'usuario_id': cuenta.usuario_id,
+            'tipo': 'recordatorio',
+            'destino': cuenta.whatsapp_comprador,
+            'mensaje': renderizar_mensaje(cuenta, 'recordatorio', plantilla),
+            'estado': 'Pendiente',
+            'intentos': 0,
+            'fecha_creacion': datetime.utcnow()
+        })
+
+    insertadas = insertar_sin_duplicados(Notificacion.__table__, nuevas, ['clave_idempotencia'])
+    db.session.commit()
+    return insertadas
+
+def espera_reintento(intentos, espera_base=300):
+    """Segundos hasta el próximo intento tras `intentos` fallos: 5 min, 10 min, 20 min..."""
+    return espera_base * 2 ** (intentos - 1)
+
+def procesar_cola(enviador, por_segundo=1.0, lote=50, max_intentos=3, limite=None, espera_base=300):
+    """Enviar notificaciones pendientes respetando el límite de envíos por segundo
+
+    Una notificación que falla no se reintenta hasta su proximo_intento, con una
+    espera que se duplica en cada fallo: así los reintentos (en esta corrida o
+    en las siguientes) cubren una caída de la pasarela en vez de agotarse en segundos.
+    """
+    limitador = LimitadorTasa(por_segundo)
+    enviadas = 0
+    fallidas = 0
+
+    while limite is None or enviadas + fallidas < limite:
+        tamano = lote if limite is None else min(lote, limite - enviadas - fallidas)
+        query = Notificacion.query.filter(
+            Notificacion.estado == 'Pendiente',
+            Notificacion.intentos < max_intentos,
+            db.or_(Notificacion.proximo_intento.is_(None), Notificacion.proximo_intento <= datetime.utcnow())
+        ).order_by(Notificacion.id.asc()).limit(tamano)
+
+        if db.engine.dialect.name == 'postgresql':
+            # Permite varios procesos drenando la cola sin pisarse
+            query = query.with_for_update(skip_locked=True)
+
+        pendientes = query.all()
+        if not pendientes:
+            break
+
+        for notificacion in pendientes:
+            limitador.esperar()
+            notificacion.intentos += 1
+            try:
+                enviador.enviar(notificacion.destino, notificacion.mensaje, notificacion.clave_idempotencia)
+                notificacion.estado = 'Enviada'
+                notificacion.fecha_envio = datetime.utcnow()
+                notificacion.ultimo_error = None
+                notificacion.proximo_intento = None
+                enviadas += 1
+            except Exception as e:
+                notificacion.ultimo_error = str(e)
+                if notificacion.intentos >= max_intentos:
+                    notificacion.estado = 'Error'
+                else:
+                    notificacion.proximo_intento = datetime.utcnow() + timedelta(
+                        seconds=espera_reintento(notificacion.intentos, espera_base))
+                fallidas += 1
+
+        db.session.commit()
+
+    return enviadas, fallidas
+
+def main():
+    parser = argparse.ArgumentParser(description='Cola de notificaciones de vencimiento')
+    subcomandos = parser.add_subparsers(dest='comando', required=True)
+
+    programar = subcomandos.add_parser('programar', help='Encolar recordatorios de vencimiento')
+    programar.add_argument('--dias', type=int, default=3, help='Días de anticipación (por defecto 3)')
+
+    enviar = subcomandos.add_parser('enviar', help='Drenar la cola de notificaciones')
+    destino = enviar.add_mutually_exclusive_group()
+    destino.add_argument('--archivo', default='notificaciones_enviadas.jsonl', help='Archivo JSONL de salida')
+    destino.add_argument('--url', help='URL de la pasarela HTTP')
+    enviar.add_argument('--token', help='Token Bearer para la pasarela HTTP')
+    enviar.add_argument('--por-segundo', type=float, default=1.0, help='Máximo de envíos por segundo')
+    enviar.add_argument('--limite', type=int, help='Máximo de notificaciones a procesar')
+    enviar.add_argument('--espera-reintento', type=int, default=300,
+                        help='Segundos antes del primer reintento tras un fallo; se duplica en cada fallo (por defecto 300)')
+
+    args = parser.parse_args()
+
+    with app.app_context():
+        if args.comando == 'programar':
+            nuevas = programar_recordatorios(args.dias)
+            print(f"📬 {nuevas} recordatorios encolados")
+        else:
+            enviador = EnviadorHTTP(args.url, args.token) if args.url else EnviadorArchivo(args.archivo)
+            enviadas, fallidas = procesar_cola(enviador, args.por_segundo, limite=args.limite,
+                                              espera_base=args.espera_reintento)
+            print(f"✅ {enviadas} notificaciones enviadas, ❌ {fallidas} fallidas")
+
+if __name__ == '__main__':
+    main()
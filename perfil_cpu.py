@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Perfilador de CPU por muestreo para peticiones en producción
+
+Un hilo muestreador lee la pila de los hilos que atienden peticiones
+seleccionadas (sys._current_frames) cada `intervalo_ms`. Las pilas se
+acumulan en formato "folded" (una línea `marco;marco;marco N` por pila),
+compatible con flamegraph.pl y speedscope, en PERFIL_CPU_DIR/<endpoint>.folded.
+Los marcos de plantillas Jinja se muestran con el archivo y la línea de la
+plantilla, no del código compilado.
+
+Con motor 'pyinstrument' (opcional, pip install pyinstrument) cada petición
+perfilada se guarda como <endpoint>_<fecha>.speedscope.json.
+
+La configuración vive en PERFIL_CPU_DIR/config.json para que el cambio hecho
+por un administrador llegue a todos los workers.
+"""
+
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+from flask import g, request
+
+CONFIGURACION_POR_DEFECTO = {
+    'activo': False,
+    'fraccion': 0.1,            # fracción de peticiones perfiladas
+    'endpoints': ['index', 'ver_cuenta'],
+    'intervalo_ms': 5,
+    'motor': 'muestreo',        # 'muestreo' o 'pyinstrument'
+}
+MOTORES = ('muestreo', 'pyinstrument')
+PROFUNDIDAD_MAXIMA = 128
+
+RAIZ = os.path.dirname(os.path.abspath(__file__))
+
+def _archivo_corto(ruta):
+    if ruta.startswith(RAIZ):
+        return os.path.relpath(ruta, RAIZ)
+    if 'site-packages' in ruta:
+        return ruta.split('site-packages' + os.sep, 1)[-1]
+    return os.path.basename(ruta)
+
+def etiqueta_marco(marco):
+    """`funcion (archivo:línea)`; para plantillas Jinja usa la línea de la plantilla"""
+    codigo = marco.f_code
+    plantilla = marco.f_globals.get('__jinja_template__')
+    if plantilla is not None:
+        linea = plantilla.get_corresponding_lineno(marco.f_lineno)
+        archivo = f'templates/{plantilla.name}'
+    else:
+        linea = marco.f_lineno
+        archivo = _archivo_corto(codigo.co_filename)
+    # ';' separa marcos en el formato folded
+    return f'{codigo.co_name} ({archivo}:{linea})'.replace(';', ',')
+
+def pila_plegada(marco):
+    marcos = []
+    while marco is not None and len(marcos) < PROFUNDIDAD_MAXIMA:
+        marcos.append(etiqueta_marco(marco))
+        marco = marco.f_back
+    return ';'.join(reversed(marcos))
+
+class PerfiladorCPU:
+    """Engancha before_request/teardown_request y muestrea las peticiones elegidas"""
+
+    def __init__(self, app=None, directorio=None):
+        self.directorio = directorio or os.getenv('PERFIL_CPU_DIR', os.path.join('perfiles', 'cpu'))
+        self.lock = threading.Lock()
+        self.activos = {}  # id de hilo -> Counter de pilas
+        self.hay_trabajo = threading.Event()
+        self.hilo = None
+        self._configuracion = dict(CONFIGURACION_POR_DEFECTO)
+        self._mtime = None
+        self._leida = 0.0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.before_request(self._inicio_peticion)
+        app.teardown_request(self._fin_peticion)
+        app.extensions['perfil_cpu'] = self
+
+    # -- Configuración ---------------------------------------------------------
+
+    @property
+    def ruta_configuracion(self):
+        return os.path.join(self.directorio, 'config.json')
+
+    def configuracion(self):
+        """Configuración actual; el archivo se revisa como mucho una vez por segundo"""
+        ahora = time.monotonic()
+        if ahora - self._leida < 1.0:
+            return self._configuracion
+        self._leida = ahora
+        try:
+            mtime = os.path.getmtime(self.ruta_configuracion)
+        except OSError:
+            return self._configuracion
+        if mtime != self._mtime:
+            try:
+                with open(self.ruta_configuracion, encoding='utf-8') as archivo:
+                    self._configuracion = {**CONFIGURACION_POR_DEFECTO, **json.load(archivo)}
+                self._mtime = mtime
+            except (OSError, ValueError):
+                pass
+        return self._configuracion
+
+    def guardar_configuracion(self, cambios):
+        """Validar y guardar cambios; lanza ValueError si algún valor no es válido"""
+        nueva = dict(self.configuracion())
+        if 'activo' in cambios:
+            nueva['activo'] = bool(cambios['activo'])
+        if 'fraccion' in cambios:
+            fraccion = float(cambios['fraccion'])
+            if not 0 < fraccion <= 1:
+                raise ValueError('La fracción debe estar entre 0 y 1')
+            nueva['fraccion'] = fraccion
+        if 'endpoints' in cambios:
+            if not isinstance(cambios['endpoints'], list) or not all(isinstance(e, str) for e in cambios['endpoints']):
+                raise ValueError('endpoints debe ser una lista de nombres de endpoint')
+            nueva['endpoints'] = cambios['endpoints']
+        if 'intervalo_ms' in cambios:
+            intervalo = float(cambios['intervalo_ms'])
+            if not 1 <= intervalo <= 1000:
+                raise ValueError('El intervalo debe estar entre 1 y 1000 ms')
+            nueva['intervalo_ms'] = intervalo
+        if 'motor' in cambios:
+            if cambios['motor'] not in MOTORES:
+                raise ValueError(f"Motor desconocido: {cambios['motor']}")
+            if cambios['motor'] == 'pyinstrument':
+                try:
+                    import pyinstrument  # noqa: F401
+                except ImportError:
+                    raise ValueError('pyinstrument no está instalado')
+            nueva['motor'] = cambios['motor']
+
+        os.makedirs(self.directorio, exist_ok=True)
+        temporal = self.ruta_configuracion + '.tmp'
+        with open(temporal, 'w', encoding='utf-8') as archivo:
+            json.dump(nueva, archivo, indent=2)
+        os.replace(temporal, self.ruta_configuracion)
+        self._configuracion, self._leida = nueva, 0.0
+        return nueva
+
+    # -- Flask -----------------------------------------------------------------
+
+    def _inicio_peticion(self):
+        configuracion = self.configuracion()
+        if not configuracion['activo'] or request.endpoint not in configuracion['endpoints']:
+            return
+        if random.random() >= configuracion['fraccion']:
+            return
+
+        if configuracion['motor'] == 'pyinstrument':
+            try:
+                from pyinstrument import Profiler
+            except ImportError:
+                return
+            perfilador = Profiler(interval=configuracion['intervalo_ms'] / 1000, async_mode='disabled')
+            perfilador.start()
+            g.perfil_cpu = ('pyinstrument', perfilador)
+            return
+
+        hilo_id = threading.get_ident()
+        with self.lock:
+            self.activos[hilo_id] = Counter()
+            if self.hilo is None or not self.hilo.is_alive():
+                self.hilo = threading.Thread(target=self._muestrear, name='perfil-cpu', daemon=True)
+                self.hilo.start()
+        self.hay_trabajo.set()
+        g.perfil_cpu = ('muestreo', hilo_id)
+
+    def _fin_peticion(self, error=None):
+        perfil = g.pop('perfil_cpu', None)
+        if perfil is None:
+            return
+        endpoint = request.endpoint or 'desconocido'
+        motor, dato = perfil
+        try:
+            if motor == 'pyinstrument':
+                self._guardar_pyinstrument(endpoint, dato)
+            else:
+                with self.lock:
+                    pilas = self.activos.pop(dato, None)
+                if pilas:
+                    self._guardar_plegado(endpoint, pilas)
+        except OSError:
+            pass
+
+    # -- Muestreo --------------------------------------------------------------
+
+    def _muestrear(self):
+        while True:
+            with self.lock:
+                objetivos = list(self.activos)
+                if not objetivos:
+                    self.hay_trabajo.clear()
+            if not objetivos:
+                self.hay_trabajo.wait()
+                continue
+
+            marcos = sys._current_frames()
+            muestras = [(hilo_id, pila_plegada(marcos[hilo_id])) for hilo_id in objetivos if hilo_id in marcos]
+            del marcos
+            # Las pilas se pliegan fuera del lock; el conteo va dentro y solo para peticiones que
+            # siguen activas, así _fin_peticion recibe un Counter que ya nadie modifica
+            with self.lock:
+                for hilo_id, pila in muestras:
+                    pilas = self.activos.get(hilo_id)
+                    if pilas is not None:
+                        pilas[pila] += 1
+            time.sleep(self._configuracion['intervalo_ms'] / 1000)
+
+    # -- Salida ----------------------------------------------------------------
+
+    def _guardar_plegado(self, endpoint, pilas):
+        os.makedirs(self.directorio, exist_ok=True)
+        contenido = ''.join(f'{pila} {conteo}\n' for pila, conteo in pilas.items())
+        # Una sola escritura en modo append: varios workers pueden compartir el archivo
+        with open(os.path.join(self.directorio, f'{endpoint}.folded'), 'a', encoding='utf-8') as archivo:
+            archivo.write(contenido)
+
+    def _guardar_pyinstrument(self, endpoint, perfilador):
+        from pyinstrument.renderers import SpeedscopeRenderer
+
+        sesion = perfilador.stop()
+        os.makedirs(self.directorio, exist_ok=True)
+        ruta = os.path.join(self.directorio, f'{endpoint}_{datetime.now():%Y%m%d_%H%M%S_%f}.speedscope.json')
+        with open(ruta, 'w', encoding='utf-8') as archivo:
+            archivo.write(SpeedscopeRenderer().render(sesion))
+
+    def archivos(self):
+        """Perfiles guardados: [{archivo, muestras, tamano_kb}]"""
+        if not os.path.isdir(self.directorio):
+            return []
+        resultado = []
+        for nombre in sorted(os.listdir(self.directorio)):
+            if not nombre.endswith(('.folded', '.speedscope.json')):
+                continue
+            ruta = os.path.join(self.directorio, nombre)
+            muestras = None
+            if nombre.endswith('.folded'):
+                with open(ruta, encoding='utf-8') as archivo:
+                    muestras = sum(int(linea.rsplit(' ', 1)[1]) for linea in archivo if linea.strip())
+            resultado.append({'archivo': nombre, 'muestras': muestras,
+                              'tamano_kb': round(os.path.getsize(ruta) / 1024, 1)})
+        return resultado
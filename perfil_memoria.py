@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Modo de perfilado de memoria para exportaciones e importaciones
+
+Se activa para todas las peticiones con PERFIL_MEMORIA=1, o para una sola
+petición de un administrador con la cabecera `X-Perfil-Memoria: 1`.
+Cada petición perfilada escribe un reporte en PERFIL_MEMORIA_DIR
+(por defecto perfiles/memoria) con:
+    - pico de memoria durante la vista
+    - líneas que más memoria asignaron durante la vista
+    - memoria que sigue retenida cuando la petición ya terminó
+"""
+
+import gc
+import os
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+from functools import wraps
+
+from flask import make_response, request
+from flask_login import current_user
+from werkzeug.wsgi import ClosingIterator
+
+CABECERA = 'X-Perfil-Memoria'
+LINEAS_REPORTE = 15
+MARCOS_TRAZA = 10
+
+_lock = threading.Lock()
+_activos = 0
+
+def _directorio():
+    return os.getenv('PERFIL_MEMORIA_DIR', os.path.join('perfiles', 'memoria'))
+
+def perfil_solicitado():
+    if os.getenv('PERFIL_MEMORIA') == '1':
+        return True
+    return (request.headers.get(CABECERA) == '1'
+            and current_user.is_authenticated and getattr(current_user, 'es_admin', False))
+
+def _iniciar():
+    global _activos
+    with _lock:
+        if _activos == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start(MARCOS_TRAZA)
+        _activos += 1
+
+def _detener():
+    global _activos
+    with _lock:
+        _activos -= 1
+        if _activos == 0 and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+def _filtrar(snapshot):
+    # Excluir las asignaciones del propio tracemalloc
+    return snapshot.filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    ))
+
+def _lineas(diferencias, limite=LINEAS_REPORTE):
+    lineas = []
+    for estadistica in [d for d in diferencias if d.size_diff > 0][:limite]:
+        marco = estadistica.traceback[0]
+        lineas.append(f'{estadistica.size_diff / 1024:>10.1f} KB {estadistica.count_diff:>8} bloques  '
+                      f'{marco.filename}:{marco.lineno}')
+    return lineas or ['(nada)']
+
+def _escribir_reporte(datos):
+    directorio = _directorio()
+    os.makedirs(directorio, exist_ok=True)
+    nombre = f"{datetime.now():%Y%m%d_%H%M%S_%f}_{datos['endpoint']}_{os.getpid()}.txt"
+    ruta = os.path.join(directorio, nombre)
+    with open(ruta, 'w', encoding='utf-8') as archivo:
+        archivo.write('=' * 80 + '\n')
+        archivo.write(f"PERFIL DE MEMORIA: {datos['metodo']} {datos['ruta']} ({datos['endpoint']})\n")
+        archivo.write('=' * 80 + '\n')
+        archivo.write(f"Fecha: {datos['fecha']:%d/%m/%Y %H:%M:%S}\n")
+        archivo.write(f"Duración de la vista: {datos['duracion_ms']:.1f} ms\n")
+        archivo.write(f"Pico durante la vista: {datos['pico'] / 1024:.1f} KB "
+                      f"(base al empezar: {datos['base'] / 1024:.1f} KB)\n")
+        archivo.write(f"Retenido al terminar la petición: {datos['retenido'] / 1024:.1f} KB\n\n")
+        archivo.write("PRINCIPALES ASIGNACIONES DURANTE LA VISTA\n")
+        archivo.write('-' * 40 + '\n')
+        archivo.write('\n'.join(datos['asignaciones']) + '\n\n')
+        archivo.write("MEMORIA RETENIDA DESPUÉS DE LA PETICIÓN\n")
+        archivo.write('-' * 40 + '\n')
+        archivo.write('\n'.join(datos['retenidas']) + '\n')
+    return ruta
+
+def perfilar_memoria(vista):
+    """Decorador para vistas: perfila la petición si el modo está activo"""
+    @wraps(vista)
+    def envoltura(*args, **kwargs):
+        if not perfil_solicitado():
+            return vista(*args, **kwargs)
+
+        _iniciar()
+        try:
+            gc.collect()
+            antes = _filtrar(tracemalloc.take_snapshot())
+            base, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            inicio = time.perf_counter()
+
+            respuesta = make_response(vista(*args, **kwargs))
+
+            duracion_ms = (time.perf_counter() - inicio) * 1000
+            _, pico = tracemalloc.get_traced_memory()
+            al_terminar = _filtrar(tracemalloc.take_snapshot())
+        except BaseException:
+            _detener()
+            raise
+
+        datos = {
+            'fecha': datetime.now(),
+            'metodo': request.method,
+            'ruta': request.path,
+            'endpoint': request.endpoint or 'desconocido',
+            'duracion_ms': duracion_ms,
+            'base': base,
+            'pico': pico,
+            'asignaciones': _lineas(al_terminar.compare_to(antes, 'lineno')),
+        }
+
+        def al_cerrar():
+            # La petición ya se envió y sus objetos deberían haberse liberado
+            try:
+                gc.collect()
+                despues = _filtrar(tracemalloc.take_snapshot())
+                actual, _ = tracemalloc.get_traced_memory()
+                datos['retenido'] = max(actual - base, 0)
+                datos['retenidas'] = _lineas(despues.compare_to(antes, 'lineno'))
+                _escribir_reporte(datos)
+            finally:
+                _detener()
+
+        respuesta.headers[CABECERA] = f'{pico / 1024:.1f} KB'
+        if respuesta.direct_passthrough:
+            # send_file entrega el iterable tal cual y nunca llama a respuesta.close()
+            respuesta.response = ClosingIterator(respuesta.response, al_cerrar)
+        else:
+            respuesta.call_on_close(al_cerrar)
+        return respuesta
+
+    return envoltura
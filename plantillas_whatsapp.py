@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Motor de plantillas para mensajes de WhatsApp
+Cada plantilla se compila una sola vez y se reutiliza en todos los mensajes
+"""
+
+import string
+from datetime import date
+from functools import lru_cache
+
+# Plantillas por defecto (cada usuario puede personalizar las suyas)
+PLANTILLAS_POR_DEFECTO = {
+    'venta': """🎉 *¡Tu cuenta de {plataforma} está lista!*
+
+📱 *Plataforma:* {plataforma}
+📧 *Email:* {email}
+🔑 *Contraseña:* {password}
+🎬 *Plataforma:* {plataforma}
+📅 *Fecha de compra:* {fecha_venta}
+⏰ *Vencimiento:* {fecha_vencimiento}
+
+✅ *Estado:* Cuenta activa y funcional
+
+⚠️ *Importante:* 
+• Guarda estos datos en un lugar seguro
+• No compartas la contraseña con nadie
+• La cuenta vence el {fecha_vencimiento}
+
+🆘 Si tienes algún problema, contáctanos.
+
+¡Disfruta de tu cuenta! 🎬""",
+    'recordatorio': """⏰ *Hola {nombre_comprador}, tu cuenta de {plataforma} está por vencer*
+
+📧 *Email:* {email}
+📅 *Vencimiento:* {fecha_vencimiento} ({dias_restantes})
+
+🔄 Responde a este mensaje para renovarla y seguir disfrutando sin cortes.
+
+¡Gracias por tu preferencia! 🎬""",
+}
+
+def _fecha(valor, formato='%d/%m/%Y'):
+    return valor.strftime(formato) if valor else 'N/A'
+
+def _dias_restantes(cuenta):
+    if not cuenta.fecha_vencimiento:
+        return 'N/A'
+    dias = (cuenta.fecha_vencimiento - date.today()).days
+    if dias > 1:
+        return f"faltan {dias} días"
+    if dias == 1:
+        return "vence mañana"
+    if dias == 0:
+        return "vence hoy"
+    return "vencida"
+
+# Campos disponibles en las plantillas y cómo se obtienen de una cuenta
+CAMPOS = {
+    'plataforma': lambda c: c.plataforma or '',
+    'email': lambda c: c.email or '',
+    'password': lambda c: c.password or '',
+    'precio': lambda c: f"{c.precio or 0:.2f}",
+    'fecha_compra': lambda c: _fecha(c.fecha_compra),
+    'fecha_venta': lambda c: _fecha(c.fecha_venta),
+    'fecha_vencimiento': lambda c: _fecha(c.fecha_vencimiento),
+    'nombre_comprador': lambda c: c.nombre_comprador or '',
+    'whatsapp_comprador': lambda c: c.whatsapp_comprador or '',
+    'dias_restantes': _dias_restantes,
+}
+
+class PlantillaCompilada:
+    """Plantilla ya analizada: lista de textos fijos y campos a reemplazar"""
+
+    __slots__ = ('partes', 'campos')
+
+    def __init__(self, texto):
+        partes = []
+        campos = []
+        for literal, campo, formato, conversion in string.Formatter().parse(texto):
+            if literal:
+                partes.append(literal)
+            if campo is None:
+                continue
+            if campo not in CAMPOS:
+                raise ValueError(f"Campo desconocido en la plantilla: {{{campo}}}")
+            if formato or conversion:
+                raise ValueError(f"El campo {{{campo}}} no admite formato")
+            # Se guarda el índice de la parte para reemplazarla al renderizar
+            campos.append((len(partes), campo))
+            partes.append(None)
+        self.partes = partes
+        self.campos = campos
+
+    def render(self, cuenta):
+        """Renderizar la plantilla con los datos de una cuenta"""
+        partes = list(self.partes)
+        valores = {}
+        for indice, campo in self.campos:
+            if campo not in valores:
+                valores[campo] = CAMPOS[campo](cuenta)
+            partes[indice] = valores[campo]
+        return ''.join(partes)
+
+@lru_cache(maxsize=256)
+def compilar_plantilla(texto):
+    """Compilar una plantilla (cacheada por su texto)"""
+    return PlantillaCompilada(texto)
+
+def texto_plantilla(tipo, personalizada=None):
+    """Retorna el texto de la plantilla personalizada o el de por defecto"""
+    return personalizada or PLANTILLAS_POR_DEFECTO[tipo]
+
+def renderizar_mensaje(cuenta, tipo='venta', personalizada=None):
+    """Genera el mensaje de una cuenta usando la plantilla indicada"""
+    return compilar_plantilla(texto_plantilla(tipo, personalizada)).render(cuenta)
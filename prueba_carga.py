@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Prueba de carga con operadores simulados concurrentes (solo biblioteca estándar)
+
+Cada operador inicia sesión por /login y repite escenarios al azar: navegar
+/cuentas, vender, renovar y consultar /api/estadisticas. Al final muestra
+throughput, latencias p50/p95/p99 y tasas de error y de agotamiento del pool
+por escenario (estas últimas leídas de /metrics).
+
+Uso:
+    # Contra un servidor ya levantado (usuarios demo000000... de generar_datos.py)
+    python prueba_carga.py --url http://127.0.0.1:8000 --operadores 20 --duracion 60
+
+    # Levantar gunicorn con un SQLite temporal de 20.000 cuentas
+    python prueba_carga.py --iniciar-gunicorn --workers 2 --generar-cuentas 20000
+"""
+
+import argparse
+import http.cookiejar
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from datetime import date, timedelta
+
+from instrumentacion import percentil
+
+# Escenario -> (peso, endpoint de Flask que lo atiende)
+ESCENARIOS = {
+    'navegar_cuentas': (5, 'cuentas'),
+    'estadisticas': (3, 'api_estadisticas'),
+    'vender': (1, 'vender_cuenta'),
+    'renovar': (1, 'renovar_cuenta'),
+}
+FILTROS_NAVEGACION = ['', '?estado=Disponible', '?estado=Vendida', '?estado=Por%20Vencer', '?estado=Vencida']
+NOMBRES_COMPRADORES = ['Juan Pérez', 'María López', 'Carlos Díaz', 'Ana Torres', 'Luis Rojas']
+
+class SinRedirecciones(urllib.request.HTTPRedirectHandler):
+    """Medir cada petición por separado: las redirecciones no se siguen"""
+
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+class Resultados:
+    """Muestras (escenario, duración en ms, resultado) compartidas entre hilos"""
+
+    def __init__(self):
+        self.muestras = []
+        self.lock = threading.Lock()
+
+    def registrar(self, escenario, duracion_ms, resultado):
+        with self.lock:
+            self.muestras.append((escenario, duracion_ms, resultado))
+
+class Operador(threading.Thread):
+    """Un operador humano simulado con su propia sesión (cookies)"""
+
+    def __init__(self, numero, args, resultados, fin):
+        super().__init__(daemon=True)
+        self.numero = numero
+        self.args = args
+        self.resultados = resultados
+        self.fin = fin
+        self.rng = random.Random(args.semilla + numero)
+        self.username = f'{args.prefijo}{numero % args.cuentas_demo:06d}'
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), SinRedirecciones
+        )
+        self.disponibles = []
+        self.vendidas = []
+
+    def peticion(self, escenario, ruta, datos=None):
+        """Ejecuta una petición y registra su latencia; retorna (status, cuerpo)"""
+        url = self.args.url.rstrip('/') + ruta
+        cuerpo_peticion = urllib.parse.urlencode(datos).encode('utf-8') if datos is not None else None
+        inicio = time.perf_counter()
+        try:
+            with self.opener.open(url, data=cuerpo_peticion, timeout=self.args.timeout) as respuesta:
+                status, cuerpo = respuesta.status, respuesta.read()
+        except urllib.error.HTTPError as e:
+            status, cuerpo = e.code, b''
+            e.close()
+        except Exception as e:
+            self.resultados.registrar(escenario, (time.perf_counter() - inicio) * 1000, type(e).__name__)
+            return None, b''
+        self.resultados.registrar(escenario, (time.perf_counter() - inicio) * 1000, status)
+        return status, cuerpo
+
+    def iniciar_sesion(self):
+        status, _ = self.peticion('login', '/login', {'username': self.username, 'password': self.args.password})
+        # Un login correcto redirige a index; uno incorrecto vuelve a mostrar el formulario (200)
+        return status == 302
+
+    def ids_de(self, escenario, ruta, patron):
+        status, cuerpo = self.peticion(escenario, ruta)
+        if status != 200:
+            return []
+        ids = sorted({int(i) for i in re.findall(patron, cuerpo.decode('utf-8', 'replace'))})
+        self.rng.shuffle(ids)
+        return ids
+
+    def navegar_cuentas(self):
+        self.peticion('navegar_cuentas', '/cuentas' + self.rng.choice(FILTROS_NAVEGACION))
+
+    def estadisticas(self):
+        self.peticion('estadisticas', '/api/estadisticas')
+
+    def vender(self):
+        if not self.disponibles:
+            self.disponibles = self.ids_de('navegar_cuentas', '/cuentas?estado=Disponible', r'/ver_cuenta/(\d+)')
+            if not self.disponibles:
+                return
+        id_cuenta = self.disponibles.pop()
+        self.peticion('vender', f'/vender_cuenta/{id_cuenta}', {
+            'nombre_comprador': self.rng.choice(NOMBRES_COMPRADORES),
+            'whatsapp_comprador': f'+51 9{self.rng.randrange(10**8):08d}',
+            'fecha_vencimiento': (date.today() + timedelta(days=30)).isoformat(),
+        })
+
+    def renovar(self):
+        if not self.vendidas:
+            self.vendidas = self.ids_de('navegar_cuentas', '/cuentas?estado=Vendida', r'/cuentas/(\d+)/renovar')
+            if not self.vendidas:
+                return
+        self.peticion('renovar', f'/cuentas/{self.vendidas.pop()}/renovar', {})
+
+    def run(self):
+        if not self.iniciar_sesion():
+            return
+        nombres = list(ESCENARIOS)
+        pesos = [ESCENARIOS[n][0] for n in nombres]
+        while not self.fin.is_set():
+            getattr(self, self.rng.choices(nombres, weights=pesos)[0])()
+            # Tiempo de "pensar" del operador entre acciones
+            if self.args.espera > 0:
+                self.fin.wait(self.rng.expovariate(1 / self.args.espera))
+
+# ---------------------------------------------------------------------------
+# /metrics
+# ---------------------------------------------------------------------------
+
+def leer_metricas(args):
+    """Contadores de /metrics que interesan: {(nombre, endpoint, status): valor}"""
+    peticion = urllib.request.Request(args.url.rstrip('/') + '/metrics')
+    if args.metrics_token:
+        peticion.add_header('Authorization', f'Bearer {args.metrics_token}')
+    try:
+        with urllib.request.urlopen(peticion, timeout=args.timeout) as respuesta:
+            texto = respuesta.read().decode('utf-8')
+    except Exception as e:
+        print(f"⚠️  No se pudo leer /metrics: {e}")
+        return None
+
+    valores = {}
+    for linea in texto.splitlines():
+        coincidencia = re.match(r'(gestor_db_pool_timeouts_total|gestor_http_requests_total)\{(.*)\} (\S+)$', linea)
+        if not coincidencia:
+            continue
+        etiquetas = dict(re.findall(r'(\w+)="([^"]*)"', coincidencia.group(2)))
+        clave = (coincidencia.group(1), etiquetas.get('endpoint'), etiquetas.get('status'))
+        valores[clave] = float(coincidencia.group(3))
+    return valores
+
+def diferencia_metricas(antes, despues):
+    if antes is None or despues is None:
+        return None
+    return {clave: valor - antes.get(clave, 0) for clave, valor in despues.items()}
+
+# ---------------------------------------------------------------------------
+# Servidor local
+# ---------------------------------------------------------------------------
+
+def preparar_base_datos(cuentas):
+    """Crear un SQLite temporal con datos sintéticos; retorna su DATABASE_URL"""
+    ruta = os.path.join(tempfile.mkdtemp(prefix='gestor_carga_'), 'carga.db')
+    os.environ['DATABASE_URL'] = f'sqlite:///{ruta}'
+    os.environ['FLASK_ENV'] = 'carga'
+
+    from app import app, db, Usuario, Cuenta, CambioCuenta, EventoCuenta
+    from generar_datos import generar_datos
+
+    with app.app_context():
+        usuarios = 10
+        generar_datos(db.engine, Usuario.__table__, Cuenta.__table__,
+                      usuarios=usuarios, cuentas_por_usuario=max(1, cuentas // usuarios),
+                      cambio_tabla=CambioCuenta.__table__, evento_tabla=EventoCuenta.__table__)
+    print(f"🎲 Base de datos temporal con {cuentas} cuentas: {ruta}")
+    return os.environ['DATABASE_URL']
+
+def iniciar_gunicorn(args):
+    entorno = dict(os.environ)
+    if args.database_url:
+        entorno['DATABASE_URL'] = args.database_url
+    elif args.generar_cuentas:
+        entorno['DATABASE_URL'] = preparar_base_datos(args.generar_cuentas)
+    entorno['FLASK_ENV'] = entorno.get('FLASK_ENV') or 'carga'
+    entorno.setdefault('PROMETHEUS_MULTIPROC_DIR', tempfile.mkdtemp(prefix='gestor_metricas_'))
+
+    comando = [sys.executable, '-m', 'gunicorn', 'app:app',
+               '--workers', str(args.workers), '--threads', str(args.threads),
+               '--bind', f'127.0.0.1:{args.puerto}', '--log-level', 'warning']
+    print(f"🚀 Iniciando: {' '.join(comando[2:])}")
+    proceso = subprocess.Popen(comando, cwd=os.path.dirname(os.path.abspath(__file__)), env=entorno,
+                               stdout=subprocess.DEVNULL)
+    args.url = f'http://127.0.0.1:{args.puerto}'
+
+    limite = time.monotonic() + 60
+    while time.monotonic() < limite:
+        if proceso.poll() is not None:
+            raise SystemExit('❌ gunicorn terminó antes de estar listo')
+        try:
+            with urllib.request.urlopen(args.url + '/login', timeout=2):
+                return proceso
+        except Exception:
+            time.sleep(0.5)
+    proceso.terminate()
+    raise SystemExit('❌ gunicorn no respondió en 60 segundos')
+
+# ---------------------------------------------------------------------------
+# Reporte
+# ---------------------------------------------------------------------------
+
+def resumen(resultados, segundos, metricas):
+    por_escenario = {}
+    for escenario, duracion_ms, resultado in resultados.muestras:
+        por_escenario.setdefault(escenario, []).append((duracion_ms, resultado))
+
+    filas = []
+    for escenario in ['login', 'navegar_cuentas', 'estadisticas', 'vender', 'renovar']:
+        muestras = por_escenario.get(escenario)
+        if not muestras:
+            continue
+        duraciones = sorted(m[0] for m in muestras)
+        errores = {}
+        for _, resultado in muestras:
+            if not isinstance(resultado, int) or resultado >= 400:
+                errores[str(resultado)] = errores.get(str(resultado), 0) + 1
+        fila = {
+            'escenario': escenario,
+            'peticiones': len(muestras),
+            'por_segundo': round(len(muestras) / segundos, 2),
+            'p50_ms': round(percentil(duraciones, 50), 1),
+            'p95_ms': round(percentil(duraciones, 95), 1),
+            'p99_ms': round(percentil(duraciones, 99), 1),
+            'tasa_error': round(sum(errores.values()) / len(muestras), 4),
+            'errores': errores,
+            'tasa_timeout_pool': None,
+        }
+        endpoint = ESCENARIOS[escenario][1] if escenario in ESCENARIOS else 'login'
+        if metricas is not None:
+            timeouts = metricas.get(('gestor_db_pool_timeouts_total', endpoint, None), 0)
+            fila['tasa_timeout_pool'] = round(timeouts / len(muestras), 4)
+        filas.append(fila)
+    return filas
+
+def imprimir(filas, segundos, operadores):
+    total = sum(f['peticiones'] for f in filas)
+    print()
+    print(f"📊 {operadores} operadores durante {segundos:.1f} s: {total} peticiones ({total / segundos:.1f}/s)")
+    print(f"{'Escenario':<16}{'Pet.':>8}{'Pet/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'Error':>8}{'Pool':>8}")
+    print('-' * 76)
+    for f in filas:
+        pool = '—' if f['tasa_timeout_pool'] is None else f"{f['tasa_timeout_pool']:.1%}"
+        print(f"{f['escenario']:<16}{f['peticiones']:>8}{f['por_segundo']:>9.1f}{f['p50_ms']:>9.1f}"
+              f"{f['p95_ms']:>9.1f}{f['p99_ms']:>9.1f}{f['tasa_error']:>8.1%}{pool:>8}")
+    for f in filas:
+        if f['errores']:
+            detalle = ', '.join(f'{k}: {v}' for k, v in sorted(f['errores'].items()))
+            print(f"⚠️  {f['escenario']}: {detalle}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Prueba de carga con operadores simulados')
+    parser.add_argument('--url', default='http://127.0.0.1:8000', help='URL base del servidor')
+    parser.add_argument('--operadores', type=int, default=10, help='Operadores concurrentes (por defecto 10)')
+    parser.add_argument('--duracion', type=float, default=30, help='Segundos de carga (por defecto 30)')
+    parser.add_argument('--rampa', type=float, default=5, help='Segundos para arrancar a todos los operadores')
+    parser.add_argument('--espera', type=float, default=0.5, help='Pausa media entre acciones (s); 0 = sin pausa')
+    parser.add_argument('--timeout', type=float, default=30, help='Timeout por petición (s)')
+    parser.add_argument('--prefijo', default='demo', help='Prefijo de los usuarios de generar_datos.py')
+    parser.add_argument('--cuentas-demo', type=int, default=10, help='Cuántos usuarios demo repartir entre operadores')
+    parser.add_argument('--password', default='demo123', help='Contraseña de los usuarios demo')
+    parser.add_argument('--semilla', type=int, default=42, help='Semilla de los escenarios')
+    parser.add_argument('--metrics-token', default=os.getenv('METRICS_TOKEN'), help='Token de /metrics (obligatorio si el servidor define METRICS_TOKEN; sin él /metrics solo responde a administradores)')
+    parser.add_argument('--json', help='Guardar el resumen en este archivo JSON')
+    servidor = parser.add_argument_group('servidor local')
+    servidor.add_argument('--iniciar-gunicorn', action='store_true', help='Levantar gunicorn para la prueba')
+    servidor.add_argument('--workers', type=int, default=2)
+    servidor.add_argument('--threads', type=int, default=1)
+    servidor.add_argument('--puerto', type=int, default=8765)
+    servidor.add_argument('--database-url', help='Base de datos para gunicorn (por defecto: SQLite temporal)')
+    servidor.add_argument('--generar-cuentas', type=int, default=10000,
+                          help='Cuentas del SQLite temporal (por defecto 10000)')
+    args = parser.parse_args()
+
+    proceso = iniciar_gunicorn(args) if args.iniciar_gunicorn else None
+    try:
+        metricas_antes = leer_metricas(args)
+        resultados = Resultados()
+        fin = threading.Event()
+        operadores = [Operador(i, args, resultados, fin) for i in range(args.operadores)]
+
+        print(f"👥 {args.operadores} operadores contra {args.url} durante {args.duracion:.0f} s...")
+        inicio = time.perf_counter()
+        for i, operador in enumerate(operadores):
+            operador.start()
+            if args.rampa > 0 and i < len(operadores) - 1:
+                time.sleep(args.rampa / len(operadores))
+        fin.wait(max(0.0, args.duracion - (time.perf_counter() - inicio)))
+        fin.set()
+        for operador in operadores:
+            operador.join(timeout=args.timeout)
+        segundos = time.perf_counter() - inicio
+
+        metricas = diferencia_metricas(metricas_antes, leer_metricas(args))
+        filas = resumen(resultados, segundos, metricas)
+        imprimir(filas, segundos, args.operadores)
+
+        if args.json:
+            with open(args.json, 'w', encoding='utf-8') as archivo:
+                json.dump({'operadores': args.operadores, 'segundos': round(segundos, 2), 'escenarios': filas},
+                          archivo, indent=2, ensure_ascii=False)
+            print(f"💾 Resumen guardado en {args.json}")
+    finally:
+        if proceso is not None:
+            proceso.terminate()
+            proceso.wait(timeout=30)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Servir los archivos estáticos con caché de larga duración y variantes precomprimidas
+
+Las plantillas piden los CSS/JS con `asset_url('css/base.css')`. Si existe
+static/dist/manifest.json (generado por construir_estaticos.py) se usa la
+versión minificada con el hash del contenido en el nombre, que se sirve con
+`Cache-Control: public, max-age=31536000, immutable`. Sin manifest se usa el
+fuente de static/src con la caché corta normal. Las librerías de
+static/vendor llevan la versión en la carpeta y también son inmutables.
+
+Si junto al archivo pedido existe `<archivo>.br` o `<archivo>.gz` y el
+navegador lo acepta, se envía esa variante con Content-Encoding.
+
+El service worker (static/sw.js) se sirve en /sw.js con la lista de precache
+sacada del manifest, así nunca pide archivos que no existen, y con las URLs
+de los scripts que importa (SCRIPTS_WORKER).
+
+Variables de entorno:
+    ESTATICOS_MAX_AGE  segundos de caché para archivos sin hash (por defecto 3600)
+"""
+
+import hashlib
+import json
+import mimetypes
+import os
+
+from flask import Response, abort, request, send_from_directory, url_for
+from werkzeug.security import safe_join
+
+DIRECTORIO_DIST = 'dist'
+DIRECTORIO_FUENTES = 'src'
+DIRECTORIO_VENDOR = 'vendor'
+MANIFEST = 'manifest.json'
+UN_ANO = 365 * 24 * 3600
+# Lo que el service worker guarda al instalarse (las fuentes .ttf solo las piden navegadores viejos)
+EXTENSIONES_PRECACHE = ('.css', '.js', '.woff2')
+PRECACHE_FIJO = ('manifest.json', 'icons/icon-192x192.png', 'icons/icon-512x512.png')
+# Orden de preferencia: brotli comprime mejor que gzip
+CODIFICACIONES = (('br', '.br'), ('gzip', '.gz'))
+SERVICE_WORKER = 'sw.js'
+# Scripts de static/src que el service worker carga con importScripts (comparte código con las páginas)
+SCRIPTS_WORKER = ('js/replica.js',)
+
+class RecursosEstaticos:
+    """Reemplaza la vista `static` de Flask y registra `asset_url` en las plantillas"""
+
+    def __init__(self, app=None):
+        self.manifest = {}
+        self._mtime = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.max_age = int(os.getenv('ESTATICOS_MAX_AGE', 3600))
+        self.cargar_manifest()
+        app.add_template_global(self.asset_url)
+        app.view_functions['static'] = self.servir
+        app.extensions['recursos_estaticos'] = self
+
+    @property
+    def ruta_manifest(self):
+        return os.path.join(self.app.static_folder, DIRECTORIO_DIST, MANIFEST)
+
+    def cargar_manifest(self):
+        try:
+            mtime = os.path.getmtime(self.ruta_manifest)
+        except OSError:
+            self.manifest, self._mtime = {}, None
+            return
+        if mtime != self._mtime:
+            with open(self.ruta_manifest, encoding='utf-8') as archivo:
+                self.manifest = json.load(archivo)
+            self._mtime = mtime
+
+    def asset_url(self, nombre):
+        """URL del recurso `nombre` (relativo a static/src): versión con hash si está construida"""
+        if self.app.debug:
+            # En desarrollo se puede reconstruir sin reiniciar el servidor
+            self.cargar_manifest()
+        construido = self.manifest.get(nombre)
+        if construido:
+            return url_for('static', filename=construido)
+        if nombre.startswith(DIRECTORIO_VENDOR + '/'):
+            return url_for('static', filename=nombre)
+        return url_for('static', filename=f'{DIRECTORIO_FUENTES}/{nombre}')
+
+    def lista_precache(self):
+        """URLs de los recursos que usan las páginas, para el precache del service worker"""
+        self.cargar_manifest()
+        if self.manifest:
+            archivos = list(self.manifest.values())
+        else:
+            # Sin construir: los fuentes y las librerías tal cual
+            archivos = []
+            for directorio in (DIRECTORIO_FUENTES, DIRECTORIO_VENDOR):
+                raiz = os.path.join(self.app.static_folder, directorio)
+                for carpeta, _, nombres in os.walk(raiz):
+                    archivos.extend(os.path.relpath(os.path.join(carpeta, nombre), self.app.static_folder)
+                                    .replace(os.sep, '/') for nombre in nombres)
+        archivos = [archivo for archivo in archivos if archivo.endswith(EXTENSIONES_PRECACHE)]
+        archivos.extend(archivo for archivo in PRECACHE_FIJO
+                        if os.path.isfile(os.path.join(self.app.static_folder, archivo)))
+        return [url_for('static', filename=archivo) for archivo in sorted(archivos)]
+
+    def service_worker(self):
+        """Respuesta de /sw.js: static/sw.js precedido de PRECACHE_URLS, SCRIPTS_COMPARTIDOS y VERSION"""
+        with open(os.path.join(self.app.static_folder, SERVICE_WORKER), encoding='utf-8') as archivo:
+            codigo = archivo.read()
+        urls = self.lista_precache()
+        scripts = [self.asset_url(nombre) for nombre in SCRIPTS_WORKER]
+        # Un cambio en cualquier recurso o en el propio worker crea un cache nuevo
+        version = hashlib.sha256((json.dumps(urls) + json.dumps(scripts) + codigo).encode('utf-8')).hexdigest()[:10]
+        cuerpo = (f'const PRECACHE_URLS = {json.dumps(urls, indent=2)};\n'
+                  f'const SCRIPTS_COMPARTIDOS = {json.dumps(scripts)};\n'
+                  f'const VERSION = {json.dumps(version)};\n\n{codigo}')
+        respuesta = Response(cuerpo, mimetype='application/javascript')
+        # El navegador debe revisar siempre si hay un worker nuevo
+        respuesta.cache_control.no_cache = True
+        return respuesta
+
+    def servir(self, filename):
+        carpeta = self.app.static_folder
+        ruta = safe_join(carpeta, filename)
+        if ruta is None or not os.path.isfile(ruta):
+            abort(404)
+
+        variantes = [(codificacion, sufijo) for codificacion, sufijo in CODIFICACIONES
+                     if os.path.isfile(ruta + sufijo)]
+        elegida = next(((codificacion, sufijo) for codificacion, sufijo in variantes
+                        if codificacion in request.accept_encodings), None)
+        inmutable = (filename.startswith((DIRECTORIO_DIST + '/', DIRECTORIO_VENDOR + '/'))
+                     and filename != f'{DIRECTORIO_DIST}/{MANIFEST}')
+        max_age = UN_ANO if inmutable else self.max_age
+
+        if elegida:
+            codificacion, sufijo = elegida
+            tipo, _ = mimetypes.guess_type(filename)
+            respuesta = send_from_directory(carpeta, filename + sufijo, max_age=max_age,
+                                            mimetype=tipo or 'application/octet-stream')
+            respuesta.headers['Content-Encoding'] = codificacion
+        else:
+            respuesta = send_from_directory(carpeta, filename, max_age=max_age)
+
+        if variantes:
+            respuesta.vary.add('Accept-Encoding')
+        if inmutable:
+            respuesta.cache_control.public = True
+            respuesta.cache_control.immutable = True
+        return respuesta
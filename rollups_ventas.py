@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Rollups de ventas para /api/series y la analítica (/api/analitica, /reportes)
+
+Cada cuenta vendida suma una venta, su precio y sus días en stock
+(fecha_compra -> fecha_venta) en el día de su fecha_venta, para su dueño y
+plataforma (venta_diaria), y una venta y su precio a su comprador
+(venta_comprador). Los rollups se mantienen de forma incremental a partir
+del registro de cambios (cambio_cuenta): por cada cuenta tocada se compara
+lo que aporta hoy con lo que aportaba (aporte_venta) y se aplica la
+diferencia. Procesar dos veces un mismo cambio no altera nada.
+
+Las renovaciones (renovacion_diaria) no dependen del estado de la cuenta:
+las suma la app al renovar y este script no las toca.
+
+Gunicorn lo ejecuta una vez al arrancar (gunicorn.conf.py) y render.yaml lo
+programa cada 5 minutos. En otro host, programarlo con cron, p. ej.:
+    */5 * * * * cd /ruta/al/proyecto && python rollups_ventas.py actualizar
+
+Uso:
+    python rollups_ventas.py actualizar             # aplicar los cambios nuevos
+    python rollups_ventas.py reconstruir            # rehacer todo desde la tabla de cuentas
+    python rollups_ventas.py verificar              # comparar los rollups con un recálculo completo
+"""
+
+import argparse
+import re
+import time
+from collections import defaultdict
+from datetime import datetime
+
+from sqlalchemy import func, select, true
+
+from app import app, db, Cuenta, CambioCuenta, VentaDiaria, VentaComprador, AporteVenta, EstadoProceso
+
+PROCESO = 'rollup_ventas'
+# Cambios leídos por transacción
+LOTE = 5000
+# Tablas que se derivan por completo de las cuentas: si su esquema cambia se recrean y reconstruyen
+TABLAS_DERIVADAS = (AporteVenta, VentaDiaria, VentaComprador)
+# Columnas sumables de cada rollup, en el orden de las diferencias
+MEDIDAS_DIARIAS = ('ventas', 'ingresos', 'dias_en_stock')
+MEDIDAS_COMPRADOR = ('ventas', 'ingresos')
+
+def clave_comprador(nombre, whatsapp):
+    """Identificar al comprador: los dígitos de su WhatsApp o, si no hay, su nombre normalizado"""
+    digitos = re.sub(r'\D', '', whatsapp or '')
+    if digitos:
+        return digitos[-120:]
+    nombre = ' '.join((nombre or '').split()).lower()
+    return nombre[:120] or None
+
+def aporte_de(fecha_venta, usuario_id, plataforma, precio, fecha_compra, nombre, whatsapp):
+    """(dia, usuario_id, plataforma, precio, dias_en_stock, comprador) de una cuenta vendida"""
+    dia = fecha_venta.date()
+    dias_en_stock = max((dia - fecha_compra).days, 0) if fecha_compra else 0
+    return (dia, usuario_id, plataforma, precio, dias_en_stock, clave_comprador(nombre, whatsapp))
+
+COLUMNAS_APORTE = (Cuenta.fecha_venta, Cuenta.usuario_id, Cuenta.plataforma, Cuenta.precio,
+                   Cuenta.fecha_compra, Cuenta.nombre_comprador, Cuenta.whatsapp_comprador)
+
+def bloquear_estado():
+    """Token del proceso, con su fila bloqueada hasta el commit (dos ejecuciones no se pisan)"""
+    tabla = EstadoProceso.__table__
+    # UPDATE sin cambios: toma el bloqueo de fila (PostgreSQL) o de escritura (SQLite) antes de leer
+    actualizadas = db.session.execute(
+        tabla.update().where(tabla.c.nombre == PROCESO).values(token=tabla.c.token)
+    ).rowcount
+    if not actualizadas:
+        db.session.execute(tabla.insert().values(nombre=PROCESO, token=0, fecha=datetime.utcnow()))
+        return 0
+    return db.session.execute(select(tabla.c.token).where(tabla.c.nombre == PROCESO)).scalar()
+
+def guardar_token(token):
+    tabla = EstadoProceso.__table__
+    db.session.execute(tabla.update().where(tabla.c.nombre == PROCESO).values(token=token, fecha=datetime.utcnow()))
+
+def consultar_aportes(filtro):
+    """{cuenta_id: aporte} de las cuentas vendidas que cumplen `filtro`, leídas por partes"""
+    filas = db.session.query(Cuenta.id, *COLUMNAS_APORTE).filter(
+        filtro, Cuenta.estado == 'Vendida', Cuenta.fecha_venta.isnot(None)
+    ).execution_options(yield_per=LOTE)
+    return {cuenta_id: aporte_de(*datos) for cuenta_id, *datos in filas}
+
+def aportes_actuales(cuenta_ids):
+    """{cuenta_id: (dia, usuario_id, plataforma, precio, dias_en_stock, comprador)} de las vendidas entre `cuenta_ids`"""
+    return consultar_aportes(Cuenta.id.in_(cuenta_ids))
+
+def aportes_registrados(cuenta_ids):
+    filas = db.session.query(
+        AporteVenta.cuenta_id, AporteVenta.dia, AporteVenta.usuario_id, AporteVenta.plataforma,
+        AporteVenta.precio, AporteVenta.dias_en_stock, AporteVenta.comprador
+    ).filter(AporteVenta.cuenta_id.in_(cuenta_ids))
+    return {cuenta_id: tuple(aporte) for cuenta_id, *aporte in filas}
+
+def acumular(diferencias_diarias, diferencias_compradores, aporte, signo):
+    dia, usuario_id, plataforma, precio, dias_en_stock, comprador = aporte
+    diaria = diferencias_diarias[(dia, usuario_id, plataforma)]
+    diaria[0] += signo
+    diaria[1] += signo * precio
+    diaria[2] += signo * dias_en_stock
+    if comprador:
+        del_comprador = diferencias_compradores[(usuario_id, comprador)]
+        del_comprador[0] += signo
+        del_comprador[1] += signo * precio
+
+def aplicar_diferencias(modelo, columnas_clave, medidas, diferencias):
+    """Sumar {clave: [medida, ...]} a las filas de `modelo`; las que quedan sin ventas se borran"""
+    diferencias = {clave: valores for clave, valores in diferencias.items() if any(valores)}
+    if not diferencias:
+        return
+    columnas = [getattr(modelo, columna) for columna in columnas_clave]
+    # Un IN por columna trae de más algunas combinaciones, pero el diccionario se queda con las pedidas
+    existentes = {
+        tuple(getattr(fila, columna) for columna in columnas_clave): fila
+        for fila in modelo.query.filter(*(
+            columna.in_({clave[posicion] for clave in diferencias})
+            for posicion, columna in enumerate(columnas)
+        ))
+    }
+    for clave, valores in diferencias.items():
+        fila = existentes.get(clave)
+        if fila is None:
+            if valores[0] > 0:
+                db.session.add(modelo(**dict(zip(columnas_clave, clave)), **{
+                    medida: round(valor, 2) if medida == 'ingresos' else valor
+                    for medida, valor in zip(medidas, valores)
+                }))
+        elif fila.ventas + valores[0] <= 0:
+            db.session.delete(fila)
+        else:
+            for medida, valor in zip(medidas, valores):
+                total = getattr(fila, medida) + valor
+                setattr(fila, medida, round(total, 2) if medida == 'ingresos' else total)
+
+def actualizar_rollups(lote=LOTE):
+    """Aplicar los cambios posteriores al último procesado; retorna (cambios, cuentas que cambiaron de aporte)"""
+    total_cambios = total_cuentas = 0
+    while True:
+        token = bloquear_estado()
+        filas = db.session.query(CambioCuenta.id, CambioCuenta.cuenta_id).filter(
+            CambioCuenta.id > token
+        ).order_by(CambioCuenta.id).limit(lote).all()
+        if not filas:
+            db.session.commit()
+            break
+
+        cuenta_ids = {cuenta_id for _, cuenta_id in filas}
+        nuevos = aportes_actuales(cuenta_ids)
+        anteriores = aportes_registrados(cuenta_ids)
+
+        diarias = defaultdict(lambda: [0, 0.0, 0])
+        compradores = defaultdict(lambda: [0, 0.0])
+        cambiadas = []
+        for cuenta_id in cuenta_ids:
+            anterior, nuevo = anteriores.get(cuenta_id), nuevos.get(cuenta_id)
+            if anterior == nuevo:
+                continue
+            cambiadas.append(cuenta_id)
+            if anterior:
+                acumular(diarias, compradores, anterior, -1)
+            if nuevo:
+                acumular(diarias, compradores, nuevo, 1)
+
+        aplicar_diferencias(VentaDiaria, ('dia', 'usuario_id', 'plataforma'), MEDIDAS_DIARIAS, diarias)
+        aplicar_diferencias(VentaComprador, ('usuario_id', 'comprador'), MEDIDAS_COMPRADOR, compradores)
+        if cambiadas:
+            tabla = AporteVenta.__table__
+            db.session.execute(tabla.delete().where(tabla.c.cuenta_id.in_(cambiadas)))
+            registros = [registro_aporte(cuenta_id, nuevos[cuenta_id]) for cuenta_id in cambiadas if cuenta_id in nuevos]
+            if registros:
+                db.session.execute(tabla.insert(), registros)
+
+        guardar_token(filas[-1][0])
+        db.session.commit()
+        total_cambios += len(filas)
+        total_cuentas += len(cambiadas)
+        if len(filas) < lote:
+            break
+    return total_cambios, total_cuentas
+
+def registro_aporte(cuenta_id, aporte):
+    dia, usuario_id, plataforma, precio, dias_en_stock, comprador = aporte
+    return {'cuenta_id': cuenta_id, 'dia': dia, 'usuario_id': usuario_id, 'plataforma': plataforma,
+            'precio': precio, 'dias_en_stock': dias_en_stock, 'comprador': comprador}
+
+def asegurar_esquema():
+    """Recrear las tablas derivadas cuyas columnas no coinciden con el modelo; retorna si hubo que hacerlo"""
+    inspector = db.inspect(db.engine)
+    desactualizadas = [
+        modelo.__table__ for modelo in TABLAS_DERIVADAS
+        if inspector.has_table(modelo.__tablename__) and
+        {columna['name'] for columna in inspector.get_columns(modelo.__tablename__)} != set(modelo.__table__.columns.keys())
+    ]
+    if desactualizadas:
+        db.metadata.drop_all(db.engine, tables=desactualizadas)
+    db.metadata.create_all(db.engine, tables=[modelo.__table__ for modelo in TABLAS_DERIVADAS])
+    return bool(desactualizadas)
+
+def reconstruir_rollups(particiones=None, token=None):
+    """Rehacer aporte_venta, venta_diaria y venta_comprador; retorna las filas de venta_diaria
+
+    `particiones`: listas de (cuenta_id, *COLUMNAS_APORTE) de las cuentas vendidas, p. ej. el
+    estado reproducido por eventos.py, y `token` el último cambio que ya reflejan. Por defecto
+    se leen de la tabla de cuentas.
+    """
+    bloquear_estado()
+    if token is None:
+        # El token se lee antes que las cuentas: lo que entre después se vuelve a aplicar sin efecto doble
+        token = db.session.query(func.max(CambioCuenta.id)).scalar() or 0
+    aportes = AporteVenta.__table__
+    diaria = VentaDiaria.__table__
+    por_comprador = VentaComprador.__table__
+    for tabla in (diaria, por_comprador, aportes):
+        db.session.execute(tabla.delete())
+    # Los días en stock y la clave del comprador se calculan en Python (igual que en actualizar)
+    # y los rollups salen de aporte_venta con un GROUP BY en la base
+    if particiones is None:
+        particiones = db.session.execute(select(Cuenta.id, *COLUMNAS_APORTE).where(
+            Cuenta.estado == 'Vendida', Cuenta.fecha_venta.isnot(None)
+        ).execution_options(yield_per=LOTE)).partitions()
+    for particion in particiones:
+        db.session.execute(aportes.insert(), [registro_aporte(cuenta_id, aporte_de(*datos))
+                                              for cuenta_id, *datos in particion])
+    db.session.execute(diaria.insert().from_select(
+        ['dia', 'usuario_id', 'plataforma', 'ventas', 'ingresos', 'dias_en_stock'],
+        select(aportes.c.dia, aportes.c.usuario_id, aportes.c.plataforma,
+               func.count(), func.sum(aportes.c.precio), func.sum(aportes.c.dias_en_stock)).group_by(
+            aportes.c.dia, aportes.c.usuario_id, aportes.c.plataforma
+        )
+    ))
+    db.session.execute(por_comprador.insert().from_select(
+        ['usuario_id', 'comprador', 'ventas', 'ingresos'],
+        select(aportes.c.usuario_id, aportes.c.comprador, func.count(), func.sum(aportes.c.precio)).where(
+            aportes.c.comprador.isnot(None)
+        ).group_by(aportes.c.usuario_id, aportes.c.comprador)
+    ))
+    guardar_token(token)
+    db.session.commit()
+    return db.session.query(func.count()).select_from(diaria).scalar()
+
+def verificar_rollups():
+    """Diferencias (clave, rollup, esperado) entre los rollups y un recálculo completo desde las cuentas"""
+    diarias = defaultdict(lambda: [0, 0.0, 0])
+    compradores = defaultdict(lambda: [0, 0.0])
+    for aporte in consultar_aportes(true()).values():
+        acumular(diarias, compradores, aporte, 1)
+
+    def redondear(valores):
+        return tuple(round(valor, 2) if isinstance(valor, float) else valor for valor in valores)
+
+    diferencias = []
+    for modelo, columnas_clave, medidas, esperado in (
+        (VentaDiaria, ('dia', 'usuario_id', 'plataforma'), MEDIDAS_DIARIAS, diarias),
+        (VentaComprador, ('usuario_id', 'comprador'), MEDIDAS_COMPRADOR, compradores),
+    ):
+        esperado = {clave: redondear(valores) for clave, valores in esperado.items()}
+        actual = {
+            tuple(getattr(fila, columna) for columna in columnas_clave):
+                redondear(float(getattr(fila, medida)) if medida == 'ingresos' else getattr(fila, medida) for medida in medidas)
+            for fila in modelo.query
+        }
+        diferencias.extend(sorted(
+            ((modelo.__tablename__, *map(str, clave)), actual.get(clave), esperado.get(clave))
+            for clave in set(esperado) | set(actual)
+            if actual.get(clave) != esperado.get(clave)
+        ))
+    return diferencias
+
+def main():
+    parser = argparse.ArgumentParser(description='Rollups de ventas para /api/series y la analítica')
+    subcomandos = parser.add_subparsers(dest='comando', required=True)
+    actualizar = subcomandos.add_parser('actualizar', help='Aplicar los cambios de cuentas pendientes')
+    actualizar.add_argument('--lote', type=int, default=LOTE, help='Cambios por transacción')
+    subcomandos.add_parser('reconstruir', help='Rehacer los rollups desde la tabla de cuentas')
+    subcomandos.add_parser('verificar', help='Comparar los rollups con un recálculo completo')
+    args = parser.parse_args()
+
+    with app.app_context():
+        inicio = time.perf_counter()
+        if asegurar_esquema() and args.comando == 'actualizar':
+            print("⚠️  Las tablas de rollups tenían otro esquema: se recrearon y se reconstruyen completas")
+            args.comando = 'reconstruir'
+        if args.comando == 'actualizar':
+            cambios, cuentas = actualizar_rollups(args.lote)
+            print(f"📈 {cambios} cambios procesados, {cuentas} cuentas con otro aporte "
+                  f"({time.perf_counter() - inicio:.2f} s)")
+        elif args.comando == 'reconstruir':
+            filas = reconstruir_rollups()
+            print(f"🔨 Rollup reconstruido: {filas} filas de venta_diaria ({time.perf_counter() - inicio:.2f} s)")
+        else:
+            diferencias = verificar_rollups()
+            if not diferencias:
+                print("✅ Los rollups coinciden con la tabla de cuentas")
+                return
+            print(f"❌ {len(diferencias)} diferencias (clave, rollup, esperado):")
+            for diferencia in diferencias[:20]:
+                print(f"   {diferencia}")
+            raise SystemExit(1)
+
+if __name__ == '__main__':
+    main()
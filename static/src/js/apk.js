@@ -0,0 +1,47 @@
+// Función para copiar URL al portapapeles
+function copyToClipboard(text) {
+    navigator.clipboard.writeText(text).then(function() {
+        // Mostrar mensaje de éxito
+        const toast = document.createElement('div');
+        toast.className = 'position-fixed top-0 end-0 p-3';
+        toast.style.zIndex = '1050';
+        toast.innerHTML = `
+            <div class="toast show" role="alert">
+                <div class="toast-header bg-success text-white">
+                    <strong class="me-auto">¡Copiado!</strong>
+                    <button type="button" class="btn-close btn-close-white" data-bs-dismiss="toast"></button>
+                </div>
+                <div class="toast-body">
+                    <i class="fas fa-check-circle me-2"></i>
+                    URL copiada al portapapeles
+                </div>
+            </div>
+        `;
+        document.body.appendChild(toast);
+
+        setTimeout(() => {
+            if (document.body.contains(toast)) {
+                document.body.removeChild(toast);
+            }
+        }, 3000);
+    }).catch(function(err) {
+        console.error('Error al copiar: ', err);
+        alert('Error al copiar al portapapeles');
+    });
+}
+
+// Función para verificar si la app está instalada
+function checkIfInstalled() {
+    if (window.matchMedia('(display-mode: standalone)').matches) {
+        document.getElementById('installStatus').innerHTML = 
+            '<span class="badge bg-success"><i class="fas fa-check me-2"></i>App Instalada</span>';
+    } else {
+        document.getElementById('installStatus').innerHTML = 
+            '<span class="badge bg-warning"><i class="fas fa-exclamation-triangle me-2"></i>App No Instalada</span>';
+    }
+}
+
+// Verificar al cargar la página
+document.addEventListener('DOMContentLoaded', function() {
+    checkIfInstalled();
+});
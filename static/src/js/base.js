@@ -0,0 +1,41 @@
+document.addEventListener('DOMContentLoaded', function() {
+    // Auto-hide flash messages after 20 seconds
+    const flashMessages = document.querySelectorAll('.flash-message');
+
+    flashMessages.forEach(function(message) {
+        const autoHideTime = message.getAttribute('data-auto-hide') || 5000;
+
+        setTimeout(function() {
+            // Add fade-out effect
+            message.classList.add('fade');
+            message.style.opacity = '0';
+            message.style.transition = 'opacity 0.5s ease';
+
+            // Remove from DOM after fade-out
+            setTimeout(function() {
+                if (message.parentNode) {
+                    message.parentNode.removeChild(message);
+                }
+            }, 500);
+        }, autoHideTime);
+    });
+
+    // Manual close button functionality
+    const closeButtons = document.querySelectorAll('.btn-close');
+    closeButtons.forEach(function(button) {
+        button.addEventListener('click', function() {
+            const alert = this.closest('.alert');
+            if (alert) {
+                alert.classList.add('fade');
+                alert.style.opacity = '0';
+                alert.style.transition = 'opacity 0.5s ease';
+
+                setTimeout(function() {
+                    if (alert.parentNode) {
+                        alert.parentNode.removeChild(alert);
+                    }
+                }, 500);
+            }
+        });
+    });
+});
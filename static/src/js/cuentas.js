@@ -0,0 +1,446 @@
+// Auto-submit form when filters change (con la réplica local lista se filtra sin recargar)
+document.getElementById('estado').addEventListener('change', function() {
+    aplicarFiltros(this.form);
+});
+
+document.getElementById('plataforma').addEventListener('change', function() {
+    aplicarFiltros(this.form);
+});
+
+// Toggle between grid and list view
+document.getElementById('viewGrid').addEventListener('click', function() {
+    document.getElementById('gridView').classList.remove('d-none');
+    document.getElementById('listView').classList.add('d-none');
+    this.classList.add('active');
+    document.getElementById('viewList').classList.remove('active');
+});
+
+document.getElementById('viewList').addEventListener('click', function() {
+    document.getElementById('gridView').classList.add('d-none');
+    document.getElementById('listView').classList.remove('d-none');
+    this.classList.add('active');
+    document.getElementById('viewGrid').classList.remove('active');
+});
+
+// Set grid view as active by default
+document.getElementById('viewGrid').classList.add('active');
+
+// Search functionality (you can implement this if needed)
+function searchAccounts(query) {
+    // Implementation for search functionality
+    console.log('Searching for:', query);
+}
+
+// Copy to clipboard function
+function copyToClipboard(text) {
+    navigator.clipboard.writeText(text).then(function() {
+        // Show success message
+        const button = event.target.closest('button');
+        const originalIcon = button.innerHTML;
+        button.innerHTML = '<i class="fas fa-check"></i>';
+        button.classList.remove('btn-outline-secondary');
+        button.classList.add('btn-success');
+
+        setTimeout(() => {
+            button.innerHTML = originalIcon;
+            button.classList.remove('btn-success');
+            button.classList.add('btn-outline-secondary');
+        }, 2000);
+    }).catch(function(err) {
+        console.error('Error copying text: ', err);
+    });
+}
+
+// Confirm delete function
+function confirmDelete() {
+    return confirm('¿Estás seguro de que quieres eliminar esta cuenta? Esta acción no se puede deshacer.');
+}
+
+// ---------------------------------------------------------------------------
+// Réplica local (js/replica.js): filtrar y listar sin ir al servidor, y vender
+// o renovar sin conexión. Si IndexedDB no está disponible la página funciona
+// como siempre, enviando el formulario.
+// ---------------------------------------------------------------------------
+const MAX_TARJETAS = 300;
+const COLORES_PLATAFORMA = {
+    'Netflix': 'text-danger',
+    'Hulu': 'text-success',
+    'Disney+': 'text-primary',
+    'Amazon Prime': 'text-warning',
+    'Apple TV+': 'text-secondary'
+};
+
+let modoLocal = false;
+let copiaCuentas = null;
+let limiteTarjetas = MAX_TARJETAS;
+let temporizadorBusqueda = null;
+
+function aplicarFiltros(formulario) {
+    if (!modoLocal) {
+        formulario.submit();
+        return;
+    }
+    limiteTarjetas = MAX_TARJETAS;
+    const filtros = leerFiltros(formulario);
+    const parametros = new URLSearchParams(Object.entries(filtros).filter(([, valor]) => valor));
+    history.replaceState(null, '', parametros.toString() ? `?${parametros}` : location.pathname);
+    renderizarLocal();
+}
+
+function leerFiltros(formulario) {
+    return {
+        q: formulario.elements.q.value.trim(),
+        estado: formulario.elements.estado.value,
+        plataforma: formulario.elements.plataforma.value
+    };
+}
+
+async function renderizarLocal(recargar = false) {
+    if (recargar || !copiaCuentas) {
+        copiaCuentas = await Replica.todas();
+    }
+    const cuentas = Replica.filtrar(copiaCuentas, leerFiltros(document.getElementById('estado').form));
+    const visibles = cuentas.slice(0, limiteTarjetas);
+    const hoy = Replica.fechaLocal(new Date());
+
+    document.getElementById('gridView').innerHTML = visibles.map(cuenta => tarjetaCuenta(cuenta, hoy)).join('');
+    document.getElementById('filasCuentas').innerHTML = visibles.map(cuenta => filaCuenta(cuenta, hoy)).join('');
+    document.getElementById('mostrarMas').classList.toggle('d-none', cuentas.length <= visibles.length);
+    document.getElementById('resultadosCuentas').classList.toggle('d-none', !cuentas.length);
+    document.getElementById('sinResultados').classList.toggle('d-none', cuentas.length > 0);
+    document.getElementById('resumenCuentas').classList.toggle('d-none', !cuentas.length);
+    // La copia local se dibuja entera (con "Mostrar más"): las páginas del servidor ya no aplican
+    const paginasBusqueda = document.getElementById('paginasBusqueda');
+    if (paginasBusqueda) {
+        paginasBusqueda.classList.add('d-none');
+    }
+    actualizarResumen(cuentas, hoy);
+}
+
+function actualizarResumen(cuentas, hoy) {
+    const limite = new Date();
+    limite.setDate(limite.getDate() + Replica.DIAS_POR_VENCER);
+    const hasta = Replica.fechaLocal(limite);
+    const vendidas = cuentas.filter(cuenta => cuenta.estado === 'Vendida');
+
+    document.getElementById('contadorCuentas').textContent = cuentas.length;
+    document.getElementById('totalFiltrado').textContent = cuentas.length;
+    document.getElementById('totalDisponibles').textContent = cuentas.filter(cuenta => cuenta.estado === 'Disponible').length;
+    document.getElementById('totalVendidas').textContent = vendidas.length;
+    document.getElementById('totalPorVencer').textContent = cuentas.filter(cuenta =>
+        cuenta.fecha_vencimiento && cuenta.fecha_vencimiento >= hoy && cuenta.fecha_vencimiento <= hasta).length;
+    document.getElementById('totalVencidas').textContent = cuentas.filter(cuenta =>
+        cuenta.fecha_vencimiento && cuenta.fecha_vencimiento < hoy).length;
+    document.getElementById('totalVentas').textContent = '$' + vendidas.reduce((suma, cuenta) => suma + cuenta.precio, 0).toFixed(2);
+}
+
+function escapar(texto) {
+    return String(texto === null || texto === undefined ? '' : texto)
+        .replace(/&/g, '&amp;').replace(/</g, '&lt;').replace(/>/g, '&gt;')
+        .replace(/"/g, '&quot;').replace(/'/g, '&#39;');
+}
+
+// 'YYYY-MM-DD...' -> 'DD/MM/YYYY'
+function formatearFecha(fecha) {
+    return fecha ? `${fecha.slice(8, 10)}/${fecha.slice(5, 7)}/${fecha.slice(0, 4)}` : '';
+}
+
+function diasRestantes(vencimiento, hoy) {
+    const aUtc = fecha => Date.UTC(Number(fecha.slice(0, 4)), Number(fecha.slice(5, 7)) - 1, Number(fecha.slice(8, 10)));
+    return Math.round((aUtc(vencimiento) - aUtc(hoy)) / 86400000);
+}
+
+function plural(numero) {
+    return Math.abs(numero) !== 1 ? 's' : '';
+}
+
+function badgeEstado(cuenta) {
+    if (cuenta.estado === 'Disponible') {
+        return '<span class="badge badge-disponible"><i class="fas fa-check me-1"></i>Disponible</span>';
+    }
+    if (cuenta.estado === 'Vendida') {
+        return '<span class="badge badge-vendida"><i class="fas fa-dollar-sign me-1"></i>Vendida</span>';
+    }
+    return `<span class="badge bg-secondary">${escapar(cuenta.estado)}</span>`;
+}
+
+function badgeActiva(cuenta, hoy) {
+    if (!cuenta.fecha_vencimiento) {
+        return '<span class="badge bg-secondary"><i class="fas fa-question-circle me-1"></i>Sin Fecha</span>';
+    }
+    const dias = diasRestantes(cuenta.fecha_vencimiento, hoy);
+    if (dias > 0) {
+        return '<span class="badge bg-success"><i class="fas fa-check-circle me-1"></i>Activa</span>';
+    }
+    if (dias === 0) {
+        return '<span class="badge bg-warning"><i class="fas fa-exclamation-triangle me-1"></i>Vence Hoy</span>';
+    }
+    return '<span class="badge bg-danger"><i class="fas fa-times-circle me-1"></i>Inactiva</span>';
+}
+
+function badgePendiente(cuenta) {
+    return cuenta.pendiente
+        ? '<span class="badge bg-warning text-dark ms-1" title="Cambio guardado en el dispositivo, se enviará al volver la red"><i class="fas fa-clock me-1"></i>Pendiente</span>'
+        : '';
+}
+
+// Botones de venta y renovación de la lista local: pasan por la cola de la réplica
+function botonesRapidos(cuenta, clases) {
+    let botones = '';
+    if (cuenta.estado === 'Disponible') {
+        botones += `<button type="button" class="btn ${clases} btn-success" data-vender="${cuenta.id}" title="Marcar como vendida"><i class="fas fa-dollar-sign"></i></button>`;
+    }
+    if (cuenta.fecha_vencimiento) {
+        botones += `<button type="button" class="btn ${clases} btn-info" data-renovar="${cuenta.id}" title="Renovar por 1 mes"><i class="fas fa-calendar-plus"></i></button>`;
+    }
+    return botones;
+}
+
+function botonEliminar(cuenta, clases) {
+    return `<form method="POST" action="/cuentas/${cuenta.id}/eliminar" class="d-inline" onsubmit="return confirmDelete()">` +
+        `<button type="submit" class="btn ${clases} btn-danger" title="Eliminar"><i class="fas fa-trash"></i></button></form>`;
+}
+
+function tarjetaCuenta(cuenta, hoy) {
+    const color = COLORES_PLATAFORMA[cuenta.plataforma] || 'text-info';
+    let vencimiento = '';
+    if (cuenta.fecha_vencimiento) {
+        const dias = diasRestantes(cuenta.fecha_vencimiento, hoy);
+        const texto = dias > 0
+            ? `<small class="text-info">${dias} día${plural(dias)} restante${plural(dias)}</small>`
+            : dias === 0 ? '<small class="text-danger">Vence hoy</small>'
+                : `<small class="text-danger">Vencida hace ${-dias} día${plural(dias)}</small>`;
+        vencimiento = `<div class="info-row mb-2"><small class="text-muted">Vencimiento:</small>` +
+            `<div class="d-flex flex-column align-items-end"><span class="text-warning">${formatearFecha(cuenta.fecha_vencimiento)}</span>${texto}</div></div>`;
+    }
+    const venta = cuenta.fecha_venta
+        ? `<div class="info-row mb-2"><small class="text-muted">Venta:</small><span class="text-success">${formatearFecha(cuenta.fecha_venta)}</span></div>`
+        : '';
+    return `<div class="col-xl-3 col-lg-4 col-md-6 col-sm-12 mb-4">
+<div class="card account-card h-100 shadow-sm">
+<div class="card-header d-flex justify-content-between align-items-center">
+<span><span class="badge bg-secondary">#${cuenta.id}</span>${badgePendiente(cuenta)}</span>
+<a class="btn btn-sm btn-outline-secondary" href="/editar_cuenta/${cuenta.id}" title="Editar"><i class="fas fa-edit"></i></a>
+</div>
+<div class="card-body">
+<div class="text-center mb-3">
+<div class="platform-icon mb-2"><i class="fas fa-tv fa-2x ${color}"></i></div>
+<h6 class="card-title mb-1">${escapar(cuenta.plataforma)}</h6>
+</div>
+<div class="account-info">
+<div class="info-row mb-2"><small class="text-muted">Email:</small>
+<div class="d-flex align-items-center"><code class="me-2">${escapar(cuenta.email)}</code>
+<button class="btn btn-sm btn-outline-secondary" data-copiar="${escapar(cuenta.email)}" title="Copiar email"><i class="fas fa-copy"></i></button></div></div>
+<div class="info-row mb-2"><small class="text-muted">Precio:</small><span class="badge bg-success fs-6">$${cuenta.precio.toFixed(2)}</span></div>
+<div class="info-row mb-2"><small class="text-muted">Estado:</small>${badgeEstado(cuenta)}</div>
+<div class="info-row mb-2"><small class="text-muted">Activa:</small>${badgeActiva(cuenta, hoy)}</div>
+<div class="info-row mb-2"><small class="text-muted">Compra:</small><span>${formatearFecha(cuenta.fecha_creacion) || 'N/A'}</span></div>
+${venta}
+${vencimiento}
+</div>
+</div>
+<div class="card-footer bg-transparent">
+<div class="d-grid gap-2">
+<a href="/ver_cuenta/${cuenta.id}" class="btn btn-primary btn-sm"><i class="fas fa-eye me-1"></i>Ver Detalles</a>
+<div class="btn-group w-100" role="group">
+<a href="/editar_cuenta/${cuenta.id}" class="btn btn-warning btn-sm"><i class="fas fa-edit"></i></a>
+${botonesRapidos(cuenta, 'btn-sm')}
+${botonEliminar(cuenta, 'btn-sm')}
+</div>
+</div>
+</div>
+</div>
+</div>`;
+}
+
+function filaCuenta(cuenta, hoy) {
+    let dias = '<span class="text-muted">-</span>';
+    if (cuenta.fecha_vencimiento) {
+        const restantes = diasRestantes(cuenta.fecha_vencimiento, hoy);
+        dias = restantes > 0 ? `<span class="text-info">${restantes} día${plural(restantes)}</span>`
+            : restantes === 0 ? '<span class="text-danger">Hoy</span>'
+                : `<span class="text-danger">${-restantes} día${plural(restantes)}</span>`;
+    }
+    const venta = cuenta.fecha_venta
+        ? `<span class="text-success">${formatearFecha(cuenta.fecha_venta)}</span>` : '<span class="text-muted">-</span>';
+    const vencimiento = cuenta.fecha_vencimiento
+        ? `<span class="text-warning">${formatearFecha(cuenta.fecha_vencimiento)}</span>` : '<span class="text-muted">-</span>';
+    return `<tr>
+<td><span class="badge bg-secondary">#${cuenta.id}</span>${badgePendiente(cuenta)}</td>
+<td><i class="fas fa-tv me-2"></i><strong>${escapar(cuenta.plataforma)}</strong></td>
+<td><code>${escapar(cuenta.email)}</code>
+<button class="btn btn-sm btn-outline-secondary ms-2" data-copiar="${escapar(cuenta.email)}" title="Copiar email"><i class="fas fa-copy"></i></button></td>
+<td><span class="badge bg-success">$${cuenta.precio.toFixed(2)}</span></td>
+<td>${badgeEstado(cuenta)}</td>
+<td>${badgeActiva(cuenta, hoy)}</td>
+<td>${formatearFecha(cuenta.fecha_creacion) || 'N/A'}</td>
+<td>${venta}</td>
+<td>${vencimiento}</td>
+<td>${dias}</td>
+<td><div class="btn-group" role="group">
+<a href="/ver_cuenta/${cuenta.id}" class="btn btn-sm btn-primary" title="Ver detalles"><i class="fas fa-eye"></i></a>
+<a href="/editar_cuenta/${cuenta.id}" class="btn btn-sm btn-warning" title="Editar"><i class="fas fa-edit"></i></a>
+${botonesRapidos(cuenta, 'btn-sm')}
+${botonEliminar(cuenta, 'btn-sm')}
+</div></td>
+</tr>`;
+}
+
+async function mostrarConflictos() {
+    const conflictos = await Replica.conflictos();
+    const contenedor = document.getElementById('avisosReplica');
+    if (!conflictos.length) {
+        contenedor.innerHTML = '';
+        return;
+    }
+    const nombres = { vender: 'Venta', renovar: 'Renovación' };
+    const lista = conflictos.map(conflicto =>
+        `<li>${nombres[conflicto.operacion.tipo] || conflicto.operacion.tipo} de la cuenta #${conflicto.operacion.cuenta_id}: ${escapar(conflicto.mensaje)}</li>`
+    ).join('');
+    contenedor.innerHTML = `<div class="alert alert-warning">
+<i class="fas fa-exclamation-triangle me-2"></i>
+<strong>Cambios hechos sin conexión que no se aplicaron</strong> (la cuenta cambió en el servidor y se muestra su estado actual):
+<ul class="mb-2 mt-2">${lista}</ul>
+<button type="button" class="btn btn-sm btn-outline-dark" id="descartarConflictos">Entendido</button>
+</div>`;
+    document.getElementById('descartarConflictos').addEventListener('click', async () => {
+        await Replica.borrarConflictos();
+        contenedor.innerHTML = '';
+    });
+}
+
+// Sincronizar y, si algo cambió, volver a dibujar; sin red se queda con la copia
+async function actualizarDesdeServidor() {
+    try {
+        const cambios = await Replica.sincronizar();
+        if (cambios && modoLocal) {
+            await renderizarLocal(true);
+        }
+        return true;
+    } catch (error) {
+        console.log('Réplica sin sincronizar:', error.message);
+        return false;
+    }
+}
+
+async function enviarPendientes() {
+    try {
+        const resumen = await Replica.programarEnvio();
+        // Sin service worker la cola se envió desde aquí
+        if (resumen) {
+            await actualizarDesdeServidor();
+            await renderizarLocal(true);
+            await mostrarConflictos();
+        }
+    } catch (error) {
+        console.log('Cola pendiente:', error.message);
+    }
+}
+
+async function operarLocal(tipo, cuentaId, datos) {
+    try {
+        await Replica.encolar(tipo, cuentaId, datos);
+    } catch (error) {
+        alert(error.message);
+        return;
+    }
+    await renderizarLocal(true);
+    enviarPendientes();
+}
+
+async function iniciarReplica() {
+    const usuarioId = Number(document.getElementById('resultadosCuentas').dataset.usuario);
+    try {
+        await Replica.prepararUsuario(usuarioId);
+        const teniaCopia = await Replica.haySincronizacion();
+        const sincronizada = await actualizarDesdeServidor();
+        if (!teniaCopia && !sincronizada) {
+            return;
+        }
+        modoLocal = true;
+        // La página pudo venir del caché del service worker: sin red o con cambios
+        // pendientes se dibuja la copia local, que es la más nueva que hay
+        const pendientes = await Replica.pendientes();
+        if (!sincronizada || pendientes.length) {
+            await renderizarLocal(true);
+        }
+        if (pendientes.length) {
+            enviarPendientes();
+        }
+        await mostrarConflictos();
+    } catch (error) {
+        console.log('Réplica local no disponible:', error);
+    }
+}
+
+if ('indexedDB' in window && typeof Replica !== 'undefined') {
+    const formulario = document.getElementById('estado').form;
+
+    formulario.addEventListener('submit', function(evento) {
+        if (modoLocal) {
+            evento.preventDefault();
+            aplicarFiltros(this);
+        }
+    });
+
+    formulario.elements.q.addEventListener('input', function() {
+        if (!modoLocal) {
+            return;
+        }
+        clearTimeout(temporizadorBusqueda);
+        temporizadorBusqueda = setTimeout(() => aplicarFiltros(formulario), 150);
+    });
+
+    document.querySelector('#mostrarMas button').addEventListener('click', () => {
+        limiteTarjetas += MAX_TARJETAS;
+        renderizarLocal();
+    });
+
+    // Acciones de la lista dibujada localmente
+    document.getElementById('resultadosCuentas').addEventListener('click', evento => {
+        const copiar = evento.target.closest('[data-copiar]');
+        const vender = evento.target.closest('[data-vender]');
+        const renovar = evento.target.closest('[data-renovar]');
+        if (copiar) {
+            navigator.clipboard.writeText(copiar.dataset.copiar);
+        } else if (vender) {
+            const formularioVenta = document.getElementById('formVentaRapida');
+            formularioVenta.reset();
+            formularioVenta.elements.cuenta_id.value = vender.dataset.vender;
+            bootstrap.Modal.getOrCreateInstance(document.getElementById('modalVentaRapida')).show();
+        } else if (renovar && confirm('¿Renovar esta cuenta por un mes más?')) {
+            operarLocal('renovar', Number(renovar.dataset.renovar));
+        }
+    });
+
+    document.getElementById('formVentaRapida').addEventListener('submit', function(evento) {
+        evento.preventDefault();
+        bootstrap.Modal.getOrCreateInstance(document.getElementById('modalVentaRapida')).hide();
+        operarLocal('vender', Number(this.elements.cuenta_id.value), {
+            nombre_comprador: this.elements.nombre_comprador.value.trim(),
+            whatsapp_comprador: this.elements.whatsapp_comprador.value.trim(),
+            fecha_vencimiento: this.elements.fecha_vencimiento.value || null
+        });
+    });
+
+    // El service worker avisa cuando revalidó datos o envió la cola
+    if ('serviceWorker' in navigator) {
+        navigator.serviceWorker.addEventListener('message', async evento => {
+            const tipo = evento.data && evento.data.tipo;
+            if (tipo === 'datos-actualizados' || tipo === 'cola-procesada') {
+                await actualizarDesdeServidor();
+                if (tipo === 'cola-procesada' && modoLocal) {
+                    await renderizarLocal(true);
+                    await mostrarConflictos();
+                }
+            }
+        });
+    }
+
+    window.addEventListener('online', () => {
+        enviarPendientes();
+        actualizarDesdeServidor();
+    });
+
+    iniciarReplica();
+}
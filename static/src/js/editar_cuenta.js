@@ -0,0 +1,95 @@
+// Toggle password visibility
+function togglePassword() {
+    const passwordInput = document.getElementById('password');
+    const toggleIcon = document.getElementById('toggleIcon');
+
+    if (passwordInput.type === 'password') {
+        passwordInput.type = 'text';
+        toggleIcon.classList.remove('fa-eye');
+        toggleIcon.classList.add('fa-eye-slash');
+    } else {
+        passwordInput.type = 'password';
+        toggleIcon.classList.remove('fa-eye-slash');
+        toggleIcon.classList.add('fa-eye');
+    }
+}
+
+// Form validation
+document.querySelector('form').addEventListener('submit', function(e) {
+    const plataforma = document.getElementById('plataforma').value;
+    const plataformaOtro = document.getElementById('plataforma_otro').value;
+    const precio = document.getElementById('precio').value;
+    const email = document.getElementById('email').value;
+
+    // Validar plataforma personalizada
+    if (plataforma === 'Otro' && (!plataformaOtro || plataformaOtro.trim() === '')) {
+        e.preventDefault();
+        alert('Por favor ingresa el nombre de la plataforma personalizada');
+        document.getElementById('plataforma_otro').focus();
+        return false;
+    }
+
+    if (!precio) {
+        e.preventDefault();
+        alert('Por favor ingresa el precio de la cuenta');
+        document.getElementById('precio').focus();
+        return false;
+    }
+
+    if (!email.includes('@')) {
+        e.preventDefault();
+        alert('Por favor ingresa un email válido');
+        return false;
+    }
+
+    if (!plataforma) {
+        e.preventDefault();
+        alert('Por favor selecciona una plataforma');
+        return false;
+    }
+});
+
+// Función para mostrar/ocultar campo de plataforma personalizada
+function togglePlataformaPersonalizada() {
+    const plataformaSelect = document.getElementById('plataforma');
+    const plataformaPersonalizada = document.getElementById('plataformaPersonalizada');
+    const plataformaOtro = document.getElementById('plataforma_otro');
+
+    if (plataformaSelect.value === 'Otro') {
+        plataformaPersonalizada.style.display = 'block';
+        plataformaOtro.required = true;
+        plataformaOtro.focus();
+    } else {
+        plataformaPersonalizada.style.display = 'none';
+        plataformaOtro.required = false;
+        plataformaOtro.value = '';
+    }
+}
+
+// Inicializar estado del campo personalizado al cargar la página
+document.addEventListener('DOMContentLoaded', function() {
+    const plataformaSelect = document.getElementById('plataforma');
+    if (plataformaSelect.value === 'Otro') {
+        togglePlataformaPersonalizada();
+    }
+});
+
+// Confirm before leaving with unsaved changes
+let formChanged = false;
+document.querySelectorAll('input, select, textarea').forEach(element => {
+    element.addEventListener('change', () => {
+        formChanged = true;
+    });
+});
+
+window.addEventListener('beforeunload', function(e) {
+    if (formChanged) {
+        e.preventDefault();
+        e.returnValue = 'Tienes cambios sin guardar. ¿Estás seguro de que quieres salir?';
+    }
+});
+
+// Reset form changed flag when form is submitted
+document.querySelector('form').addEventListener('submit', function() {
+    formChanged = false;
+});
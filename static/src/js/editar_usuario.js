@@ -0,0 +1,28 @@
+document.addEventListener('DOMContentLoaded', function() {
+    const nuevaPassword = document.getElementById('nueva_password');
+    const confirmarPassword = document.getElementById('confirmar_password');
+
+    function validarPassword() {
+        if (nuevaPassword.value && confirmarPassword.value) {
+            if (nuevaPassword.value !== confirmarPassword.value) {
+                confirmarPassword.setCustomValidity('Las contraseñas no coinciden');
+            } else {
+                confirmarPassword.setCustomValidity('');
+            }
+        } else {
+            confirmarPassword.setCustomValidity('');
+        }
+    }
+
+    nuevaPassword.addEventListener('input', validarPassword);
+    confirmarPassword.addEventListener('input', validarPassword);
+
+    // Validar al enviar el formulario
+    document.querySelector('form').addEventListener('submit', function(e) {
+        if (nuevaPassword.value && confirmarPassword.value && nuevaPassword.value !== confirmarPassword.value) {
+            e.preventDefault();
+            alert('Las contraseñas no coinciden');
+            return false;
+        }
+    });
+});
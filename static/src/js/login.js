@@ -0,0 +1,54 @@
+document.addEventListener('DOMContentLoaded', function() {
+    // Efecto de typing para el título
+    const title = document.querySelector('.login-header h2');
+    const originalText = title.textContent;
+    let i = 0;
+    title.innerHTML = '';
+
+    function typeWriter() {
+        if (i < originalText.length) {
+            title.innerHTML += originalText.charAt(i);
+            i++;
+            setTimeout(typeWriter, 150);
+        }
+    }
+    typeWriter();
+
+    // Efectos para campos de formulario
+    const inputs = document.querySelectorAll('.form-control');
+    inputs.forEach(input => {
+        input.addEventListener('focus', function() {
+            this.style.transform = 'translateY(-2px)';
+            this.style.boxShadow = '0 8px 25px rgba(102, 126, 234, 0.3)';
+        });
+
+        input.addEventListener('blur', function() {
+            this.style.transform = 'translateY(0)';
+            this.style.boxShadow = '0 0 0 0.2rem rgba(102, 126, 234, 0.25)';
+        });
+    });
+
+    // Efecto de hover para el botón
+    const button = document.querySelector('.btn-login');
+    button.addEventListener('mouseenter', function() {
+        this.style.transform = 'translateY(-3px) scale(1.05)';
+    });
+
+    button.addEventListener('mouseleave', function() {
+        this.style.transform = 'translateY(0) scale(1)';
+    });
+
+    // Efectos para los iconos de streaming del fondo
+    const streamingIcons = document.querySelectorAll('.streaming-icon');
+    streamingIcons.forEach(icon => {
+        icon.addEventListener('mouseenter', function() {
+            this.style.opacity = '0.8';
+            this.style.transform = 'scale(1.5) rotate(10deg)';
+        });
+
+        icon.addEventListener('mouseleave', function() {
+            this.style.opacity = '0.3';
+            this.style.transform = 'scale(1) rotate(0deg)';
+        });
+    });
+});
@@ -0,0 +1,84 @@
+// Set today's date as default
+document.addEventListener('DOMContentLoaded', function() {
+    const today = new Date().toISOString().split('T')[0];
+    document.getElementById('fecha_compra').value = today;
+});
+
+// Toggle password visibility
+function togglePassword() {
+    const passwordInput = document.getElementById('password');
+    const toggleIcon = document.getElementById('toggleIcon');
+
+    if (passwordInput.type === 'password') {
+        passwordInput.type = 'text';
+        toggleIcon.classList.remove('fa-eye');
+        toggleIcon.classList.add('fa-eye-slash');
+    } else {
+        passwordInput.type = 'password';
+        toggleIcon.classList.remove('fa-eye-slash');
+        toggleIcon.classList.add('fa-eye');
+    }
+}
+
+// Form validation
+document.querySelector('form').addEventListener('submit', function(e) {
+    const precio = document.getElementById('precio').value;
+    const email = document.getElementById('email').value;
+
+    if (parseFloat(precio) <= 0) {
+        e.preventDefault();
+        alert('El precio debe ser mayor a 0');
+        return false;
+    }
+
+    if (!email.includes('@')) {
+        e.preventDefault();
+        alert('Por favor ingresa un email válido');
+        return false;
+    }
+});
+
+// Función para mostrar/ocultar campo de plataforma personalizada
+function togglePlataformaPersonalizada() {
+    const plataformaSelect = document.getElementById('plataforma');
+    const plataformaPersonalizada = document.getElementById('plataformaPersonalizada');
+
+    if (plataformaSelect.value === 'Otro') {
+        plataformaPersonalizada.style.display = 'block';
+        document.getElementById('plataforma_otro').required = true;
+        document.getElementById('plataforma_otro').focus();
+    } else {
+        plataformaPersonalizada.style.display = 'none';
+        document.getElementById('plataforma_otro').required = false;
+        document.getElementById('plataforma_otro').value = '';
+    }
+}
+
+// Validación del formulario para plataforma personalizada
+document.querySelector('form').addEventListener('submit', function(e) {
+    const plataforma = document.getElementById('plataforma').value;
+    const plataformaOtro = document.getElementById('plataforma_otro').value;
+
+    if (plataforma === 'Otro' && (!plataformaOtro || plataformaOtro.trim() === '')) {
+        e.preventDefault();
+        alert('Por favor ingresa el nombre de la plataforma personalizada');
+        document.getElementById('plataforma_otro').focus();
+        return false;
+    }
+
+    // Otras validaciones existentes
+    const precio = document.getElementById('precio').value;
+    const email = document.getElementById('email').value;
+
+    if (parseFloat(precio) <= 0) {
+        e.preventDefault();
+        alert('El precio debe ser mayor a 0');
+        return false;
+    }
+
+    if (!email.includes('@')) {
+        e.preventDefault();
+        alert('Por favor ingresa un email válido');
+        return false;
+    }
+});
@@ -0,0 +1,24 @@
+document.addEventListener('DOMContentLoaded', function() {
+    const password = document.getElementById('password');
+    const confirmarPassword = document.getElementById('confirmar_password');
+
+    function validarPassword() {
+        if (password.value !== confirmarPassword.value) {
+            confirmarPassword.setCustomValidity('Las contraseñas no coinciden');
+        } else {
+            confirmarPassword.setCustomValidity('');
+        }
+    }
+
+    password.addEventListener('change', validarPassword);
+    confirmarPassword.addEventListener('keyup', validarPassword);
+
+    // Validar al enviar el formulario
+    document.querySelector('form').addEventListener('submit', function(e) {
+        if (password.value !== confirmarPassword.value) {
+            e.preventDefault();
+            alert('Las contraseñas no coinciden');
+            return false;
+        }
+    });
+});
@@ -0,0 +1,390 @@
+// Réplica local (IndexedDB) de las cuentas del usuario y cola de cambios sin conexión
+//
+// La usan la página de cuentas y el service worker (importScripts): no toca el DOM.
+//
+// Almacenes:
+//   cuentas     copia de /api/cuentas/changes (clave: id)
+//   meta        token de sincronización y usuario dueño de la copia
+//   pendientes  ventas y renovaciones todavía no enviadas, en orden
+//   conflictos  operaciones que el servidor rechazó (versión distinta, cuenta borrada...)
+//
+// Cada operación lleva la versión de la cuenta sobre la que se hizo; el
+// servidor solo la aplica si la fila sigue en esa versión (si no, 409 y su
+// estado actual reemplaza al local).
+const Replica = (() => {
+    const NOMBRE_BD = 'gestor-cuentas';
+    const VERSION_BD = 1;
+    const TAG_SYNC = 'cola-cuentas';
+    const LIMITE_CAMBIOS = 5000;
+    const DIAS_POR_VENCER = 7;
+    // Campos donde busca el texto libre (los mismos que busqueda.py)
+    const CAMPOS_BUSQUEDA = ['email', 'notas', 'nombre_comprador', 'whatsapp_comprador'];
+
+    let conexion = null;
+    let procesando = null;
+
+    function abrir() {
+        if (!conexion) {
+            conexion = new Promise((resolver, rechazar) => {
+                const peticion = indexedDB.open(NOMBRE_BD, VERSION_BD);
+                peticion.onupgradeneeded = () => {
+                    const bd = peticion.result;
+                    bd.createObjectStore('cuentas', { keyPath: 'id' });
+                    bd.createObjectStore('meta');
+                    bd.createObjectStore('pendientes', { keyPath: 'clave', autoIncrement: true });
+                    bd.createObjectStore('conflictos', { keyPath: 'clave', autoIncrement: true });
+                };
+                peticion.onsuccess = () => {
+                    const bd = peticion.result;
+                    // Una versión nueva de la base en otra pestaña: cerrar y reabrir en la próxima llamada
+                    bd.onversionchange = () => {
+                        bd.close();
+                        conexion = null;
+                    };
+                    resolver(bd);
+                };
+                peticion.onerror = () => {
+                    conexion = null;
+                    rechazar(peticion.error);
+                };
+            });
+        }
+        return conexion;
+    }
+
+    // Ejecuta `trabajo(tx)` en una transacción y resuelve con su resultado al confirmarse.
+    // `trabajo` debe lanzar sus peticiones de forma síncrona (o desde sus onsuccess);
+    // si retorna una IDBRequest se resuelve con el .result de esa petición.
+    async function transaccion(almacenes, modo, trabajo) {
+        const bd = await abrir();
+        return new Promise((resolver, rechazar) => {
+            const tx = bd.transaction(almacenes, modo);
+            const valor = trabajo(tx);
+            tx.oncomplete = () => resolver(valor instanceof IDBRequest ? valor.result : valor);
+            tx.onerror = () => rechazar(tx.error);
+            tx.onabort = () => rechazar(tx.error || new Error('Transacción abortada'));
+        });
+    }
+
+    function leerMeta(clave) {
+        return transaccion('meta', 'readonly', tx => tx.objectStore('meta').get(clave));
+    }
+
+    // La copia es de un solo usuario: si cambia el que inició sesión se empieza de cero
+    async function prepararUsuario(usuarioId) {
+        const dueno = await leerMeta('usuario');
+        if (dueno === usuarioId) {
+            return false;
+        }
+        await borrarTodo();
+        await transaccion('meta', 'readwrite', tx => tx.objectStore('meta').put(usuarioId, 'usuario'));
+        return true;
+    }
+
+    function borrarTodo() {
+        const almacenes = ['cuentas', 'meta', 'pendientes', 'conflictos'];
+        return transaccion(almacenes, 'readwrite', tx => {
+            almacenes.forEach(nombre => tx.objectStore(nombre).clear());
+        });
+    }
+
+    async function haySincronizacion() {
+        return (await leerMeta('token')) !== undefined;
+    }
+
+    function todas() {
+        return transaccion('cuentas', 'readonly', tx => tx.objectStore('cuentas').getAll());
+    }
+
+    function pendientes() {
+        return transaccion('pendientes', 'readonly', tx => tx.objectStore('pendientes').getAll());
+    }
+
+    function conflictos() {
+        return transaccion('conflictos', 'readonly', tx => tx.objectStore('conflictos').getAll());
+    }
+
+    function borrarConflictos() {
+        return transaccion('conflictos', 'readwrite', tx => tx.objectStore('conflictos').clear());
+    }
+
+    async function pedirJson(url, opciones) {
+        const respuesta = await fetch(url, Object.assign({ credentials: 'same-origin', cache: 'no-store' }, opciones));
+        // login_required redirige al login: la sesión venció, reintentar cuando vuelva a entrar
+        if (respuesta.redirected || respuesta.status === 401) {
+            throw new Error('Sesión no iniciada');
+        }
+        return respuesta;
+    }
+
+    // Trae los cambios desde el último token hasta ponerse al día; retorna cuántas cuentas cambiaron.
+    // Las cuentas con operaciones pendientes conservan su versión local hasta enviarlas.
+    async function sincronizar() {
+        let total = 0;
+        let hayMas = true;
+        while (hayMas) {
+            const token = (await leerMeta('token')) || 0;
+            const respuesta = await pedirJson(`/api/cuentas/changes?since=${token}&limite=${LIMITE_CAMBIOS}`);
+            if (!respuesta.ok) {
+                throw new Error(`Error ${respuesta.status} al sincronizar`);
+            }
+            const datos = await respuesta.json();
+            await transaccion(['cuentas', 'meta', 'pendientes'], 'readwrite', tx => {
+                const almacen = tx.objectStore('cuentas');
+                tx.objectStore('pendientes').getAll().onsuccess = evento => {
+                    const conPendientes = new Set(evento.target.result.map(operacion => operacion.cuenta_id));
+                    datos.cuentas.forEach(cuenta => {
+                        if (!conPendientes.has(cuenta.id)) {
+                            almacen.put(cuenta);
+                        }
+                    });
+                    datos.eliminadas.forEach(id => almacen.delete(id));
+                    tx.objectStore('meta').put(datos.version, 'token');
+                };
+            });
+            total += datos.cuentas.length + datos.eliminadas.length;
+            hayMas = datos.hay_mas;
+        }
+        return total;
+    }
+
+    function fechaLocal(fecha) {
+        const dos = numero => String(numero).padStart(2, '0');
+        return `${fecha.getFullYear()}-${dos(fecha.getMonth() + 1)}-${dos(fecha.getDate())}`;
+    }
+
+    function fechaHoraLocal(fecha) {
+        const dos = numero => String(numero).padStart(2, '0');
+        return `${fechaLocal(fecha)}T${dos(fecha.getHours())}:${dos(fecha.getMinutes())}:${dos(fecha.getSeconds())}`;
+    }
+
+    // Igual que relativedelta(months=n): si el día no existe se usa el último del mes
+    function sumarMeses(fechaIso, meses) {
+        const [ano, mes, dia] = fechaIso.split('-').map(Number);
+        const destino = new Date(ano, mes - 1 + meses, 1);
+        const ultimoDia = new Date(destino.getFullYear(), destino.getMonth() + 1, 0).getDate();
+        destino.setDate(Math.min(dia, ultimoDia));
+        return fechaLocal(destino);
+    }
+
+    // Lo que hará el servidor, aplicado ya en la copia local
+    function aplicarLocal(tipo, cuenta, datos) {
+        const nueva = Object.assign({}, cuenta, { version: cuenta.version + 1, pendiente: true });
+        if (tipo === 'vender') {
+            nueva.estado = 'Vendida';
+            nueva.fecha_venta = datos.fecha_venta.replace('T', ' ');
+            nueva.nombre_comprador = datos.nombre_comprador;
+            nueva.whatsapp_comprador = datos.whatsapp_comprador;
+            nueva.fecha_vencimiento = datos.fecha_vencimiento || null;
+        } else if (tipo === 'renovar') {
+            nueva.fecha_vencimiento = sumarMeses(cuenta.fecha_vencimiento, 1);
+        }
+        return nueva;
+    }
+
+    // Guarda la operación en la cola y la aplica en la copia; retorna la cuenta actualizada
+    async function encolar(tipo, cuentaId, datos = {}) {
+        if (tipo === 'vender') {
+            datos = Object.assign({ fecha_venta: fechaHoraLocal(new Date()) }, datos);
+        }
+        const resultado = await transaccion(['cuentas', 'pendientes'], 'readwrite', tx => {
+            const almacen = tx.objectStore('cuentas');
+            const resultado = {};
+            almacen.get(cuentaId).onsuccess = evento => {
+                const actual = evento.target.result;
+                if (!actual) {
+                    resultado.error = 'La cuenta no está en la copia local';
+                    return;
+                }
+                if (tipo === 'vender' && actual.estado !== 'Disponible') {
+                    resultado.error = 'La cuenta no está disponible para la venta';
+                    return;
+                }
+                if (tipo === 'renovar' && !actual.fecha_vencimiento) {
+                    resultado.error = 'Esta cuenta no tiene fecha de vencimiento configurada';
+                    return;
+                }
+                tx.objectStore('pendientes').add({
+                    tipo,
+                    cuenta_id: cuentaId,
+                    version: actual.version,
+                    datos,
+                    fecha: new Date().toISOString()
+                });
+                resultado.cuenta = aplicarLocal(tipo, actual, datos);
+                almacen.put(resultado.cuenta);
+            };
+            return resultado;
+        });
+        if (resultado.error) {
+            throw new Error(resultado.error);
+        }
+        return resultado.cuenta;
+    }
+
+    function primeraPendiente() {
+        return transaccion('pendientes', 'readonly', tx => {
+            const resultado = {};
+            tx.objectStore('pendientes').openCursor().onsuccess = evento => {
+                const cursor = evento.target.result;
+                resultado.operacion = cursor ? cursor.value : null;
+            };
+            return resultado;
+        }).then(resultado => resultado.operacion);
+    }
+
+    // Aceptada: se quita de la cola; la respuesta del servidor reemplaza a la copia
+    // salvo que queden más operaciones de la misma cuenta (su versión local ya las incluye)
+    function confirmar(operacion, cuenta) {
+        return transaccion(['cuentas', 'pendientes'], 'readwrite', tx => {
+            const cola = tx.objectStore('pendientes');
+            cola.delete(operacion.clave);
+            cola.getAll().onsuccess = evento => {
+                if (!evento.target.result.some(otra => otra.cuenta_id === operacion.cuenta_id)) {
+                    tx.objectStore('cuentas').put(cuenta);
+                }
+            };
+        });
+    }
+
+    // Rechazada: esa operación y las siguientes de la misma cuenta pasan a conflictos
+    // y la copia adopta el estado del servidor (o borra la cuenta si ya no existe)
+    function rechazar(operacion, estado, datos) {
+        return transaccion(['cuentas', 'pendientes', 'conflictos'], 'readwrite', tx => {
+            const cola = tx.objectStore('pendientes');
+            const resultado = { rechazadas: 0 };
+            cola.getAll().onsuccess = evento => {
+                evento.target.result
+                    .filter(otra => otra.cuenta_id === operacion.cuenta_id)
+                    .forEach(otra => {
+                        cola.delete(otra.clave);
+                        tx.objectStore('conflictos').add({
+                            operacion: otra,
+                            estado,
+                            mensaje: datos.error || `Error ${estado}`,
+                            cuenta: datos.cuenta || null,
+                            fecha: new Date().toISOString()
+                        });
+                        resultado.rechazadas += 1;
+                    });
+                if (datos.cuenta) {
+                    tx.objectStore('cuentas').put(datos.cuenta);
+                } else if (estado === 404 || estado === 403) {
+                    tx.objectStore('cuentas').delete(operacion.cuenta_id);
+                }
+            };
+            return resultado;
+        });
+    }
+
+    async function enviar(operacion) {
+        const respuesta = await pedirJson(`/api/cuentas/${operacion.cuenta_id}/${operacion.tipo}`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify(Object.assign({}, operacion.datos, { version: operacion.version }))
+        });
+        if (respuesta.status >= 500) {
+            throw new Error(`Error ${respuesta.status} del servidor`);
+        }
+        const datos = await respuesta.json().catch(() => ({}));
+        return { estado: respuesta.status, datos };
+    }
+
+    // Envía la cola en orden. Sin red o con la sesión vencida lanza el error y la cola
+    // queda intacta (el Background Sync vuelve a intentar más tarde).
+    function procesarCola() {
+        if (!procesando) {
+            procesando = (async () => {
+                const resumen = { aplicadas: 0, rechazadas: 0 };
+                let operacion = await primeraPendiente();
+                while (operacion) {
+                    const { estado, datos } = await enviar(operacion);
+                    if (estado >= 200 && estado < 300) {
+                        await confirmar(operacion, datos.cuenta);
+                        resumen.aplicadas += 1;
+                    } else {
+                        resumen.rechazadas += (await rechazar(operacion, estado, datos)).rechazadas;
+                    }
+                    operacion = await primeraPendiente();
+                }
+                return resumen;
+            })().finally(() => {
+                procesando = null;
+            });
+        }
+        return procesando;
+    }
+
+    // Desde la página: pedir el envío al service worker con Background Sync;
+    // sin soporte se le pide por mensaje, y sin worker se envía desde la página
+    async function programarEnvio() {
+        const registro = 'serviceWorker' in navigator ? await navigator.serviceWorker.getRegistration() : null;
+        if (registro && registro.active) {
+            if ('sync' in registro) {
+                try {
+                    await registro.sync.register(TAG_SYNC);
+                    return null;
+                } catch (error) {
+                    // Permiso denegado: seguir con el mensaje
+                }
+            }
+            registro.active.postMessage({ tipo: 'procesar-cola' });
+            return null;
+        }
+        return procesarCola();
+    }
+
+    function normalizar(texto) {
+        return (texto || '').normalize('NFD').replace(/[\u0300-\u036f]/g, '').toLowerCase();
+    }
+
+    // Los mismos filtros que la vista /cuentas, y el mismo orden (más nuevas primero)
+    function filtrar(cuentas, filtros) {
+        const hoy = fechaLocal(new Date());
+        const limite = new Date();
+        limite.setDate(limite.getDate() + DIAS_POR_VENCER);
+        const hasta = fechaLocal(limite);
+        const terminos = normalizar(filtros.q).split(/\s+/).filter(Boolean);
+
+        return cuentas.filter(cuenta => {
+            if (filtros.plataforma && cuenta.plataforma !== filtros.plataforma) {
+                return false;
+            }
+            const vencimiento = cuenta.fecha_vencimiento;
+            if (filtros.estado === 'Por Vencer') {
+                if (!vencimiento || vencimiento < hoy || vencimiento > hasta) {
+                    return false;
+                }
+            } else if (filtros.estado === 'Vencida') {
+                if (!vencimiento || vencimiento >= hoy) {
+                    return false;
+                }
+            } else if (filtros.estado && cuenta.estado !== filtros.estado) {
+                return false;
+            }
+            if (terminos.length) {
+                const texto = normalizar(CAMPOS_BUSQUEDA.map(campo => cuenta[campo] || '').join(' '));
+                return terminos.every(termino => texto.includes(termino));
+            }
+            return true;
+        }).sort((a, b) => (b.fecha_creacion || '').localeCompare(a.fecha_creacion || '') || b.id - a.id);
+    }
+
+    return {
+        TAG_SYNC,
+        DIAS_POR_VENCER,
+        prepararUsuario,
+        borrarTodo,
+        haySincronizacion,
+        sincronizar,
+        todas,
+        pendientes,
+        conflictos,
+        borrarConflictos,
+        encolar,
+        procesarCola,
+        programarEnvio,
+        filtrar,
+        fechaLocal
+    };
+})();
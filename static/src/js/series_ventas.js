@@ -0,0 +1,79 @@
+// Gráfico "Ventas en el tiempo" del dashboard: barras apiladas por plataforma desde /api/series
+const COLORES_SERIES = ['#6366f1', '#8b5cf6', '#10b981', '#f59e0b', '#ef4444', '#3b82f6', '#ec4899', '#06b6d4'];
+// Más plataformas que colores: las menos vendidas se juntan en "Otras"
+const MAX_SERIES = COLORES_SERIES.length - 1;
+
+let graficoSeries = null;
+
+function agruparSeries(series) {
+    if (series.length <= MAX_SERIES + 1) {
+        return series;
+    }
+    const resto = series.slice(MAX_SERIES);
+    const otras = {
+        plataforma: 'Otras',
+        ventas: resto[0].ventas.map((_, i) => resto.reduce((suma, serie) => suma + serie.ventas[i], 0)),
+        ingresos: resto[0].ingresos.map((_, i) => resto.reduce((suma, serie) => suma + serie.ingresos[i], 0))
+    };
+    return series.slice(0, MAX_SERIES).concat([otras]);
+}
+
+async function cargarSeries() {
+    const lienzo = document.getElementById('seriesVentasChart');
+    const agrupar = document.getElementById('seriesAgrupar').value;
+    const medida = document.getElementById('seriesMedida').value;
+    const respuesta = await fetch(`${lienzo.dataset.url}?agrupar=${agrupar}`, { credentials: 'same-origin' });
+    if (!respuesta.ok) {
+        return;
+    }
+    const datos = await respuesta.json();
+    const series = agruparSeries(datos.series);
+    document.getElementById('seriesSinDatos').classList.toggle('d-none', series.length > 0);
+
+    const conjuntos = series.map((serie, i) => ({
+        label: serie.plataforma,
+        data: serie[medida],
+        backgroundColor: COLORES_SERIES[i % COLORES_SERIES.length],
+        stack: 'ventas'
+    }));
+    if (graficoSeries) {
+        graficoSeries.data.labels = datos.periodos;
+        graficoSeries.data.datasets = conjuntos;
+        graficoSeries.update();
+        return;
+    }
+    graficoSeries = new Chart(lienzo.getContext('2d'), {
+        type: 'bar',
+        data: { labels: datos.periodos, datasets: conjuntos },
+        options: {
+            responsive: true,
+            maintainAspectRatio: false,
+            interaction: { mode: 'index', intersect: false },
+            scales: {
+                x: { stacked: true },
+                y: { stacked: true, beginAtZero: true }
+            },
+            plugins: {
+                legend: { position: 'bottom', labels: { usePointStyle: true } },
+                tooltip: {
+                    callbacks: {
+                        label: function(context) {
+                            const valor = document.getElementById('seriesMedida').value === 'ingresos'
+                                ? '$' + context.parsed.y.toFixed(2) : context.parsed.y;
+                            return `${context.dataset.label}: ${valor}`;
+                        }
+                    }
+                }
+            }
+        }
+    });
+}
+
+document.addEventListener('DOMContentLoaded', function() {
+    if (!document.getElementById('seriesVentasChart') || typeof Chart === 'undefined') {
+        return;
+    }
+    document.getElementById('seriesAgrupar').addEventListener('change', cargarSeries);
+    document.getElementById('seriesMedida').addEventListener('change', cargarSeries);
+    cargarSeries();
+});
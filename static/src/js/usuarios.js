@@ -0,0 +1,75 @@
+// Toggle between grid and list view
+document.getElementById('viewGrid').addEventListener('click', function() {
+    document.getElementById('gridView').classList.remove('d-none');
+    document.getElementById('listView').classList.add('d-none');
+    this.classList.add('active');
+    document.getElementById('viewList').classList.remove('active');
+});
+
+document.getElementById('viewList').addEventListener('click', function() {
+    document.getElementById('gridView').classList.add('d-none');
+    document.getElementById('listView').classList.remove('d-none');
+    this.classList.add('active');
+    document.getElementById('viewGrid').classList.remove('active');
+});
+
+// Set grid view as active by default
+document.getElementById('viewGrid').classList.add('active');
+
+// Copy to clipboard function
+function copyToClipboard(text) {
+    navigator.clipboard.writeText(text).then(function() {
+        // Show success message
+        const button = event.target.closest('button');
+        const originalIcon = button.innerHTML;
+        button.innerHTML = '<i class="fas fa-check"></i>';
+        button.classList.remove('btn-outline-secondary');
+        button.classList.add('btn-success');
+
+        setTimeout(() => {
+            button.innerHTML = originalIcon;
+            button.classList.remove('btn-success');
+            button.classList.add('btn-outline-secondary');
+        }, 2000);
+    }).catch(function(err) {
+        console.error('Error copying text: ', err);
+    });
+}
+
+function confirmarEliminacion(usuarioId, nombreUsuario, totalCuentas) {
+    if (!totalCuentas) {
+        // Sin cuentas basta con confirmar
+        if (confirm('¿Estás seguro de que quieres eliminar al usuario ' + nombreUsuario + '?')) {
+            // Crear un formulario temporal y enviarlo
+            const form = document.createElement('form');
+            form.method = 'POST';
+            form.action = '/usuarios/' + usuarioId + '/eliminar';
+            document.body.appendChild(form);
+            form.submit();
+        }
+        return;
+    }
+
+    // Con cuentas hay que elegir si reasignarlas o eliminarlas
+    const form = document.getElementById('formEliminarUsuario');
+    form.action = '/usuarios/' + usuarioId + '/eliminar';
+    form.reset();
+    document.getElementById('eliminarDestino').disabled = false;
+    document.getElementById('eliminarNombreUsuario').textContent = nombreUsuario;
+    document.getElementById('eliminarTotalCuentas').textContent = totalCuentas;
+    bootstrap.Modal.getOrCreateInstance(document.getElementById('modalEliminarUsuario')).show();
+}
+
+// El usuario destino solo hace falta al reasignar
+document.querySelectorAll('#formEliminarUsuario input[name="cuentas"]').forEach(function(opcion) {
+    opcion.addEventListener('change', function() {
+        document.getElementById('eliminarDestino').disabled = this.value !== 'reasignar';
+    });
+});
+
+document.getElementById('formEliminarUsuario').addEventListener('submit', function(e) {
+    if (this.cuentas.value === 'eliminar' &&
+        !confirm('Se eliminarán todas las cuentas de ' + document.getElementById('eliminarNombreUsuario').textContent + '. ¿Continuar?')) {
+        e.preventDefault();
+    }
+});
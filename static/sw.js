@@ -1,25 +1,36 @@
 // Service Worker para Gestor de Cuentas de Streaming
-const CACHE_NAME = 'gestor-streaming-v1.0.0';
-const urlsToCache = [
-  '/',
-  '/static/manifest.json',
-  '/static/css/bootstrap.min.css',
-  '/static/css/fontawesome.min.css',
-  '/static/js/bootstrap.bundle.min.js',
-  '/static/js/chart.min.js',
-  '/templates/base.html',
-  '/templates/login.html',
-  '/templates/index.html'
-];
+// Se sirve desde /sw.js: la aplicación antepone PRECACHE_URLS, SCRIPTS_COMPARTIDOS
+// y VERSION generados a partir del manifest de recursos estáticos (construir_estaticos.py)
+//
+// Estrategias por ruta:
+//   /static/dist, /static/vendor   cache-first (nombres con hash o versión: inmutables)
+//   resto de /static               stale-while-revalidate
+//   /api/cuentas, /api/estadisticas stale-while-revalidate con If-None-Match (ETag)
+//   /api/series                     stale-while-revalidate (gráficos del dashboard sin conexión)
+//   páginas (navegación)           network-first con tiempo límite; copia para usar sin conexión
+//
+// Las ventas y renovaciones hechas sin conexión quedan en la cola de la réplica
+// IndexedDB (js/replica.js); el evento `sync` las envía cuando vuelve la red.
+importScripts(...SCRIPTS_COMPARTIDOS);
+
+const CACHE_NAME = 'gestor-streaming-' + VERSION;
+const CACHE_PAGINAS = 'gestor-paginas-v1';
+const CACHE_DATOS = 'gestor-datos-v1';
+const CACHES_ACTUALES = [CACHE_NAME, CACHE_PAGINAS, CACHE_DATOS];
+
+const TIEMPO_RED_MS = 3000;
+const MAX_PAGINAS = 40;
+const RUTAS_INMUTABLES = ['/static/dist/', '/static/vendor/'];
+const RUTAS_DATOS = ['/api/cuentas', '/api/estadisticas', '/api/series'];
+// Al cerrar o iniciar sesión se borran las páginas y datos del usuario anterior
+const RUTAS_SESION = ['/logout', '/login'];
 
 // Instalación del Service Worker
 self.addEventListener('install', event => {
   event.waitUntil(
     caches.open(CACHE_NAME)
-      .then(cache => {
-        console.log('Cache abierto');
-        return cache.addAll(urlsToCache);
-      })
+      .then(cache => cache.addAll(PRECACHE_URLS))
+      .then(() => self.skipWaiting())
       .catch(error => {
         console.error('Error al cachear archivos:', error);
       })
@@ -32,53 +43,198 @@ self.addEventListener('activate', event => {
     caches.keys().then(cacheNames => {
       return Promise.all(
         cacheNames.map(cacheName => {
-          if (cacheName !== CACHE_NAME) {
+          if (!CACHES_ACTUALES.includes(cacheName)) {
             console.log('Eliminando cache antiguo:', cacheName);
             return caches.delete(cacheName);
           }
         })
       );
-    })
+    }).then(() => self.clients.claim())
   );
 });
 
 // Interceptar peticiones
 self.addEventListener('fetch', event => {
-  event.respondWith(
-    caches.match(event.request)
-      .then(response => {
-        // Si está en cache, devolverlo
-        if (response) {
-          return response;
-        }
-        
-        // Si no está en cache, hacer la petición
-        return fetch(event.request).then(response => {
-          // Verificar que la respuesta sea válida
-          if (!response || response.status !== 200 || response.type !== 'basic') {
-            return response;
-          }
-          
-          // Clonar la respuesta para cachearla
-          const responseToCache = response.clone();
-          
-          caches.open(CACHE_NAME)
-            .then(cache => {
-              cache.put(event.request, responseToCache);
-            });
-          
-          return response;
-        });
-      })
-      .catch(() => {
-        // Si falla la petición y no está en cache, mostrar página offline
-        if (event.request.mode === 'navigate') {
-          return caches.match('/templates/login.html');
-        }
-      })
+  const request = event.request;
+  const url = new URL(request.url);
+  if (url.origin !== self.location.origin) {
+    return;
+  }
+
+  if (RUTAS_SESION.includes(url.pathname)) {
+    // La petición sale cuando ya se borraron los datos: ninguna respuesta del usuario
+    // anterior (ni su ETag) puede servirse al siguiente
+    event.respondWith(borrarDatosDeUsuario(url.pathname === '/logout').then(() => fetch(request)));
+    return;
+  }
+  if (request.method !== 'GET') {
+    return;
+  }
+
+  if (RUTAS_INMUTABLES.some(ruta => url.pathname.startsWith(ruta))) {
+    event.respondWith(cachePrimero(request));
+  } else if (url.pathname.startsWith('/static/')) {
+    event.respondWith(staleWhileRevalidate(event, CACHE_NAME));
+  } else if (RUTAS_DATOS.includes(url.pathname)) {
+    event.respondWith(datosStaleWhileRevalidate(event));
+  } else if (request.mode === 'navigate') {
+    event.respondWith(redPrimero(event));
+  }
+});
+
+async function cachePrimero(request) {
+  const cacheada = await caches.match(request);
+  if (cacheada) {
+    return cacheada;
+  }
+  const respuesta = await fetch(request);
+  if (respuesta.ok && respuesta.type === 'basic') {
+    const cache = await caches.open(CACHE_NAME);
+    await cache.put(request, respuesta.clone());
+  }
+  return respuesta;
+}
+
+async function staleWhileRevalidate(event, nombreCache) {
+  const cache = await caches.open(nombreCache);
+  const cacheada = await cache.match(event.request);
+  const red = fetch(event.request).then(respuesta => {
+    if (respuesta.ok && respuesta.type === 'basic') {
+      return cache.put(event.request, respuesta.clone()).then(() => respuesta);
+    }
+    return respuesta;
+  });
+  if (cacheada) {
+    event.waitUntil(red.catch(() => {}));
+    return cacheada;
+  }
+  return red;
+}
+
+// Datos de la API: responder al instante con la copia y revalidar con el ETag.
+// Si los datos cambiaron se avisa a las páginas con postMessage.
+async function datosStaleWhileRevalidate(event) {
+  const cache = await caches.open(CACHE_DATOS);
+  const cacheada = await cache.match(event.request);
+  const actualizacion = revalidarDatos(event.request, cache, cacheada);
+  if (cacheada) {
+    event.waitUntil(actualizacion.catch(() => {}));
+    return cacheada;
+  }
+  return actualizacion;
+}
+
+async function revalidarDatos(request, cache, cacheada) {
+  const headers = new Headers(request.headers);
+  const etag = cacheada && cacheada.headers.get('ETag');
+  if (etag) {
+    headers.set('If-None-Match', etag);
+  }
+  const respuesta = await fetch(request.url, { headers, credentials: 'same-origin', cache: 'no-store' });
+  if (respuesta.status === 304 && cacheada) {
+    return cacheada;
+  }
+  if (respuesta.ok && respuesta.type === 'basic' && !respuesta.redirected) {
+    await cache.put(request, respuesta.clone());
+    if (cacheada) {
+      avisarClientes({ tipo: 'datos-actualizados', url: request.url });
+    }
+  }
+  return respuesta;
+}
+
+// Páginas: la red manda; si tarda más de TIEMPO_RED_MS o no hay conexión, la última copia
+async function redPrimero(event) {
+  const cache = await caches.open(CACHE_PAGINAS);
+  const red = fetch(event.request).then(async respuesta => {
+    // Las redirecciones (p. ej. al login) no se guardan
+    if (respuesta.ok && respuesta.type === 'basic' && !respuesta.redirected) {
+      await cache.put(event.request, respuesta.clone());
+      await recortarCache(cache, MAX_PAGINAS);
+    }
+    return respuesta;
+  });
+
+  try {
+    return await conTiempoLimite(red, TIEMPO_RED_MS);
+  } catch (error) {
+    const cacheada = await cache.match(event.request);
+    if (cacheada) {
+      event.waitUntil(red.catch(() => {}));
+      return cacheada;
+    }
+    try {
+      return await red;
+    } catch (errorRed) {
+      return paginaSinConexion();
+    }
+  }
+}
+
+function conTiempoLimite(promesa, milisegundos) {
+  return new Promise((resolver, rechazar) => {
+    const temporizador = setTimeout(() => rechazar(new Error('Tiempo de espera agotado')), milisegundos);
+    promesa.then(
+      valor => { clearTimeout(temporizador); resolver(valor); },
+      error => { clearTimeout(temporizador); rechazar(error); }
+    );
+  });
+}
+
+async function recortarCache(cache, maximo) {
+  const claves = await cache.keys();
+  // keys() devuelve en orden de inserción: se borran las más viejas
+  await Promise.all(claves.slice(0, Math.max(claves.length - maximo, 0)).map(clave => cache.delete(clave)));
+}
+
+// Al cerrar sesión también se borra la réplica (con su cola). Al entrar no: si la sesión
+// venció con operaciones pendientes, se envían al volver a iniciar sesión con el mismo usuario.
+function borrarDatosDeUsuario(incluirReplica) {
+  const borrados = [caches.delete(CACHE_PAGINAS), caches.delete(CACHE_DATOS)];
+  if (incluirReplica) {
+    borrados.push(Replica.borrarTodo());
+  }
+  return Promise.all(borrados);
+}
+
+async function avisarClientes(mensaje) {
+  const clientes = await self.clients.matchAll({ type: 'window' });
+  clientes.forEach(cliente => cliente.postMessage(mensaje));
+}
+
+function paginaSinConexion() {
+  return new Response(
+    '<!DOCTYPE html><html lang="es"><head><meta charset="UTF-8">' +
+    '<meta name="viewport" content="width=device-width, initial-scale=1.0"><title>Sin conexión</title></head>' +
+    '<body style="font-family: sans-serif; text-align: center; padding: 3rem;">' +
+    '<h1>Sin conexión</h1><p>Esta página no está disponible sin conexión. Intenta de nuevo cuando vuelva la red.</p>' +
+    '</body></html>',
+    { status: 503, headers: { 'Content-Type': 'text/html; charset=utf-8' } }
   );
+}
+
+// Background Sync: enviar la cola de operaciones hechas sin conexión.
+// Si falla (sin red, sesión vencida) el navegador vuelve a intentar más tarde.
+self.addEventListener('sync', event => {
+  if (event.tag === Replica.TAG_SYNC) {
+    event.waitUntil(enviarCola());
+  }
 });
 
+// Navegadores sin Background Sync: la página pide el envío por mensaje
+self.addEventListener('message', event => {
+  if (event.data && event.data.tipo === 'procesar-cola') {
+    event.waitUntil(enviarCola().catch(error => console.log('Cola pendiente:', error.message)));
+  }
+});
+
+async function enviarCola() {
+  const resumen = await Replica.procesarCola();
+  if (resumen.aplicadas || resumen.rechazadas) {
+    await avisarClientes(Object.assign({ tipo: 'cola-procesada' }, resumen));
+  }
+}
+
 // Manejo de notificaciones push (futuro)
 self.addEventListener('push', event => {
   const options = {
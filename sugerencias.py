@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Índice de prefijos en memoria para autocompletar compradores y plataformas
+Un índice por usuario (arrays ordenados + bisect), construido bajo demanda y
+actualizado incrementalmente cuando se venden, editan o eliminan cuentas
+"""
+
+import re
+import threading
+import time
+from bisect import bisect_left, insort
+
+CAMPOS_SUGERENCIA = ('nombre_comprador', 'whatsapp_comprador', 'plataforma')
+
+def normalizar(campo, valor):
+    """Clave de búsqueda: minúsculas; para WhatsApp solo los dígitos"""
+    if campo == 'whatsapp_comprador':
+        return re.sub(r'\D', '', valor)
+    return valor.strip().lower()
+
+class IndicePrefijos:
+    """Valores conocidos de cada campo ordenados por su clave normalizada"""
+
+    def __init__(self):
+        self.ordenados = {campo: [] for campo in CAMPOS_SUGERENCIA}
+        # Cuántas cuentas usan cada valor, para saber cuándo quitarlo
+        self.conteos = {campo: {} for campo in CAMPOS_SUGERENCIA}
+
+    def agregar(self, campo, valor):
+        if not valor or not valor.strip():
+            return
+        valor = valor.strip()
+        conteos = self.conteos[campo]
+        if valor in conteos:
+            conteos[valor] += 1
+            return
+        conteos[valor] = 1
+        insort(self.ordenados[campo], (normalizar(campo, valor), valor))
+
+    def quitar(self, campo, valor):
+        if not valor or not valor.strip():
+            return
+        valor = valor.strip()
+        conteos = self.conteos[campo]
+        if valor not in conteos:
+            return
+        conteos[valor] -= 1
+        if conteos[valor] <= 0:
+            del conteos[valor]
+            ordenados = self.ordenados[campo]
+            posicion = bisect_left(ordenados, (normalizar(campo, valor), valor))
+            if posicion < len(ordenados) and ordenados[posicion][1] == valor:
+                del ordenados[posicion]
+
+    def sugerir(self, campo, prefijo, limite=10):
+        clave = normalizar(campo, prefijo)
+        if not clave:
+            return []
+        ordenados = self.ordenados[campo]
+        resultado = []
+        posicion = bisect_left(ordenados, (clave, ''))
+        while posicion < len(ordenados) and len(resultado) < limite:
+            normalizada, valor = ordenados[posicion]
+            if not normalizada.startswith(clave):
+                break
+            resultado.append(valor)
+            posicion += 1
+        return resultado
+
+class RegistroIndices:
+    """Índices por usuario. La clave None es el índice global de los administradores.
+
+    `cargador(usuario_id)` debe retornar filas (plataforma, nombre_comprador, whatsapp_comprador).
+    Cada worker de gunicorn tiene sus propios índices; se reconstruyen pasado `max_edad`
+    segundos para incorporar cambios hechos en otros workers.
+    """
+
+    def __init__(self, cargador, max_edad=600):
+        self.cargador = cargador
+        self.max_edad = max_edad
+        self.indices = {}
+        self.lock = threading.Lock()
+
+    def obtener(self, usuario_id):
+        with self.lock:
+            entrada = self.indices.get(usuario_id)
+            if entrada and time.monotonic() - entrada[0] < self.max_edad:
+                return entrada[1]
+
+        indice = IndicePrefijos()
+        for plataforma, nombre, whatsapp in self.cargador(usuario_id):
+            indice.agregar('plataforma', plataforma)
+            indice.agregar('nombre_comprador', nombre)
+            indice.agregar('whatsapp_comprador', whatsapp)
+
+        with self.lock:
+            self.indices[usuario_id] = (time.monotonic(), indice)
+        return indice
+
+    def sugerir(self, usuario_id, prefijo, campos=CAMPOS_SUGERENCIA, limite=10):
+        indice = self.obtener(usuario_id)
+        with self.lock:
+            return {campo: indice.sugerir(campo, prefijo, limite) for campo in campos}
+
+    def actualizar(self, usuario_id, antes=None, despues=None):
+        """Aplicar un cambio de cuenta (diccionarios campo -> valor) a los índices ya construidos"""
+        antes = antes or {}
+        despues = despues or {}
+        with self.lock:
+            for clave in (usuario_id, None):
+                entrada = self.indices.get(clave)
+                if not entrada:
+                    continue
+                indice = entrada[1]
+                for campo in CAMPOS_SUGERENCIA:
+                    if antes.get(campo) == despues.get(campo):
+                        continue
+                    indice.quitar(campo, antes.get(campo))
+                    indice.agregar(campo, despues.get(campo))
+
+    def invalidar(self, *usuario_ids):
+        """Descartar los índices de estos usuarios (None = el global) tras un cambio masivo"""
+        with self.lock:
+            for usuario_id in usuario_ids:
+                self.indices.pop(usuario_id, None)
+
+def valores_sugerencia(cuenta):
+    """Campos de una cuenta relevantes para el índice"""
+    return {campo: getattr(cuenta, campo) for campo in CAMPOS_SUGERENCIA}